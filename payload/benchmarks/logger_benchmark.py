@@ -0,0 +1,248 @@
+"""Benchmark of how fast the Logger can log, and how much logging costs the main loop. Run it with
+`uv run bench-logger`, and compare the JSON results across commits."""
+
+import argparse
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+import msgspec
+import numpy as np
+
+from payload.data_handling.logger import Logger
+from payload.data_handling.packets.context_data_packet import ContextDataPacket
+from payload.data_handling.packets.imu_data_packet import IMUDataPacket
+from payload.data_handling.packets.processor_data_packet import ProcessorDataPacket
+from payload.mock.mock_logger import MockLogger
+
+RANDOM = np.random.default_rng()
+"""The generator for the values of the synthetic data packets."""
+
+
+class Percentiles(msgspec.Struct):
+    """
+    A summary of a distribution of durations, in microseconds.
+    """
+
+    p50: float
+    p90: float
+    p99: float
+    max: float
+
+    @classmethod
+    def from_nanoseconds(cls, durations_ns: list[int]) -> "Percentiles | None":
+        """
+        Summarizes the durations.
+        :param durations_ns: The durations, in nanoseconds.
+        :return: The percentiles in microseconds, or None if there are no durations.
+        """
+        if not durations_ns:
+            return None
+        p50, p90, p99, maximum = np.percentile(np.array(durations_ns) / 1e3, [50, 90, 99, 100])
+        return cls(p50=float(p50), p90=float(p90), p99=float(p99), max=float(maximum))
+
+
+class LoggerBenchmarkResult(msgspec.Struct):
+    """
+    The result of benchmarking one logger class.
+    """
+
+    logger: str
+    log_format: str
+    state_name: str
+    requested_rate_hz: float
+    """The rate the packets were logged at, or 0 if they were logged as fast as possible."""
+    duration_seconds: float
+    rows_logged: int
+    enqueue_rate_rows_per_second: float
+    """How many rows per second the main process managed to log."""
+    achieved_rows_per_second: float
+    """How many rows per second ended up on disk, from the first log call until the logging
+    process finished."""
+    drain_seconds: float
+    """How long the logging process took to finish after the last log call."""
+    enqueue_cost: Percentiles | None
+    """The cost of `Logger.log` on the main thread."""
+    end_to_end_latency: Percentiles | None
+    """From the creation of the context data packet to the end of the fsync which wrote it."""
+    fsync_count: int
+    fsync_stall_count: int
+    fsync_mean_ms: float
+    fsync_max_ms: float
+    main_max_rss_kilobytes: int
+    logger_max_rss_kilobytes: int
+
+
+class BenchmarkReport(msgspec.Struct):
+    """
+    All the results of a benchmark run, and where they were measured.
+    """
+
+    git_commit: str | None
+    python_version: str
+    machine: str
+    results: list[LoggerBenchmarkResult]
+
+
+def make_packets(
+    state_name: str, timestamp: float
+) -> tuple[ContextDataPacket, IMUDataPacket, ProcessorDataPacket]:
+    """
+    Makes a set of synthetic data packets like the ones logged every loop.
+    :param state_name: The state name to put in the context data packet.
+    :param timestamp: The IMU timestamp, in milliseconds.
+    :return: The context, IMU and processor data packets.
+    """
+    imu_values = RANDOM.uniform(-100, 100, len(IMUDataPacket.__struct_fields__) - 1)
+    imu_data_packet = IMUDataPacket(timestamp, *imu_values.tolist())
+    # The processor data is logged as numpy floats, like in the real loop
+    processor_data_packet = ProcessorDataPacket(
+        *RANDOM.uniform(-100, 100, len(ProcessorDataPacket.__struct_fields__))
+    )
+    context_data_packet = ContextDataPacket(state_name, "None", "NMR", time.time_ns())
+    return context_data_packet, imu_data_packet, processor_data_packet
+
+
+def run_benchmark(
+    logger_class: type[Logger],
+    log_format: str,
+    state_name: str,
+    rate: float,
+    duration: float,
+) -> LoggerBenchmarkResult:
+    """
+    Logs synthetic packets with the logger for a while, and measures how it kept up.
+    :param logger_class: Logger or MockLogger.
+    :param log_format: The format of the log, "csv" or "wal".
+    :param state_name: The state the packets are logged in. Use "S" to benchmark the standby
+    buffer.
+    :param rate: The rate in Hz to log the packets at, or 0 to log them as fast as possible.
+    :param duration: How long to log for, in seconds.
+    :return: The result of the benchmark.
+    """
+    enqueue_costs_ns: list[int] = []
+
+    with tempfile.TemporaryDirectory() as log_dir:
+        logger = logger_class(Path(log_dir), log_format=log_format)
+        logger.start()
+
+        start_time = time.perf_counter()
+        next_log_time = start_time
+        while (now := time.perf_counter()) - start_time < duration:
+            if rate:
+                if now < next_log_time:
+                    time.sleep(next_log_time - now)
+                next_log_time += 1 / rate
+            packets = make_packets(state_name, (now - start_time) * 1e3)
+
+            log_start = time.perf_counter_ns()
+            logger.log(*packets)
+            enqueue_costs_ns.append(time.perf_counter_ns() - log_start)
+        last_log_time = time.perf_counter()
+
+        logger.stop()
+        # The logger only waits a few seconds for the logging process, so wait for the rest:
+        while logger.is_running:
+            time.sleep(0.01)
+        end_time = time.perf_counter()
+        statistics = logger.statistics
+
+    fsync_count = statistics.fsync_count
+    return LoggerBenchmarkResult(
+        logger=logger_class.__name__,
+        log_format=log_format,
+        state_name=state_name,
+        requested_rate_hz=rate,
+        duration_seconds=duration,
+        rows_logged=statistics.rows_logged,
+        enqueue_rate_rows_per_second=len(enqueue_costs_ns) / (last_log_time - start_time),
+        achieved_rows_per_second=statistics.rows_logged / (end_time - start_time),
+        drain_seconds=end_time - last_log_time,
+        enqueue_cost=Percentiles.from_nanoseconds(enqueue_costs_ns),
+        end_to_end_latency=Percentiles.from_nanoseconds(statistics.recent_latencies_ns),
+        fsync_count=fsync_count,
+        fsync_stall_count=statistics.fsync_stall_count,
+        fsync_mean_ms=statistics.fsync_total_ns / fsync_count / 1e6 if fsync_count else 0.0,
+        fsync_max_ms=statistics.fsync_max_ns / 1e6,
+        # ru_maxrss is in kilobytes on Linux
+        main_max_rss_kilobytes=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        logger_max_rss_kilobytes=statistics.max_rss_kilobytes,
+    )
+
+
+def get_git_commit() -> str | None:
+    """
+    :return: The commit the benchmark is run on, if we are in a git repository.
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    """Entry point of the logger benchmark."""
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the throughput and latency of the Logger and MockLogger."
+    )
+    parser.add_argument(
+        "-r",
+        "--rate",
+        help="The rate in Hz to log packets at. 0 logs them as fast as possible.",
+        type=float,
+        default=0,
+    )
+    parser.add_argument(
+        "-d", "--duration", help="How long to log for, in seconds.", type=float, default=10
+    )
+    parser.add_argument(
+        "-l",
+        "--logger",
+        help="Which logger to benchmark.",
+        choices=["logger", "mock", "both"],
+        default="both",
+    )
+    parser.add_argument(
+        "-f", "--log-format", help="The format of the log.", choices=["csv", "wal"], default="csv"
+    )
+    parser.add_argument(
+        "-s",
+        "--state",
+        help="The state name to log the packets in. S and L are buffered by the logger.",
+        choices=["S", "M", "C", "F", "L"],
+        default="M",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="The JSON file to write the results to.",
+        type=Path,
+        default=Path("logger_benchmark.json"),
+    )
+    args = parser.parse_args()
+
+    logger_classes = {"logger": [Logger], "mock": [MockLogger], "both": [Logger, MockLogger]}
+    results = []
+    for logger_class in logger_classes[args.logger]:
+        print(f"Benchmarking {logger_class.__name__} for {args.duration} s...")
+        result = run_benchmark(logger_class, args.log_format, args.state, args.rate, args.duration)
+        results.append(result)
+        print(msgspec.json.format(msgspec.json.encode(result)).decode())
+
+    report = BenchmarkReport(
+        git_commit=get_git_commit(),
+        python_version=platform.python_version(),
+        machine=platform.machine(),
+        results=results,
+    )
+    args.output.write_bytes(msgspec.json.format(msgspec.json.encode(report)))
+    print(f"Wrote the results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,16 @@ from pathlib import Path
 
 DISPLAY_FREQUENCY = 10
 """The frequency at which the display updates in Hz"""
+DISPLAY_RENDER_COST_SAMPLE_SIZE = 100
+"""The number of frames the display keeps the render cost of."""
+DASHBOARD_HISTORY_SIZE = 50
+"""The number of buckets the `--tui` dashboard downsamples each plotted value into. Each bucket is
+drawn as its minimum and maximum, so the sparklines are at most twice this wide."""
+DASHBOARD_STOP_TIMEOUT_SECONDS = 2.0
+"""How long the flight loop waits for the `--tui` dashboard to close when the flight ends."""
+DASHBOARD_SUBSCRIPTION_CAPACITY = 4096
+"""The number of loops the `--tui` dashboard can fall behind by. It reads them 10 times a second,
+and a fast replay runs thousands of loops a second."""
 
 
 class DisplayEndingType(StrEnum):
@@ -80,6 +90,60 @@ NUMBER_OF_LINES_TO_LOG_BEFORE_FLUSHING = 10
 """The number of lines to log before flushing the data to the file, this is to prevent data loss in
 case of a crash or a reboot."""
 
+LOGGER_STATISTICS_INTERVAL_SECONDS = 1.0
+"""How often the logger process reports its statistics (rows logged, fsync and latency) to the main
+process."""
+
+LOGGER_LATENCY_SAMPLE_SIZE = 4096
+"""The number of most recent row latencies the logger process keeps and reports."""
+
+LOGGER_FSYNC_STALL_SECONDS = 0.05
+"""A sync of the log to disk which takes longer than this is counted as a stall."""
+
+LOG_SEGMENT_SIZE_BYTES = 8 * 1024 * 1024
+"""The size of each log segment file. Segments are preallocated to this size, and a new one is
+started once the current one is full. At 40 Hz this is about 8 minutes of flight data."""
+
+WAL_RECOVERY_MAX_RECORD_BYTES = 64 * 1024
+"""The longest record the recovery tool looks for after a damaged record of a write-ahead log. A
+record is one CSV line, which is well under a kilobyte, so longer lengths are taken to be garbage
+rather than checked against their checksum."""
+
+WAL_RECOVERY_CHUNK_BYTES = 1024 * 1024
+"""How much of a damaged write-ahead log segment the recovery tool searches for records at once,
+which bounds the memory it takes on the Pi."""
+
+LOG_SEGMENT_COMPRESSION = "gzip"
+"""How the log segments are compressed once they are full. Can be "gzip", "lzma" or None. gzip is
+much faster than lzma on the Pi, while still compressing our CSV logs very well."""
+
+LOG_SEGMENT_COMPRESSION_NICENESS = 19
+"""The niceness of the thread compressing the log segments. 19 is the lowest priority."""
+
+LOG_MANIFEST_NAME = "manifest.json"
+"""The name of the file in each log directory which lists the segments of the log in order."""
+
+LOG_INDEX_NAME = "index.jsonl"
+"""The name of the file in each log directory which indexes the state changes, messages and
+timestamps of the log, so we can seek to them without parsing the whole log."""
+
+LOG_INDEX_TIMESTAMP_INTERVAL = 40
+"""Every how many rows the timestamp and position of a row is written to the log index. At 40 Hz
+this is about once a second."""
+
+SYSTEM_LOG_NAME = "system.csv"
+"""The name of the file in each log directory which the SystemMonitor writes the CPU, memory and
+temperature of the Pi to, once every SYSTEM_MONITOR_INTERVAL_SECONDS."""
+
+IDLE_LOG_BUFFER_SECONDS = 5.0
+"""The number of seconds of full rate data we keep in memory while in StandbyState or LandedState.
+This buffer is written to the log as soon as we leave those states, so we keep the full context of
+what happened right before launch without writing hours of pad data to the SD card."""
+
+IDLE_LOG_SUMMARY_FREQUENCY = 1
+"""The frequency in Hz at which we still write data to the log while in StandbyState or LandedState.
+Only the packets which fall out of the in memory buffer are considered for this."""
+
 # -------------------------------------------------------
 # State Machine Configuration
 # -------------------------------------------------------
@@ -166,8 +230,83 @@ NUMBER_OF_TRANSMISSIONS = 10
 
 TRANSMISSION_WINDOW_SECONDS = 5
 
+TRANSMISSION_SCHEDULER_STOP_TIMEOUT_SECONDS = 1.0
+"""How long we wait for the current transmission to be cut off when the transmitter is stopped."""
+
+TRANSMISSION_LATENCY_SAMPLE_SIZE = 100
+"""The number of request to PTT latencies the transmission scheduler keeps."""
+
 NO_MESSAGE_TRANSMITTED = "NMT"
 
+KISS_HOST = "localhost"
+"""The host Direwolf is running on, when we send it our frames over its KISS TCP port."""
+
+KISS_PORT = 8001
+"""The KISS TCP port of Direwolf. This must match the KISSPORT in the Direwolf configuration."""
+
+KISS_CONNECT_TIMEOUT_SECONDS = 5.0
+"""How long we keep trying to connect to the KISS port after Direwolf is started."""
+
+KISS_PTT_PADDING_SECONDS = 0.5
+"""How long the PTT is held on for beyond the air time of a frame, to cover the TX delay and TX
+tail of Direwolf."""
+
+DIREWOLF_STOP_TIMEOUT_SECONDS = 3
+"""How long we wait for Direwolf to exit after asking it to, before killing it."""
+
+AFSK_BAUD_RATE = 1200
+"""The baud rate of the APRS modem."""
+
+AFSK_MARK_FREQUENCY = 1200
+"""The frequency of the tone which is sent for a 1 after NRZI encoding, in Hz."""
+
+AFSK_SPACE_FREQUENCY = 2200
+"""The frequency of the tone which is sent for a 0 after NRZI encoding, in Hz."""
+
+AFSK_SAMPLE_RATE = 44100
+"""The sample rate of the audio we play into the transceiver. This matches the ARATE in the
+Direwolf configuration."""
+
+AFSK_AMPLITUDE = 0.5
+"""The amplitude of the audio, as a fraction of the full scale of the sound card."""
+
+AFSK_PREAMBLE_FLAGS = 45
+"""The number of flags sent before every frame, which is 300 ms at 1200 baud. This gives the
+transceiver time to key up, and the receiver time to lock on to the signal."""
+
+AFSK_POSTAMBLE_FLAGS = 3
+"""The number of flags sent after every frame, so the end of the frame isn't cut off."""
+
+AFSK_AUDIO_CACHE_SIZE = 8
+"""The number of messages whose audio is kept, since the same message is sent many times."""
+
+AFSK_DEMODULATOR_BLOCK_SIZE = 1 << 16
+"""The number of samples the ground station demodulates at a time."""
+
+APRS_DESTINATION = "APZPAY"
+"""The destination address of our APRS packets. APZ is the prefix for experimental software."""
+
+APRS_SYMBOL_TABLE = "S"
+"""The symbol table of our position reports. A letter is an overlay on the alternate table."""
+
+APRS_SYMBOL = "O"
+"""The symbol of our position reports, which is a balloon (rocket) on the alternate table."""
+
+LANDING_PACKET_REFRESH_SECONDS = 1.0
+"""How often the landing message is made again during free fall, from the latest data, so it is
+ready to be sent as soon as we land."""
+
+DOWNLINK_LOOP_BUDGET_NS = 50_000
+"""How long handing the in-flight status to the transmitter may take in one loop. It only makes a
+small data packet and schedules it without waiting, so it should take a few microseconds."""
+
+DOWNLINK_OVERRUN_BACKOFF_LOOPS = IMU_APPROXIMATE_FREQUENCY
+"""How many loops no status is handed to the transmitter for, after a loop went over the budget.
+This is about a second, which is still shorter than the time between status beacons."""
+
+DOWNLINK_COST_SAMPLE_SIZE = 4096
+"""The number of per-loop downlink costs we keep, to summarize them when we stop."""
+
 WARHEAD_LAUNCH_CODE_HASH = "7110eda4d09e062aa5e4a390b0a572ac0d2c0220"
 
 # -------------------------------------------------------
@@ -189,11 +328,102 @@ RECEIVER_THREAD_TIMEOUT = 3
 """The amount of time in seconds that the receiver thread waits to force close"""
 RECEIVER_SERIAL_TIMEOUT = 10
 """The amount of time in seconds that the receiver serial port waits for a message"""
+RECEIVER_READ_TIMEOUT_SECONDS = 0.5
+"""How long a read of the receiver thread waits for data before checking if it should stop. The
+thread sleeps while it waits, so this only bounds how long stopping takes."""
+RECEIVER_WRITE_TIMEOUT_SECONDS = 0.01
+"""How long writing an acknowledgment to the XBee may take. It normally goes straight into the
+kernel's buffer, but if the XBee stops taking data, the write blocks the thread which reads the
+IMU too. The acknowledgment is dropped instead, and the ground station sends the command again."""
+RECEIVER_QUEUE_SIZE = 64
+"""The number of received commands which can wait to be handled. The flight loop handles them
+every loop, so this only fills up if the loop is stuck."""
+XBEE_MAX_FRAME_DATA_SIZE = 256
+"""The longest frame we accept from the XBee in API mode. Ours are under 20 bytes, and the XBee
+never sends more than this, so anything longer is noise."""
+XBEE_ACK_TIMEOUT_SECONDS = 1.0
+"""How long the ground station waits for the acknowledgment of a command before sending it again.
+A command and its acknowledgment take about 40 ms at 9600 baud."""
+XBEE_COMMAND_RETRIES = 5
+"""How many times the ground station sends a command before giving up."""
 
 # These are in seconds
 MOCK_RECEIVER_INITIAL_DELAY = 10
 MOCK_RECEIVER_RECEIVE_DELAY = 2.0
 
+# -------------------------------------------------------
+# I/O Reactor Configuration
+# -------------------------------------------------------
+IO_REACTOR_READ_SIZE = 4096
+"""The most bytes the I/O reactor reads from a file at a time. The IMU sends about 4 KB/s, so one
+read gets everything which arrived since the last one."""
+IO_REACTOR_LATENCY_SAMPLE_SIZE = 1000
+"""The number of handling times the I/O reactor keeps."""
+IO_REACTOR_STOP_TIMEOUT_SECONDS = 1.0
+"""How long we wait for the I/O reactor thread to stop after the last file is unregistered."""
+IO_REACTOR_ERROR_REPORT_INTERVAL = 100
+"""A handler which keeps failing, e.g. on a port sending garbage, has its error printed the first
+time and then once every this many times, so it is seen without flooding the output."""
+
+# -------------------------------------------------------
+# Data Bus Configuration
+# -------------------------------------------------------
+DATA_BUS_SUBSCRIPTION_CAPACITY = 64
+"""The number of packets a subscriber of the data bus can fall behind by, by default, before
+packets are dropped."""
+DATA_BUS_ERROR_REPORT_INTERVAL = 40
+"""A subscriber which keeps failing to handle the packets, e.g. the logger, has its error printed
+the first time and then once every this many times. At 40 Hz that is about once a second, so the
+lost data is noticed without flooding the output."""
+
+
+class DropPolicy(StrEnum):
+    """
+    Enum that represents what a data bus subscription does with a packet when its buffer is full.
+    """
+
+    DROP_OLDEST = "drop_oldest"
+    """The oldest packet in the buffer is dropped, so the subscriber always gets the latest data."""
+    DROP_NEWEST = "drop_newest"
+    """The new packet is dropped, so the subscriber gets an unbroken run of packets."""
+    KEEP_LATEST = "keep_latest"
+    """Like DROP_OLDEST, but the subscriber only wants the latest data, e.g. the display, so the
+    packets which are replaced aren't counted as dropped."""
+
+
+# -------------------------------------------------------
+# Metrics Configuration
+# -------------------------------------------------------
+METRICS_HOST = "127.0.0.1"
+"""The metrics server only listens on localhost. Prometheus scrapes it there, or through an SSH
+tunnel to the Pi."""
+LOOP_PROCESSING_BUCKETS_SECONDS = (
+    25e-6, 50e-6, 100e-6, 250e-6, 500e-6, 1e-3, 2.5e-3, 5e-3, 10e-3, 25e-3
+)  # fmt: skip
+"""The buckets of the histogram of how long a loop takes after it gets its IMU packet. A loop
+usually takes well under a millisecond, and the IMU sends a packet every 25 ms."""
+TRANSMISSION_LATENCY_BUCKETS_SECONDS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+"""The buckets of the histogram of the time from the request of a transmission to keying the
+PTT."""
+
+# -------------------------------------------------------
+# Profiling Configuration
+# -------------------------------------------------------
+PROFILES_PATH = LOGS_PATH / "profiles"
+"""The folder the profiles made with `--profile` are written to."""
+PROFILER_SAMPLE_INTERVAL_SECONDS = 0.005
+"""How often the sampling profiler takes the stacks of every thread, by default. A sample of the
+payload's threads takes well under 100 microseconds, so it holds the GIL about 1% of the time."""
+
+# -------------------------------------------------------
+# Telemetry Stream Configuration
+# -------------------------------------------------------
+TELEMETRY_STREAM_DECIMATION = 1
+"""By default every loop is sent on the telemetry stream. With a decimation of N, only every Nth
+loop is sent."""
+TELEMETRY_STREAM_MAX_DATAGRAM_SIZE = 4096
+"""The largest telemetry datagram a listener reads. A whole loop encodes to under 1 KB."""
+
 # -------------------------------------------------------
 # Survivability Metrics
 # -------------------------------------------------------
@@ -208,3 +438,59 @@ PITCH_WEIGHT = 10.1
 INTENSITY_PERCENT_THRESHOLD = 0.20
 
 LANDING_VELOCITY_DEDUCTION = 0.8
+
+# -------------------------------------------------------
+# Memory Diagnostics Configuration
+# -------------------------------------------------------
+MEMORY_REPORTS_PATH = LOGS_PATH / "memory"
+"""The folder the memory reports asked for with SIGUSR2 are written to."""
+MEMORY_REPORT_TOP_COUNT = 25
+"""How many allocation sites and object types each memory report lists."""
+MEMORY_COUNT_CHUNK_SIZE = 5_000
+"""How many tracked objects the memory report looks up the referents of while holding the GIL.
+A chunk takes about 1 ms on a desktop."""
+TRACEMALLOC_FRAMES = 1
+"""How many frames tracemalloc keeps of each allocation. One frame is enough to find the line
+which allocates, and keeps the cost of tracing low while the flight loop runs."""
+
+# -------------------------------------------------------
+# System Monitor Configuration
+# -------------------------------------------------------
+SYSTEM_MONITOR_INTERVAL_SECONDS = 1.0
+"""How often the SystemMonitor samples the CPU, memory and temperature of the Pi. A sample takes
+a few hundred microseconds, which the flight loop only notices as the GIL being held."""
+SOC_TEMPERATURE_PATH = Path("/sys/class/thermal/thermal_zone0/temp")
+"""The file the temperature of the SoC is read from, in millidegrees Celsius."""
+THROTTLED_PATH = Path("/sys/devices/platform/soc/soc:firmware/get_throttled")
+"""The file the throttling flags of the Pi firmware are read from, in hex. It is the same value as
+`vcgencmd get_throttled`, which is run instead on kernels which don't have this file."""
+THROTTLED_FLAGS = {
+    0x1: "under-voltage",
+    0x2: "ARM frequency capped",
+    0x4: "throttled",
+    0x8: "soft temperature limit",
+}
+"""The throttling flags which are set while the condition is happening. The same flags shifted left
+by 16 bits are set once the condition has happened since boot."""
+
+# -------------------------------------------------------
+# Scheduling Configuration
+# -------------------------------------------------------
+SCHEDULING_PROFILES = {
+    "pi4": {
+        "imu": {"cpus": [3], "nice": -10, "realtime_priority": 20},
+        "main_loop": {"cpus": [2], "nice": -10},
+        "logger": {"cpus": [1]},
+        "camera": {"cpus": [0, 1], "nice": 5},
+        "transmitter": {"cpus": [0, 1], "nice": -5},
+    },
+}
+"""The CPUs, niceness and SCHED_FIFO priority of each component, by profile. The IMU reader and
+the flight loop get a core each, since they are the ones which have to keep up with the IMU. The
+logger gets core 1, and the camera and the transmitter share cores 0 and 1 with the interrupts,
+which the Pi handles on core 0. A component which isn't listed, or a setting which is left out, is
+left as it is. Only the IMU reader gets SCHED_FIFO, since it blocks on the serial port between
+packets. A SCHED_FIFO thread which never blocks would starve everything else on its core."""
+DEFAULT_SCHEDULING_PROFILE = "pi4"
+"""The scheduling profile real flights use unless another one is given. Mock flights don't use one
+unless asked to, since they usually don't run on a Pi."""
@@ -0,0 +1,110 @@
+"""Module for the AFSK1200 modulator, which turns AX.25 frames into the audio we play into the
+transceiver. This is what Direwolf does for us otherwise."""
+
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import numpy.typing as npt
+import soundfile
+
+from payload.constants import (
+    AFSK_AMPLITUDE,
+    AFSK_AUDIO_CACHE_SIZE,
+    AFSK_BAUD_RATE,
+    AFSK_MARK_FREQUENCY,
+    AFSK_POSTAMBLE_FLAGS,
+    AFSK_PREAMBLE_FLAGS,
+    AFSK_SPACE_FREQUENCY,
+)
+from payload.data_handling.ax25 import compute_fcs
+
+HDLC_FLAG_BITS = np.unpackbits(np.array([0x7E], dtype=np.uint8), bitorder="little")
+"""The bits of the HDLC flag which starts and ends every frame. It is never bit stuffed."""
+
+
+def stuff_bits(bits: npt.NDArray[np.uint8]) -> npt.NDArray[np.uint8]:
+    """
+    Inserts a 0 after every five 1s in a row, so the data never looks like a flag.
+    :param bits: The bits of the frame and its FCS.
+    :return: The stuffed bits.
+    """
+    # The position of every 1 in its run of 1s, counting the 1s since the last 0. The 0s are at 0.
+    ones_so_far = np.cumsum(bits, dtype=np.int64)
+    ones_at_last_zero = np.maximum.accumulate(np.where(bits == 0, ones_so_far, 0))
+    run_position = ones_so_far - ones_at_last_zero
+    # A 0 goes after the 5th, 10th... 1 of a run. The inserted 0 ends the run, so a run of 1s is
+    # counted again from the start after it.
+    stuff_after = np.flatnonzero((run_position > 0) & (run_position % 5 == 0))
+    return np.insert(bits, stuff_after + 1, 0)
+
+
+def encode_hdlc_bits(
+    frame: bytes,
+    preamble_flags: int = AFSK_PREAMBLE_FLAGS,
+    postamble_flags: int = AFSK_POSTAMBLE_FLAGS,
+) -> npt.NDArray[np.uint8]:
+    """
+    Adds the FCS to a frame, bit stuffs it, and surrounds it with flags.
+    :param frame: The AX.25 frame, without the flags and the FCS.
+    :param preamble_flags: The number of flags before the frame, which give the receiver time to
+    lock on to the signal.
+    :param postamble_flags: The number of flags after the frame.
+    :return: The bits to transmit, in the order they are transmitted.
+    """
+    data = np.frombuffer(frame + compute_fcs(frame), dtype=np.uint8)
+    # AX.25 sends the least significant bit of every byte first
+    bits = stuff_bits(np.unpackbits(data, bitorder="little"))
+    return np.concatenate(
+        [np.tile(HDLC_FLAG_BITS, preamble_flags), bits, np.tile(HDLC_FLAG_BITS, postamble_flags)]
+    )
+
+
+def nrzi_encode(bits: npt.NDArray[np.uint8]) -> npt.NDArray[np.uint8]:
+    """
+    Encodes the bits as NRZI, where a 0 is sent by changing the tone and a 1 by keeping it.
+    :param bits: The bits to encode.
+    :return: The tone of every bit, 1 for the mark and 0 for the space, starting from the mark.
+    """
+    return (1 - np.cumsum(bits == 0) % 2).astype(np.uint8)
+
+
+def synthesize_tones(tones: npt.NDArray[np.uint8], sample_rate: int) -> npt.NDArray[np.float32]:
+    """
+    Synthesizes the audio of the tones. The phase is continuous across the tone changes, since
+    jumps in the phase spread the signal over other frequencies.
+    :param tones: The tone of every bit, 1 for the mark and 0 for the space.
+    :param sample_rate: The sample rate of the audio, which doesn't need to be a multiple of the
+    baud rate.
+    :return: The audio samples, between -AFSK_AMPLITUDE and AFSK_AMPLITUDE.
+    """
+    number_of_samples = int(np.ceil(len(tones) * sample_rate / AFSK_BAUD_RATE))
+    # The bit every sample belongs to
+    bit_of_sample = np.arange(number_of_samples) * AFSK_BAUD_RATE // sample_rate
+    frequencies = np.where(tones[bit_of_sample] == 1, AFSK_MARK_FREQUENCY, AFSK_SPACE_FREQUENCY)
+    phase = np.cumsum(2 * np.pi * frequencies / sample_rate)
+    return (AFSK_AMPLITUDE * np.sin(phase)).astype(np.float32)
+
+
+@lru_cache(maxsize=AFSK_AUDIO_CACHE_SIZE)
+def modulate_frame(frame: bytes, sample_rate: int) -> npt.NDArray[np.float32]:
+    """
+    Makes the audio of an AX.25 frame. The audio is cached, since we send the same message many
+    times in a row.
+    :param frame: The AX.25 frame, without the flags and the FCS.
+    :param sample_rate: The sample rate of the audio.
+    :return: The audio samples. They are read only, since they are shared through the cache.
+    """
+    audio = synthesize_tones(nrzi_encode(encode_hdlc_bits(frame)), sample_rate)
+    audio.flags.writeable = False
+    return audio
+
+
+def write_wav(path: Path, audio: npt.NDArray[np.float32], sample_rate: int) -> None:
+    """
+    Writes the audio to a WAV file, e.g. to check the modulation without a transceiver.
+    :param path: The path of the WAV file.
+    :param audio: The audio samples.
+    :param sample_rate: The sample rate of the audio.
+    """
+    soundfile.write(path, audio, sample_rate, subtype="PCM_16")
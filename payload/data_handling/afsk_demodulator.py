@@ -0,0 +1,236 @@
+"""Module for the AFSK1200 demodulator, which turns the audio received by the ground station back
+into AX.25 frames. It is the counterpart of the modulator in `afsk`, and lets us check that what
+we transmit decodes back to what we meant to send."""
+
+import itertools
+from collections.abc import Iterator
+from pathlib import Path
+
+import numpy as np
+import numpy.typing as npt
+import soundfile
+
+from payload.constants import (
+    AFSK_BAUD_RATE,
+    AFSK_DEMODULATOR_BLOCK_SIZE,
+    AFSK_MARK_FREQUENCY,
+    AFSK_SPACE_FREQUENCY,
+)
+from payload.data_handling.afsk import HDLC_FLAG_BITS
+from payload.data_handling.ax25 import compute_fcs
+
+AX25_MIN_FRAME_BITS = (2 * 7 + 2 + 2) * 8
+"""The bits of the smallest frame: two addresses, the control and PID fields, and the FCS."""
+
+AX25_MAX_FRAME_BITS = (10 * 7 + 2 + 256 + 2) * 8 * 6 // 5
+"""The bits of the largest frame after bit stuffing, with eight digipeaters and 256 bytes of
+information. Anything longer without a flag is noise."""
+
+MAX_BITS_PER_RUN = 7
+"""The most bits a tone can last for, since a flag is six 1s in a row. Longer runs are silence or
+noise, and are cut short so they don't fill the bit buffer."""
+
+FLAG_VALUE = int(np.packbits(HDLC_FLAG_BITS, bitorder="little")[0])
+"""The value of 8 bits in a row which form a flag, read least significant bit first."""
+
+
+class AFSKDemodulator:
+    """
+    A streaming AFSK1200 demodulator. The audio can be fed to it in blocks of any size, e.g. as it
+    is read from a WAV file or recorded from the sound card, and it returns the frames as soon as
+    they are complete.
+
+    For every sample, the audio of the last bit period is correlated with the mark and the space
+    tones, and the stronger one is taken as the tone. The clock is recovered from the length of
+    the runs of each tone, which are a whole number of bits long. Everything is vectorized with
+    NumPy, so this demodulates audio many times faster than real time.
+    """
+
+    __slots__ = (
+        "_bits",
+        "_frequencies",
+        "_history",
+        "_last_tone",
+        "_max_pending_tones",
+        "_oscillators",
+        "_pending_tones",
+        "_sample_rate",
+        "_samples_per_bit",
+        "_samples_seen",
+        "_window",
+    )
+
+    def __init__(self, sample_rate: int) -> None:
+        """
+        :param sample_rate: The sample rate of the audio.
+        """
+        self._sample_rate = sample_rate
+        self._samples_per_bit = sample_rate / AFSK_BAUD_RATE
+        # The correlators sum the audio over one bit period
+        self._window = round(self._samples_per_bit)
+        # The samples from the end of the last block which are still in the correlator window
+        self._history = np.zeros(self._window - 1)
+        self._samples_seen = 0
+        # The mark and space frequencies, in cycles per sample
+        self._frequencies = np.array([AFSK_MARK_FREQUENCY, AFSK_SPACE_FREQUENCY]) / sample_rate
+        self._oscillators = np.zeros((2, 0), dtype=np.complex128)
+        # The tones of the run which was still going at the end of the last block. Only enough
+        # of a long run is kept to know that it was longer than MAX_BITS_PER_RUN.
+        self._pending_tones = np.zeros(0, dtype=np.int8)
+        self._max_pending_tones = int((MAX_BITS_PER_RUN + 1) * self._samples_per_bit)
+        # The tone of the last run which was turned into bits, for the NRZI decoding
+        self._last_tone = -1
+        # The bits since the last flag, which may be the start of a frame
+        self._bits = np.zeros(0, dtype=np.uint8)
+
+    def feed(self, samples: npt.NDArray[np.floating]) -> list[bytes]:
+        """
+        Demodulates a block of audio.
+        :param samples: The mono audio samples.
+        :return: The frames completed in this block, without the flags and the FCS. Only frames
+        with a valid FCS are returned.
+        """
+        if len(samples) == 0:
+            return []
+        tones = self._detect_tones(samples)
+        bits = self._recover_bits(tones)
+        return self._extract_frames(bits)
+
+    def _detect_tones(self, samples: npt.NDArray[np.floating]) -> npt.NDArray[np.int8]:
+        """
+        Decides which tone every sample belongs to.
+        :param samples: The audio samples.
+        :return: 1 for the mark and 0 for the space, for every sample.
+        """
+        audio = np.concatenate([self._history, samples])
+        start = self._samples_seen - len(self._history)
+        self._samples_seen += len(samples)
+        self._history = audio[len(audio) - len(self._history) :]
+
+        # The oscillators are only computed again when a longer block comes in, since computing
+        # the complex exponentials is most of the work
+        if self._oscillators.shape[1] < len(audio):
+            time = np.arange(len(audio))
+            self._oscillators = np.exp(-2j * np.pi * self._frequencies[:, None] * time)
+
+        magnitudes = []
+        for frequency, oscillator in zip(self._frequencies, self._oscillators, strict=True):
+            # Turns the oscillator to where it was at the start of this block, so the correlators
+            # are continuous across blocks
+            start_phase = np.exp(-2j * np.pi * frequency * (start % self._sample_rate))
+            mixed = audio * (start_phase * oscillator[: len(audio)])
+            # A moving sum over one bit period, from the differences of the cumulative sum
+            cumulative = np.concatenate([[0], np.cumsum(mixed)])
+            sums = cumulative[self._window :] - cumulative[: -self._window]
+            magnitudes.append(sums.real**2 + sums.imag**2)
+        return (magnitudes[0] > magnitudes[1]).astype(np.int8)
+
+    def _recover_bits(self, tones: npt.NDArray[np.int8]) -> npt.NDArray[np.uint8]:
+        """
+        Splits the tones into runs, works out how many bits long each run is, and NRZI decodes
+        them.
+        :param tones: The tone of every sample.
+        :return: The decoded bits, which are still bit stuffed.
+        """
+        tones = np.concatenate([self._pending_tones, tones])
+        run_starts = np.concatenate([[0], np.flatnonzero(np.diff(tones)) + 1])
+        run_lengths = np.diff(np.append(run_starts, len(tones)))
+
+        # Runs shorter than half a bit are glitches, so we ignore them, and join the runs of the
+        # same tone around them
+        is_long = run_lengths >= self._samples_per_bit / 2
+        run_starts = run_starts[is_long]
+        if len(run_starts) == 0:
+            self._pending_tones = tones[-self._max_pending_tones :]
+            return np.zeros(0, dtype=np.uint8)
+        run_tones = tones[run_starts]
+        is_new_tone = np.concatenate([[True], np.diff(run_tones) != 0])
+        run_starts, run_tones = run_starts[is_new_tone], run_tones[is_new_tone]
+
+        # The last run may continue in the next block, so its tones are kept for the next block.
+        # The runs before it end where the next run starts, which counts the glitches in them.
+        self._pending_tones = tones[run_starts[-1] :][-self._max_pending_tones :]
+        run_lengths = np.diff(run_starts)
+        run_tones = run_tones[:-1]
+        if len(run_tones) == 0:
+            return np.zeros(0, dtype=np.uint8)
+
+        bits_per_run = np.clip(np.rint(run_lengths / self._samples_per_bit), 1, MAX_BITS_PER_RUN)
+        bits_per_run = bits_per_run.astype(np.int64)
+        # NRZI: the first bit of a run is a 0 since the tone changed, and the rest are 1s
+        bits = np.ones(bits_per_run.sum(), dtype=np.uint8)
+        run_first_bits = np.cumsum(bits_per_run) - bits_per_run
+        tone_changed = run_tones != np.concatenate([[self._last_tone], run_tones[:-1]])
+        bits[run_first_bits[tone_changed]] = 0
+        self._last_tone = int(run_tones[-1])
+        return bits
+
+    def _extract_frames(self, bits: npt.NDArray[np.uint8]) -> list[bytes]:
+        """
+        Finds the frames between the flags in the bits.
+        :param bits: The new bits.
+        :return: The frames which had a valid FCS.
+        """
+        bits = np.concatenate([self._bits, bits])
+        if len(bits) < len(HDLC_FLAG_BITS):
+            self._bits = bits
+            return []
+
+        # The value of every 8 bits in a row, to find the flags
+        windows = np.lib.stride_tricks.sliding_window_view(bits, len(HDLC_FLAG_BITS))
+        values = windows @ (1 << np.arange(len(HDLC_FLAG_BITS)))
+        flags = np.flatnonzero(values == FLAG_VALUE)
+
+        frames = []
+        for start, end in itertools.pairwise(flags):
+            data = bits[start + len(HDLC_FLAG_BITS) : end]
+            if AX25_MIN_FRAME_BITS <= len(data) <= AX25_MAX_FRAME_BITS:
+                frame = decode_hdlc_bits(data)
+                if frame is not None:
+                    frames.append(frame)
+
+        # Keeps the bits from the last flag, since a frame may be starting there
+        if len(flags):
+            self._bits = bits[flags[-1] :]
+        elif len(bits) > AX25_MAX_FRAME_BITS:
+            self._bits = bits[-(len(HDLC_FLAG_BITS) - 1) :]
+        else:
+            self._bits = bits
+        return frames
+
+
+def decode_hdlc_bits(data: npt.NDArray[np.uint8]) -> bytes | None:
+    """
+    Removes the bit stuffing from the bits between two flags, and checks the FCS.
+    :param data: The bits between the flags.
+    :return: The frame without the FCS, or None if the bits aren't a valid frame.
+    """
+    # The position of every 1 in its run of 1s, like when stuffing the bits
+    ones_so_far = np.cumsum(data, dtype=np.int64)
+    run_position = ones_so_far - np.maximum.accumulate(np.where(data == 0, ones_so_far, 0))
+    if run_position.max(initial=0) > 5:
+        # Six 1s in a row is an abort, or we lost track of the bits
+        return None
+    # The 0 after every five 1s was stuffed in
+    stuffed = np.flatnonzero(run_position == 5) + 1
+    data = np.delete(data, stuffed[stuffed < len(data)])
+    if len(data) % 8:
+        return None
+
+    frame = np.packbits(data, bitorder="little").tobytes()
+    if compute_fcs(frame[:-2]) != frame[-2:]:
+        return None
+    return frame[:-2]
+
+
+def demodulate_wav(path: Path) -> Iterator[bytes]:
+    """
+    Demodulates the frames in a WAV file, reading it block by block so long recordings don't need
+    to fit in memory.
+    :param path: The path of the WAV file.
+    :return: The frames, in the order they were received.
+    """
+    demodulator = AFSKDemodulator(soundfile.info(str(path)).samplerate)
+    for block in soundfile.blocks(path, blocksize=AFSK_DEMODULATOR_BLOCK_SIZE, always_2d=True):
+        # Mixes stereo recordings down to mono
+        yield from demodulator.feed(block.mean(axis=1))
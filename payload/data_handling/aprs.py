@@ -0,0 +1,259 @@
+"""Module for creating the APRS packets we transmit to the ground station, and for parsing them
+back at the ground station."""
+
+import re
+
+import msgspec
+import numpy as np
+
+from payload.constants import APRS_SYMBOL, APRS_SYMBOL_TABLE
+from payload.data_handling.ax25 import parse_ui_frame
+from payload.data_handling.compact_telemetry import (
+    COMPACT_TELEMETRY_PREFIX,
+    decode_base91,
+    decode_compact_telemetry,
+    decode_status_telemetry,
+    encode_base91,
+    encode_compact_telemetry,
+    encode_status_telemetry,
+)
+from payload.data_handling.packets.status_data_packet import StatusDataPacket
+from payload.data_handling.packets.transmitter_data_packet import TransmitterDataPacket
+
+FEET_PER_METER = 3.28084
+"""The conversion `TransmitterDataPacket.compress_packet` uses for altitudes and velocities."""
+
+POSITION_REPORT_PATTERN = re.compile(
+    rb"[!=](\d{2})(\d{2}\.\d{2})([NS])(.)(\d{3})(\d{2}\.\d{2})([EW])(.)(.*)", re.DOTALL
+)
+"""An uncompressed APRS position report without a timestamp."""
+
+COMPRESSED_POSITION_REPORT_PATTERN = re.compile(
+    rb"[!=]([/\\A-Za-j])([!-{]{4})([!-{]{4})(.)[ !-{]{3}(.*)", re.DOTALL
+)
+"""A compressed APRS position report without a timestamp."""
+
+NUMBER = r"([-+]?(?:\d+\.?\d*|nan|inf))"
+"""A number in the comment, which is nan or inf when the data wasn't available."""
+
+COMPRESSED_PACKET_PATTERN = re.compile(
+    rf"temperature={NUMBER}\xc2\xb0F,"
+    rf"apogee={NUMBER}ft,"
+    rf"battery_status=CPU:{NUMBER}% \| TX:{NUMBER}%,"
+    rf"orientation=\(roll={NUMBER},pitch={NUMBER},yaw={NUMBER}\),"
+    r"time_landing=([^,]*),"
+    rf"max_vel={NUMBER}ft/s,"
+    rf"landing_vel={NUMBER}ft/s,"
+    rf"crew_survival=\s*{NUMBER}%"
+)
+"""The comment made by `TransmitterDataPacket.compress_packet`."""
+
+
+class PositionReport(msgspec.Struct):
+    """
+    The fields of an APRS position report.
+    """
+
+    latitude: float
+    longitude: float
+    symbol_table: str
+    symbol: str
+    comment: str
+
+
+def format_latitude(latitude: float) -> str:
+    """
+    Formats a latitude like APRS expects it.
+    :param latitude: The latitude in degrees, positive in the northern hemisphere.
+    :return: The latitude as "DDMM.mmN".
+    """
+    # We round to hundredths of a minute before splitting, so we never get 60.00 minutes
+    degrees, hundredths_of_minutes = divmod(round(abs(latitude) * 6000), 6000)
+    hemisphere = "N" if latitude >= 0 else "S"
+    return f"{degrees:02}{hundredths_of_minutes / 100:05.2f}{hemisphere}"
+
+
+def format_longitude(longitude: float) -> str:
+    """
+    Formats a longitude like APRS expects it.
+    :param longitude: The longitude in degrees, positive east of Greenwich.
+    :return: The longitude as "DDDMM.mmE".
+    """
+    degrees, hundredths_of_minutes = divmod(round(abs(longitude) * 6000), 6000)
+    hemisphere = "E" if longitude >= 0 else "W"
+    return f"{degrees:03}{hundredths_of_minutes / 100:05.2f}{hemisphere}"
+
+
+def format_compressed_position(latitude: float, longitude: float) -> str:
+    """
+    Formats a position like the APRS compressed position format, which is 8 characters of base 91
+    instead of the 17 of the uncompressed format, and more precise.
+    :param latitude: The latitude in degrees, positive in the northern hemisphere.
+    :param longitude: The longitude in degrees, positive east of Greenwich.
+    :return: The 4 base 91 digits of the latitude, followed by the 4 of the longitude.
+    """
+    latitude_steps = int(380926 * (90 - min(max(latitude, -90), 90)))
+    longitude_steps = int(190463 * (180 + min(max(longitude, -180), 180)))
+    # The values are truncated like in the APRS specification. Exactly 90 degrees south or 180
+    # degrees east would need a fifth digit.
+    return encode_base91(min(latitude_steps, 91**4 - 1), 4) + encode_base91(
+        min(longitude_steps, 91**4 - 1), 4
+    )
+
+
+def create_position_report(message: TransmitterDataPacket, compact: bool = False) -> bytes:
+    """
+    Creates the information field of an APRS position report, with the landing coordinates as the
+    position and the rest of the data packet as the comment. By default, this is the same packet
+    that Direwolf makes from the PBEACON line of its configuration.
+    :param message: The data packet to transmit.
+    :param compact: Whether to send the position compressed and the comment as compact telemetry,
+    which takes less than half the air time.
+    :return: The information field of the AX.25 frame.
+    """
+    latitude, longitude = message.landing_coords
+    if compact:
+        # The 3 spaces at the end mean that there is no course, speed or altitude
+        return (
+            f"!{APRS_SYMBOL_TABLE}{format_compressed_position(latitude, longitude)}{APRS_SYMBOL}"
+            f"   {encode_compact_telemetry(message)}"
+        ).encode("ascii")
+
+    report = (
+        f"!{format_latitude(latitude)}{APRS_SYMBOL_TABLE}"
+        f"{format_longitude(longitude)}{APRS_SYMBOL}{message.compress_packet()}"
+    )
+    # compress_packet spells the degree sign as its UTF-8 bytes, which latin-1 maps back to bytes
+    return report.encode("latin-1")
+
+
+def create_status_report(status: StatusDataPacket) -> bytes:
+    """
+    Creates the information field of an APRS status report carrying our in-flight status. It has
+    no position, so it is a lot shorter than a position report.
+    :param status: The in-flight status.
+    :return: The information field of the AX.25 frame.
+    """
+    return f">{encode_status_telemetry(status)}".encode("ascii")
+
+
+def parse_position_report(info: bytes) -> PositionReport | None:
+    """
+    Parses the information field of an APRS position report, like the ones we transmit.
+    :param info: The information field of the AX.25 frame.
+    :return: The position report, or None if it isn't an uncompressed position report.
+    """
+    match = POSITION_REPORT_PATTERN.fullmatch(info)
+    if match is None:
+        return parse_compressed_position_report(info)
+    (
+        latitude_degrees,
+        latitude_minutes,
+        latitude_hemisphere,
+        symbol_table,
+        longitude_degrees,
+        longitude_minutes,
+        longitude_hemisphere,
+        symbol,
+        comment,
+    ) = match.groups()
+    latitude = int(latitude_degrees) + float(latitude_minutes) / 60
+    longitude = int(longitude_degrees) + float(longitude_minutes) / 60
+    return PositionReport(
+        latitude=latitude if latitude_hemisphere == b"N" else -latitude,
+        longitude=longitude if longitude_hemisphere == b"E" else -longitude,
+        symbol_table=symbol_table.decode("latin-1"),
+        symbol=symbol.decode("latin-1"),
+        # The comment was encoded with latin-1, see `create_position_report`
+        comment=comment.decode("latin-1"),
+    )
+
+
+def parse_compressed_position_report(info: bytes) -> PositionReport | None:
+    """
+    Parses the information field of an APRS position report in the compressed format.
+    :param info: The information field of the AX.25 frame.
+    :return: The position report, or None if it isn't a compressed position report.
+    """
+    match = COMPRESSED_POSITION_REPORT_PATTERN.fullmatch(info)
+    if match is None:
+        return None
+    symbol_table, latitude_digits, longitude_digits, symbol, comment = (
+        group.decode("latin-1") for group in match.groups()
+    )
+    return PositionReport(
+        latitude=90 - decode_base91(latitude_digits) / 380926,
+        longitude=decode_base91(longitude_digits) / 190463 - 180,
+        symbol_table=symbol_table,
+        symbol=symbol,
+        comment=comment,
+    )
+
+
+def parse_compressed_packet(
+    comment: str, landing_coords: tuple[float, float]
+) -> TransmitterDataPacket | None:
+    """
+    Parses the comment made by `TransmitterDataPacket.compress_packet` back into a data packet,
+    converting the values back to the units of the data packet. The values are only as precise
+    as they were rounded to in the comment.
+    :param comment: The comment of the position report.
+    :param landing_coords: The position of the position report.
+    :return: The data packet, or None if the comment isn't one of ours.
+    """
+    match = COMPRESSED_PACKET_PATTERN.fullmatch(comment)
+    if match is None:
+        return None
+    (
+        temperature,
+        apogee,
+        battery_level_pi,
+        battery_level_tx,
+        roll,
+        pitch,
+        yaw,
+        time_of_landing,
+        max_velocity,
+        landing_velocity,
+        crew_survivability,
+    ) = match.groups()
+    return TransmitterDataPacket(
+        temperature=np.float64((float(temperature) - 32) * 5 / 9),
+        apogee=np.float64(float(apogee) / FEET_PER_METER),
+        battery_level_pi=float(battery_level_pi),
+        battery_level_tx=float(battery_level_tx),
+        orientation=(np.float64(roll), np.float64(pitch), np.float64(yaw)),
+        time_of_landing=time_of_landing,
+        max_velocity=np.float64(float(max_velocity) / FEET_PER_METER),
+        landing_velocity=np.float64(float(landing_velocity) / FEET_PER_METER),
+        crew_survivability=np.float64(float(crew_survivability) / 100),
+        landing_coords=landing_coords,
+    )
+
+
+def decode_transmission(
+    frame: bytes,
+) -> tuple[str, TransmitterDataPacket | StatusDataPacket] | None:
+    """
+    Decodes one of our transmissions, as received by the ground station.
+    :param frame: The AX.25 frame, without the flags and the FCS.
+    :return: The callsign it was sent from and its data packet or in-flight status, or None if it
+    isn't one of ours.
+    """
+    ui_frame = parse_ui_frame(frame)
+    if ui_frame is None:
+        return None
+    if ui_frame.info.startswith(b">"):
+        status = decode_status_telemetry(ui_frame.info[1:].decode("latin-1"))
+        return None if status is None else (ui_frame.source, status)
+    position_report = parse_position_report(ui_frame.info)
+    if position_report is None:
+        return None
+    landing_coords = (position_report.latitude, position_report.longitude)
+    if position_report.comment.startswith(COMPACT_TELEMETRY_PREFIX):
+        packet = decode_compact_telemetry(position_report.comment, landing_coords)
+    else:
+        packet = parse_compressed_packet(position_report.comment, landing_coords)
+    if packet is None:
+        return None
+    return ui_frame.source, packet
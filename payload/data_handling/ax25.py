@@ -0,0 +1,148 @@
+"""Module for building and parsing AX.25 UI frames, which is how APRS packets are sent over the
+air. The frames here don't include the flags and the FCS, those are added by the TNC (Direwolf)."""
+
+import msgspec
+
+AX25_CONTROL_UI = 0x03
+"""The control field of an unnumbered information (UI) frame."""
+
+AX25_PID_NO_LAYER_3 = 0xF0
+"""The protocol identifier used by APRS, meaning there is no layer 3 protocol."""
+
+AX25_ADDRESS_LENGTH = 7
+"""The number of bytes of an encoded address: 6 for the callsign and 1 for the SSID."""
+
+
+class AX25Frame(msgspec.Struct):
+    """
+    The decoded contents of a UI frame.
+    """
+
+    source: str
+    """The callsign of the station which sent the frame, with its SSID if it isn't 0."""
+    destination: str
+    """For APRS, this identifies the software which sent the frame."""
+    path: tuple[str, ...]
+    """The digipeaters the frame should go through."""
+    info: bytes
+    """The information field, i.e. the APRS packet."""
+
+
+def encode_address(address: str, last: bool) -> bytes:
+    """
+    Encodes an address like "KQ4VOH-11" into the 7 bytes of an AX.25 address field.
+    :param address: The callsign, optionally followed by a dash and the SSID.
+    :param last: Whether this is the last address of the frame.
+    :return: The encoded address.
+    """
+    callsign, _, ssid = address.upper().partition("-")
+    if not 1 <= len(callsign) <= 6 or not callsign.isalnum():
+        raise ValueError(f"Invalid callsign: {address}")
+    ssid_number = int(ssid) if ssid else 0
+    if not 0 <= ssid_number <= 15:
+        raise ValueError(f"Invalid SSID: {address}")
+
+    # Every character is shifted left by one bit, and the callsign is padded with spaces
+    encoded = bytes(ord(character) << 1 for character in callsign.ljust(6))
+    # The two reserved bits are set, and the lowest bit marks the end of the address fields
+    return encoded + bytes([0x60 | ssid_number << 1 | last])
+
+
+def decode_address(encoded: bytes) -> str:
+    """
+    Decodes the 7 bytes of an AX.25 address field.
+    :param encoded: The encoded address.
+    :return: The callsign, followed by a dash and the SSID if it isn't 0.
+    """
+    callsign = bytes(byte >> 1 for byte in encoded[:6]).decode("ascii").rstrip()
+    ssid_number = encoded[6] >> 1 & 0x0F
+    return f"{callsign}-{ssid_number}" if ssid_number else callsign
+
+
+def build_ui_frame(source: str, destination: str, info: bytes, path: tuple[str, ...] = ()) -> bytes:
+    """
+    Builds an AX.25 UI frame, without the flags and the FCS.
+    :param source: The callsign of our station.
+    :param destination: The destination address, for APRS this is the "tocall".
+    :param info: The information field of the frame.
+    :param path: The digipeaters the frame should go through, e.g. ("WIDE2-1",).
+    :return: The frame.
+    """
+    addresses = [destination, source, *path]
+    header = b"".join(
+        encode_address(address, last=i == len(addresses) - 1) for i, address in enumerate(addresses)
+    )
+    return header + bytes([AX25_CONTROL_UI, AX25_PID_NO_LAYER_3]) + info
+
+
+def parse_ui_frame(frame: bytes) -> AX25Frame | None:
+    """
+    Parses an AX.25 UI frame, without the flags and the FCS.
+    :param frame: The frame to parse.
+    :return: The decoded frame, or None if it isn't a valid UI frame.
+    """
+    addresses = []
+    offset = 0
+    while offset + AX25_ADDRESS_LENGTH <= len(frame):
+        encoded = frame[offset : offset + AX25_ADDRESS_LENGTH]
+        offset += AX25_ADDRESS_LENGTH
+        try:
+            addresses.append(decode_address(encoded))
+        except UnicodeDecodeError:
+            return None
+        if encoded[6] & 0x01:
+            break
+    else:
+        return None
+
+    if len(addresses) < 2 or frame[offset : offset + 2] != bytes(
+        [AX25_CONTROL_UI, AX25_PID_NO_LAYER_3]
+    ):
+        return None
+    destination, source, *path = addresses
+    return AX25Frame(source, destination, tuple(path), frame[offset + 2 :])
+
+
+def estimate_air_time(frame: bytes, baud_rate: int) -> float:
+    """
+    Estimates how long the frame takes to transmit, assuming the worst case of bit stuffing.
+    :param frame: The frame, without the flags and the FCS.
+    :param baud_rate: The baud rate of the modem.
+    :return: The air time in seconds, not counting the TX delay of the TNC.
+    """
+    # The frame is followed by a 2 byte FCS, and surrounded by two flags
+    bits = (len(frame) + 4) * 8
+    # Bit stuffing adds at most one bit after every 5 bits
+    return bits * 6 / 5 / baud_rate
+
+
+def _make_fcs_table() -> tuple[int, ...]:
+    """
+    Makes the lookup table of the CRC-16/X.25 used for the FCS, one entry per byte value.
+    :return: The table.
+    """
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            # 0x8408 is the CCITT polynomial 0x1021 with its bits reversed, since AX.25 sends the
+            # least significant bit first
+            crc = crc >> 1 ^ 0x8408 if crc & 1 else crc >> 1
+        table.append(crc)
+    return tuple(table)
+
+
+FCS_TABLE = _make_fcs_table()
+"""The lookup table for `compute_fcs`."""
+
+
+def compute_fcs(frame: bytes) -> bytes:
+    """
+    Computes the frame check sequence of a frame, which the TNC normally adds for us.
+    :param frame: The frame, without the flags and the FCS.
+    :return: The 2 bytes of the FCS, in the order they are transmitted.
+    """
+    crc = 0xFFFF
+    for byte in frame:
+        crc = crc >> 8 ^ FCS_TABLE[(crc ^ byte) & 0xFF]
+    return (crc ^ 0xFFFF).to_bytes(2, "little")
@@ -0,0 +1,294 @@
+"""Module for the compact encoding of our telemetry. Every field of the TransmitterDataPacket is
+sent as a fixed-point number written in base 91, like the APRS compressed positions, so a beacon
+takes a fraction of the air time of the text made by `TransmitterDataPacket.compress_packet`."""
+
+import math
+
+import msgspec
+import numpy as np
+
+from payload.data_handling.packets.status_data_packet import StatusDataPacket
+from payload.data_handling.packets.transmitter_data_packet import TransmitterDataPacket
+
+BASE91_OFFSET = 33
+"""Base 91 digits are written as the printable ASCII characters from "!" (33) to "{" (123)."""
+
+COMPACT_TELEMETRY_PREFIX = "~"
+"""The first character of a compact telemetry comment. It is never a base 91 digit, and a text
+comment never starts with it."""
+
+COMPACT_TELEMETRY_VERSION = "1"
+"""The version of the layout of the fields, which follows the prefix. It must be changed whenever
+`TELEMETRY_FIELDS` changes, so the ground station can still decode old recordings."""
+
+STATUS_TELEMETRY_VERSION = "s"
+"""Takes the place of the version for the in-flight status, which has its own layout of fields,
+`STATUS_FIELDS`, after the letter of the state."""
+
+STATE_NAMES = "SMCFL"
+"""The letters of the states, which are sent as they are in the in-flight status."""
+
+
+def encode_base91(value: int, length: int) -> str:
+    """
+    Writes a number in base 91, most significant digit first.
+    :param value: The number, from 0 to 91**length - 1.
+    :param length: The number of digits.
+    :return: The digits.
+    """
+    digits = []
+    for _ in range(length):
+        value, digit = divmod(value, 91)
+        digits.append(chr(digit + BASE91_OFFSET))
+    return "".join(reversed(digits))
+
+
+def decode_base91(digits: str) -> int | None:
+    """
+    Reads a number written in base 91.
+    :param digits: The digits, most significant first.
+    :return: The number, or None if one of the characters isn't a base 91 digit.
+    """
+    value = 0
+    for character in digits:
+        digit = ord(character) - BASE91_OFFSET
+        if not 0 <= digit < 91:
+            return None
+        value = value * 91 + digit
+    return value
+
+
+class FixedPointField(msgspec.Struct, frozen=True):
+    """
+    A field of the compact telemetry, sent as a whole number of `resolution` steps above
+    `minimum`. The largest number of steps is reserved for values which aren't available (nan).
+    """
+
+    name: str
+    resolution: float
+    """The reporting precision of the field. Values are rounded to the nearest step."""
+    minimum: float
+    """The smallest value which can be sent. Smaller values are sent as the minimum."""
+    length: int
+    """The number of base 91 digits of the field."""
+
+    @property
+    def maximum(self) -> float:
+        """
+        Returns the largest value which can be sent. Larger values are sent as the maximum.
+        """
+        return self.minimum + (91**self.length - 2) * self.resolution
+
+    def encode(self, value: float) -> str:
+        """
+        :param value: The value of the field.
+        :return: The base 91 digits of the value.
+        """
+        missing = 91**self.length - 1
+        if not math.isfinite(value):
+            return encode_base91(missing, self.length)
+        steps = round((value - self.minimum) / self.resolution)
+        return encode_base91(min(max(steps, 0), missing - 1), self.length)
+
+    def decode(self, digits: str) -> float | None:
+        """
+        :param digits: The base 91 digits of the value.
+        :return: The value, nan if it wasn't available, or None if the digits aren't valid.
+        """
+        steps = decode_base91(digits)
+        if steps is None:
+            return None
+        if steps == 91**self.length - 1:
+            return math.nan
+        # Rounding to the resolution removes the floating point error of the multiplication
+        decimals = max(0, -math.floor(math.log10(self.resolution)))
+        return round(self.minimum + steps * self.resolution, decimals)
+
+
+TELEMETRY_FIELDS = (
+    FixedPointField("temperature", resolution=0.01, minimum=-200.0, length=3),
+    FixedPointField("apogee", resolution=0.01, minimum=-500.0, length=3),
+    FixedPointField("battery_level_pi", resolution=0.01, minimum=0.0, length=3),
+    FixedPointField("battery_level_tx", resolution=0.01, minimum=0.0, length=3),
+    FixedPointField("roll", resolution=0.01, minimum=-3600.0, length=3),
+    FixedPointField("pitch", resolution=0.01, minimum=-3600.0, length=3),
+    FixedPointField("yaw", resolution=0.01, minimum=-3600.0, length=3),
+    FixedPointField("time_of_landing", resolution=1, minimum=0, length=3),
+    FixedPointField("max_velocity", resolution=0.01, minimum=-1000.0, length=3),
+    FixedPointField("landing_velocity", resolution=0.01, minimum=-1000.0, length=3),
+    FixedPointField("crew_survivability", resolution=0.001, minimum=0.0, length=2),
+)
+"""The fields of version 1, in the order they are sent. The units are those of the data packet:
+degrees Celsius, meters, percent, degrees, seconds since midnight UTC, meters per second, and a
+fraction for the crew survivability."""
+
+COMPACT_TELEMETRY_LENGTH = (
+    len(COMPACT_TELEMETRY_PREFIX)
+    + len(COMPACT_TELEMETRY_VERSION)
+    + sum(field.length for field in TELEMETRY_FIELDS)
+)
+"""The number of characters of a compact telemetry comment."""
+
+
+STATUS_FIELDS = (
+    FixedPointField("current_altitude", resolution=0.1, minimum=-500.0, length=3),
+    FixedPointField("vertical_velocity", resolution=0.1, minimum=-1000.0, length=3),
+    FixedPointField("crew_survivability", resolution=0.001, minimum=0.0, length=2),
+)
+"""The fields of the in-flight status, in the order they are sent, in meters, meters per second
+and a fraction."""
+
+STATUS_TELEMETRY_LENGTH = (
+    len(COMPACT_TELEMETRY_PREFIX)
+    + len(STATUS_TELEMETRY_VERSION)
+    + 1
+    + sum(field.length for field in STATUS_FIELDS)
+)
+"""The number of characters of an in-flight status."""
+
+
+def _time_to_seconds(time_of_landing: str) -> float:
+    """
+    :param time_of_landing: A time as "HH:MM:SS".
+    :return: The seconds since midnight, or nan if it isn't a time.
+    """
+    try:
+        hours, minutes, seconds = (int(part) for part in time_of_landing.split(":"))
+    except ValueError:
+        return math.nan
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def _seconds_to_time(seconds: float) -> str:
+    """
+    :param seconds: The seconds since midnight, or nan.
+    :return: The time as "HH:MM:SS", or an empty string if it wasn't available.
+    """
+    if math.isnan(seconds):
+        return ""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02}:{minutes:02}:{seconds:02}"
+
+
+def encode_compact_telemetry(message: TransmitterDataPacket) -> str:
+    """
+    Encodes the data packet as a compact telemetry comment. The landing coordinates aren't
+    included, since they are sent as the position of the beacon.
+    :param message: The data packet.
+    :return: The comment.
+    """
+    roll, pitch, yaw = message.orientation
+    values = (
+        message.temperature,
+        message.apogee,
+        message.battery_level_pi,
+        message.battery_level_tx,
+        roll,
+        pitch,
+        yaw,
+        _time_to_seconds(message.time_of_landing),
+        message.max_velocity,
+        message.landing_velocity,
+        message.crew_survivability,
+    )
+    return (
+        COMPACT_TELEMETRY_PREFIX
+        + COMPACT_TELEMETRY_VERSION
+        + "".join(
+            field.encode(float(value))
+            for field, value in zip(TELEMETRY_FIELDS, values, strict=True)
+        )
+    )
+
+
+def decode_compact_telemetry(
+    comment: str, landing_coords: tuple[float, float]
+) -> TransmitterDataPacket | None:
+    """
+    Decodes a compact telemetry comment back into a data packet.
+    :param comment: The comment of the position report.
+    :param landing_coords: The position of the position report.
+    :return: The data packet, or None if the comment isn't compact telemetry of a known version.
+    """
+    header = COMPACT_TELEMETRY_PREFIX + COMPACT_TELEMETRY_VERSION
+    if not comment.startswith(header) or len(comment) != COMPACT_TELEMETRY_LENGTH:
+        return None
+
+    values = []
+    offset = len(header)
+    for field in TELEMETRY_FIELDS:
+        value = field.decode(comment[offset : offset + field.length])
+        if value is None:
+            return None
+        values.append(value)
+        offset += field.length
+
+    (
+        temperature,
+        apogee,
+        battery_level_pi,
+        battery_level_tx,
+        roll,
+        pitch,
+        yaw,
+        time_of_landing,
+        max_velocity,
+        landing_velocity,
+        crew_survivability,
+    ) = values
+    return TransmitterDataPacket(
+        temperature=np.float64(temperature),
+        apogee=np.float64(apogee),
+        battery_level_pi=battery_level_pi,
+        battery_level_tx=battery_level_tx,
+        orientation=(np.float64(roll), np.float64(pitch), np.float64(yaw)),
+        time_of_landing=_seconds_to_time(time_of_landing),
+        max_velocity=np.float64(max_velocity),
+        landing_velocity=np.float64(landing_velocity),
+        crew_survivability=np.float64(crew_survivability),
+        landing_coords=landing_coords,
+    )
+
+
+def encode_status_telemetry(status: StatusDataPacket) -> str:
+    """
+    Encodes the in-flight status like the compact telemetry.
+    :param status: The in-flight status.
+    :return: The text of the status.
+    """
+    values = (status.current_altitude, status.vertical_velocity, status.crew_survivability)
+    return (
+        COMPACT_TELEMETRY_PREFIX
+        + STATUS_TELEMETRY_VERSION
+        + status.state_name
+        + "".join(
+            field.encode(float(value)) for field, value in zip(STATUS_FIELDS, values, strict=True)
+        )
+    )
+
+
+def decode_status_telemetry(text: str) -> StatusDataPacket | None:
+    """
+    Decodes an in-flight status made by `encode_status_telemetry`.
+    :param text: The text of the status.
+    :return: The in-flight status, or None if the text isn't one.
+    """
+    header = COMPACT_TELEMETRY_PREFIX + STATUS_TELEMETRY_VERSION
+    if not text.startswith(header) or len(text) != STATUS_TELEMETRY_LENGTH:
+        return None
+    state_name = text[len(header)]
+    if state_name not in STATE_NAMES:
+        return None
+
+    values = []
+    offset = len(header) + 1
+    for field in STATUS_FIELDS:
+        value = field.decode(text[offset : offset + field.length])
+        if value is None:
+            return None
+        values.append(value)
+        offset += field.length
+
+    current_altitude, vertical_velocity, crew_survivability = values
+    return StatusDataPacket(state_name, current_altitude, vertical_velocity, crew_survivability)
@@ -0,0 +1,245 @@
+"""Module for the DataBus class, which passes the data of every loop on to whoever needs it."""
+
+import time
+from collections import deque
+from collections.abc import Callable
+from typing import Any
+
+from payload.constants import (
+    DATA_BUS_ERROR_REPORT_INTERVAL,
+    DATA_BUS_SUBSCRIPTION_CAPACITY,
+    DropPolicy,
+)
+from payload.data_handling.packets.data_bus_statistics_packet import (
+    SubscriberStatisticsPacket,
+    TopicStatisticsPacket,
+)
+from payload.data_handling.packets.payload_snapshot import PayloadSnapshot
+
+type PacketHandler[T] = Callable[[T], None]
+"""Handles a packet as soon as it is published. It runs on the publishing thread, so it should be
+quick, e.g. putting the packet on a queue. If it raises, the error is counted and the packet isn't
+delivered, but the other subscribers still get it."""
+
+
+class Topic[T]:
+    """
+    A kind of data published on the DataBus. Every packet published on it must be of the topic's
+    type, so a subscriber knows what it gets. The type is checked when publishing as well.
+    """
+
+    __slots__ = ("name", "packet_type")
+
+    def __init__(self, name: str, packet_type: type[T]) -> None:
+        """
+        :param name: The name of the topic, used in the statistics.
+        :param packet_type: The type of the packets published on it.
+        """
+        self.name = name
+        self.packet_type = packet_type
+
+
+SNAPSHOT_TOPIC: Topic[PayloadSnapshot] = Topic("snapshot", PayloadSnapshot)
+"""The snapshot of every loop, published by the PayloadContext at the end of the loop."""
+
+
+class Subscription[T]:
+    """
+    A subscriber of a topic. A subscription with a handler has every packet handed to it right
+    away on the publishing thread, so the handler must be quick, like putting the packet on a
+    queue. Otherwise the packets are kept in a bounded buffer, which the subscriber reads at its
+    own pace with `drain`, e.g. from its own thread. The flight loop is the only one adding to
+    the buffer, and a deque can be added to and taken from on different threads without a lock.
+    """
+
+    __slots__ = (
+        "_buffer",
+        "_offered",
+        "capacity",
+        "decimation",
+        "delivered",
+        "dropped",
+        "errors",
+        "handler",
+        "latest",
+        "name",
+        "policy",
+        "topic",
+    )
+
+    def __init__(
+        self,
+        topic: Topic[T],
+        name: str,
+        handler: PacketHandler[T] | None,
+        *,
+        capacity: int,
+        decimation: int,
+        policy: DropPolicy,
+    ) -> None:
+        """
+        :param topic: The topic subscribed to.
+        :param name: The name of the subscriber, used in the statistics.
+        :param handler: If given, it is called with every packet instead of buffering it.
+        :param capacity: The number of packets the buffer holds.
+        :param decimation: Only every Nth packet is delivered, starting with the first.
+        :param policy: What to do with a packet when the buffer is full.
+        """
+        if capacity < 1 or decimation < 1:
+            raise ValueError(
+                f"The capacity and decimation must be at least 1, not {capacity} and {decimation}"
+            )
+        self.topic = topic
+        self.name = name
+        self.handler = handler
+        self.capacity = capacity
+        self.decimation = decimation
+        self.policy = policy
+        # With DROP_OLDEST and KEEP_LATEST the deque drops the oldest packet by itself when it is
+        # full
+        self._buffer: deque[T] = deque(
+            maxlen=None if policy == DropPolicy.DROP_NEWEST else capacity
+        )
+        self._offered = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0
+        self.latest: T | None = None
+        """The last packet delivered, which stays here after it is drained."""
+
+    def drain(self) -> list[T]:
+        """
+        Takes every packet waiting in the buffer, oldest first.
+        """
+        packets = []
+        while True:
+            try:
+                packets.append(self._buffer.popleft())
+            except IndexError:
+                return packets
+
+    def statistics(self) -> SubscriberStatisticsPacket:
+        """
+        Returns how the subscriber is keeping up.
+        """
+        return SubscriberStatisticsPacket(
+            self.name, self.delivered, self.dropped, self.errors, len(self._buffer)
+        )
+
+    def _offer(self, packet: T) -> None:
+        """
+        Delivers a packet, unless it is skipped by the decimation or dropped.
+        :param packet: The packet published on the topic.
+        """
+        self._offered += 1
+        if (self._offered - 1) % self.decimation:
+            return
+        if self.handler is not None:
+            # A subscriber which fails mustn't take the flight loop or the other subscribers down
+            try:
+                self.handler(packet)
+            except Exception as e:
+                self.errors += 1
+                if self.errors == 1 or self.errors % DATA_BUS_ERROR_REPORT_INTERVAL == 0:
+                    print(
+                        f"Data bus subscriber {self.name} failed to handle a packet (error "
+                        f"{self.errors}): {e!r}"
+                    )
+                return
+        else:
+            if len(self._buffer) >= self.capacity and self.policy != DropPolicy.KEEP_LATEST:
+                self.dropped += 1
+                if self.policy == DropPolicy.DROP_NEWEST:
+                    return
+            self._buffer.append(packet)
+        self.delivered += 1
+        self.latest = packet
+
+
+class DataBus:
+    """
+    Passes the packets published on each topic on to every subscriber of the topic. This way the
+    flight loop publishes the data of a loop once, and the logger, the display, the telemetry
+    stream and the dashboard each take it at their own rate, without the flight loop knowing
+    about any of them. A subscriber which falls behind loses packets, rather than slowing down
+    the flight loop.
+    """
+
+    __slots__ = ("_publish_max_ns", "_publish_total_ns", "_published", "_subscriptions")
+
+    def __init__(self) -> None:
+        self._subscriptions: dict[Topic[Any], list[Subscription[Any]]] = {}
+        self._published: dict[Topic[Any], int] = {}
+        self._publish_total_ns: dict[Topic[Any], int] = {}
+        self._publish_max_ns: dict[Topic[Any], int] = {}
+
+    def subscribe[T](
+        self,
+        topic: Topic[T],
+        name: str,
+        handler: PacketHandler[T] | None = None,
+        *,
+        capacity: int = DATA_BUS_SUBSCRIPTION_CAPACITY,
+        decimation: int = 1,
+        policy: DropPolicy = DropPolicy.DROP_OLDEST,
+    ) -> Subscription[T]:
+        """
+        Subscribes to a topic. See `Subscription` for the arguments.
+        :return: The subscription, which the packets are read from if there is no handler.
+        """
+        subscription = Subscription(
+            topic, name, handler, capacity=capacity, decimation=decimation, policy=policy
+        )
+        # The list is replaced rather than changed, so a publish on another thread can keep
+        # going through the old one
+        self._subscriptions[topic] = [*self._subscriptions.get(topic, []), subscription]
+        self._published.setdefault(topic, 0)
+        self._publish_total_ns.setdefault(topic, 0)
+        self._publish_max_ns.setdefault(topic, 0)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription[Any]) -> None:
+        """
+        Stops delivering packets to a subscription.
+        :param subscription: The subscription returned by `subscribe`.
+        """
+        self._subscriptions[subscription.topic] = [
+            other for other in self._subscriptions[subscription.topic] if other is not subscription
+        ]
+
+    def publish[T](self, topic: Topic[T], packet: T) -> None:
+        """
+        Delivers a packet to every subscriber of the topic.
+        :param topic: The topic to publish on.
+        :param packet: The packet, which must be of the topic's type.
+        """
+        if not isinstance(packet, topic.packet_type):
+            raise TypeError(
+                f"The {topic.name} topic takes {topic.packet_type.__name__}, not "
+                f"{type(packet).__name__}"
+            )
+        subscriptions = self._subscriptions.get(topic)
+        if not subscriptions:
+            return
+        start_ns = time.perf_counter_ns()
+        for subscription in subscriptions:
+            subscription._offer(packet)
+        duration_ns = time.perf_counter_ns() - start_ns
+        self._published[topic] += 1
+        self._publish_total_ns[topic] += duration_ns
+        self._publish_max_ns[topic] = max(self._publish_max_ns[topic], duration_ns)
+
+    def statistics(self) -> list[TopicStatisticsPacket]:
+        """
+        Returns the statistics of every topic which has had a subscriber.
+        """
+        return [
+            TopicStatisticsPacket(
+                topic.name,
+                self._published[topic],
+                self._publish_total_ns[topic],
+                self._publish_max_ns[topic],
+                [subscription.statistics() for subscription in subscriptions],
+            )
+            for topic, subscriptions in self._subscriptions.items()
+        ]
@@ -0,0 +1,130 @@
+"""Module for the KISS protocol, which we use to hand AX.25 frames to Direwolf over TCP. Direwolf
+adds the flags and the FCS, modulates the frame and plays it on the sound card."""
+
+import socket
+import time
+
+KISS_FEND = 0xC0
+"""Marks the start and the end of a KISS frame."""
+KISS_FESC = 0xDB
+"""Escapes a FEND or a FESC in the data."""
+KISS_TFEND = 0xDC
+"""Follows a FESC to represent a FEND in the data."""
+KISS_TFESC = 0xDD
+"""Follows a FESC to represent a FESC in the data."""
+KISS_DATA_FRAME = 0x00
+"""The command of a frame which contains data to transmit, on port 0."""
+
+
+def encode_kiss_frame(frame: bytes, port: int = 0) -> bytes:
+    """
+    Wraps an AX.25 frame in a KISS data frame.
+    :param frame: The AX.25 frame, without the flags and the FCS.
+    :param port: The radio channel of the TNC to transmit the frame on.
+    :return: The KISS frame.
+    """
+    escaped = frame.replace(bytes([KISS_FESC]), bytes([KISS_FESC, KISS_TFESC])).replace(
+        bytes([KISS_FEND]), bytes([KISS_FESC, KISS_TFEND])
+    )
+    return bytes([KISS_FEND, port << 4 | KISS_DATA_FRAME]) + escaped + bytes([KISS_FEND])
+
+
+class KISSDecoder:
+    """
+    Splits a stream of bytes into the AX.25 frames of the KISS data frames in it. The other KISS
+    commands (TX delay, persistence...) are ignored.
+    """
+
+    __slots__ = ("_buffer",)
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> list[bytes]:
+        """
+        Adds bytes received from the stream.
+        :param data: The received bytes.
+        :return: The AX.25 frames which were completed by these bytes.
+        """
+        self._buffer += data
+        frames = []
+        while (end := self._buffer.find(KISS_FEND, 1)) != -1:
+            content = bytes(self._buffer[:end]).lstrip(bytes([KISS_FEND]))
+            del self._buffer[:end]
+            # Consecutive FENDs are allowed, so a frame can be empty
+            if not content or content[0] & 0x0F != KISS_DATA_FRAME:
+                continue
+            frames.append(
+                content[1:]
+                .replace(bytes([KISS_FESC, KISS_TFEND]), bytes([KISS_FEND]))
+                .replace(bytes([KISS_FESC, KISS_TFESC]), bytes([KISS_FESC]))
+            )
+        return frames
+
+
+class KISSClient:
+    """
+    A TCP connection to the KISS port of a TNC. It is used from the transmitter's worker thread.
+    """
+
+    __slots__ = ("_host", "_port", "_socket")
+
+    def __init__(self, host: str, port: int) -> None:
+        """
+        :param host: The host the TNC is running on.
+        :param port: The KISS TCP port of the TNC.
+        """
+        self._host = host
+        self._port = port
+        self._socket: socket.socket | None = None
+
+    @property
+    def is_connected(self) -> bool:
+        """
+        Returns whether we are connected to the TNC.
+        """
+        return self._socket is not None
+
+    def connect(self, timeout: float) -> bool:
+        """
+        Connects to the TNC, retrying until it accepts the connection, since it takes a moment for
+        Direwolf to open its KISS port after it is started.
+        :param timeout: How long to keep retrying for, in seconds.
+        :return: True if we are connected, False otherwise.
+        """
+        deadline = time.monotonic() + timeout
+        while self._socket is None:
+            try:
+                self._socket = socket.create_connection((self._host, self._port), timeout=timeout)
+            except OSError as e:
+                if time.monotonic() >= deadline:
+                    print(f"Could not connect to the KISS port {self._host}:{self._port}: {e}")
+                    return False
+                time.sleep(0.1)
+        # Frames are small and should go out immediately, rather than being batched by Nagle
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return True
+
+    def send_frame(self, frame: bytes) -> bool:
+        """
+        Sends an AX.25 frame to the TNC to be transmitted.
+        :param frame: The AX.25 frame, without the flags and the FCS.
+        :return: True if the frame was sent, False if we aren't connected or the connection broke.
+        """
+        if self._socket is None:
+            return False
+        try:
+            self._socket.sendall(encode_kiss_frame(frame))
+        except OSError as e:
+            print(f"Lost the connection to the KISS port: {e}")
+            self.close()
+            return False
+        return True
+
+    def close(self) -> None:
+        """
+        Closes the connection to the TNC.
+        """
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
@@ -0,0 +1,112 @@
+"""Module for the sidecar index of a log, which lets us jump to the flight phases and events of a
+log without parsing all of it."""
+
+import os
+from pathlib import Path
+from typing import BinaryIO, Literal
+
+import msgspec
+
+IndexEntryKind = Literal["state", "timestamp", "received_message", "transmitted_message"]
+
+
+class LogIndexEntry(msgspec.Struct, array_like=True):
+    """
+    Points to a row of the log. The row can be read by seeking to `offset` in the segment
+    `segment`. This is encoded as a JSON array to keep the index small.
+    """
+
+    kind: IndexEntryKind
+    """Why the row was indexed: the state changed, it's one of the periodic timestamp entries, or
+    a message was received or transmitted."""
+    row_number: int
+    """The number of the row in the whole log, starting at 0 and not counting the headers."""
+    segment: int
+    """The index of the segment the row is in, in the manifest."""
+    offset: int
+    """The byte offset of the row in the uncompressed segment."""
+    timestamp: float | None
+    """The IMU timestamp of the row."""
+    value: str | None = None
+    """The new state name or message, for the state and message entries."""
+
+
+class LogIndexWriter:
+    """
+    Writes the index of a log as JSON lines, as the rows are written to the log. It records every
+    change of state, every change of the received and transmitted messages, and the position of
+    every Nth row so that we can seek to any time in the log.
+
+    This is only used in the logger process.
+    """
+
+    EVENT_FIELDS: tuple[IndexEntryKind, ...] = ("received_message", "transmitted_message")
+    """The fields which are indexed every time their value changes."""
+
+    __slots__ = (
+        "_encoder",
+        "_file",
+        "_last_values",
+        "_row_number",
+        "_timestamp_interval",
+    )
+
+    def __init__(self, index_path: Path, timestamp_interval: int) -> None:
+        """
+        :param index_path: The path of the index file.
+        :param timestamp_interval: Every how many rows a timestamp entry is written.
+        """
+        self._file: BinaryIO = index_path.open("wb")
+        self._encoder = msgspec.json.Encoder()
+        self._timestamp_interval = timestamp_interval
+        self._row_number = 0
+        # The value of the indexed fields in the last row, so we know when they change
+        self._last_values: dict[str, object] = {}
+
+    def add_row(self, row: dict[str, object], segment: int, offset: int) -> None:
+        """
+        Adds the entries for a row which was just written to the log.
+        :param row: The row which was written.
+        :param segment: The index of the segment the row was written to.
+        :param offset: The byte offset of the row in the segment.
+        """
+        row_number = self._row_number
+        self._row_number += 1
+
+        timestamp = row.get("timestamp")
+        timestamp = float(timestamp) if timestamp is not None else None
+
+        state_name = row.get("state_name")
+        if state_name != self._last_values.get("state_name"):
+            self._last_values["state_name"] = state_name
+            self._write(LogIndexEntry("state", row_number, segment, offset, timestamp, state_name))
+        elif row_number % self._timestamp_interval == 0:
+            self._write(LogIndexEntry("timestamp", row_number, segment, offset, timestamp))
+
+        for field in LogIndexWriter.EVENT_FIELDS:
+            value = row.get(field)
+            if value != self._last_values.get(field, value):
+                self._write(LogIndexEntry(field, row_number, segment, offset, timestamp, value))
+            self._last_values[field] = value
+
+    def flush(self) -> None:
+        """
+        Gives the index to the OS. We don't fsync it every time, since it can be rebuilt from the
+        log if it is lost.
+        """
+        self._file.flush()
+
+    def close(self) -> None:
+        """
+        Writes the index to the disk and closes it.
+        """
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+    def _write(self, entry: LogIndexEntry) -> None:
+        """
+        Writes an entry to the index as one line.
+        :param entry: The entry to write.
+        """
+        self._file.write(self._encoder.encode(entry) + b"\n")
@@ -0,0 +1,165 @@
+"""Module for reading the segmented logs written by the Logger."""
+
+import csv
+import gzip
+import io
+import itertools
+import lzma
+from collections.abc import Iterator
+from pathlib import Path
+from typing import BinaryIO
+
+import msgspec
+
+from payload.constants import LOG_INDEX_NAME, LOG_MANIFEST_NAME, SYSTEM_LOG_NAME
+from payload.data_handling.log_index import LogIndexEntry
+from payload.data_handling.log_segments import LogManifest, LogSegment
+from payload.data_handling.write_ahead_log import iter_records
+
+
+class LogReader:
+    """
+    Reads a log written by the Logger. It uses the manifest to stream the rows of all the segments
+    of the log in order, as if they were one CSV file, regardless of whether the segments are
+    compressed or not.
+
+    It can also use the index of the log to jump straight to a flight phase, an event, or a time
+    range, without parsing the rows before it.
+    """
+
+    __slots__ = ("log_dir", "manifest")
+
+    def __init__(self, log_dir: Path) -> None:
+        """
+        :param log_dir: The directory of the log, e.g. `logs/log_1`.
+        """
+        self.log_dir = log_dir
+        self.manifest = msgspec.json.decode(
+            (log_dir / LOG_MANIFEST_NAME).read_bytes(), type=LogManifest
+        )
+
+    @property
+    def fieldnames(self) -> list[str]:
+        """The columns of the log."""
+        return self.manifest.fieldnames
+
+    def open_segment(self, segment: LogSegment) -> BinaryIO:
+        """
+        Opens the segment for reading, decompressing it if needed.
+        :param segment: The segment to open.
+        :return: The file object, in binary mode.
+        """
+        path = self.log_dir / segment.file_name
+        match segment.compression:
+            case "gzip":
+                return gzip.open(path, "rb")
+            case "lzma":
+                return lzma.open(path, "rb")
+            case _:
+                return path.open("rb")
+
+    def iter_segment_rows(self, segment: LogSegment, offset: int = 0) -> Iterator[dict[str, str]]:
+        """
+        Yields the rows of one segment as dictionaries.
+        :param segment: The segment to read.
+        :param offset: The byte offset of the first row (or record) to read, e.g. from the index.
+        If it is 0, the segment is read from the start.
+        """
+        with self.open_segment(segment) as binary_file:
+            if segment.log_format == "wal":
+                # Every record is a checksummed line, and we stop at the first damaged record
+                records = iter_records(binary_file.read(), offset)
+                lines = (line.decode() for _, line in records)
+            else:
+                if offset:
+                    binary_file.seek(offset)
+                lines = io.TextIOWrapper(binary_file, newline="")
+                # A segment which wasn't closed properly still has the zeroes from the
+                # preallocation at the end, and its last row might be incomplete:
+                if not segment.closed:
+                    lines = itertools.takewhile(lambda line: "\x00" not in line, lines)
+            # If we skipped the header, we have to tell the csv reader what the columns are
+            yield from csv.DictReader(lines, fieldnames=self.fieldnames if offset else None)
+
+    def iter_rows(self) -> Iterator[dict[str, str]]:
+        """
+        Yields all the rows of the log as dictionaries, segment after segment.
+        """
+        for segment in self.manifest.segments:
+            yield from self.iter_segment_rows(segment)
+
+    def iter_rows_from(self, entry: LogIndexEntry) -> Iterator[dict[str, str]]:
+        """
+        Yields the rows of the log starting at the row pointed to by an index entry, until the end
+        of the log.
+        :param entry: The index entry of the first row.
+        """
+        segments = self.manifest.segments
+        yield from self.iter_segment_rows(segments[entry.segment], entry.offset)
+        for segment in segments[entry.segment + 1 :]:
+            yield from self.iter_segment_rows(segment)
+
+    def read_index(self) -> list[LogIndexEntry]:
+        """
+        Reads the index of the log, in the order of the rows. If the last entry is incomplete
+        (e.g. the power was lost while writing it), it is ignored.
+        :return: The entries of the index.
+        """
+        decoder = msgspec.json.Decoder(LogIndexEntry)
+        entries = []
+        with (self.log_dir / LOG_INDEX_NAME).open("rb") as index_file:
+            for line in index_file:
+                try:
+                    entries.append(decoder.decode(line))
+                except msgspec.DecodeError:
+                    break
+        return entries
+
+    def iter_state_rows(self, state_name: str) -> Iterator[dict[str, str]]:
+        """
+        Yields the rows of a flight phase, e.g. "M" for all the rows in MotorBurnState.
+        :param state_name: The state name, as it is logged.
+        """
+        state_entries = [entry for entry in self.read_index() if entry.kind == "state"]
+        for entry, next_entry in itertools.zip_longest(state_entries, state_entries[1:]):
+            if entry.value != state_name:
+                continue
+            number_of_rows = next_entry.row_number - entry.row_number if next_entry else None
+            yield from itertools.islice(self.iter_rows_from(entry), number_of_rows)
+
+    def iter_rows_between(
+        self, start_timestamp: float, end_timestamp: float
+    ) -> Iterator[dict[str, str]]:
+        """
+        Yields the rows with an IMU timestamp between the start and end timestamps (inclusive). It
+        starts reading from the last indexed row before the start timestamp.
+        :param start_timestamp: The IMU timestamp to start at, in milliseconds.
+        :param end_timestamp: The IMU timestamp to end at, in milliseconds.
+        """
+        start_entry = None
+        for entry in self.read_index():
+            if entry.timestamp is None:
+                continue
+            if entry.timestamp > start_timestamp:
+                break
+            start_entry = entry
+
+        rows = self.iter_rows_from(start_entry) if start_entry else self.iter_rows()
+        for row in rows:
+            timestamp = float(row["timestamp"])
+            if timestamp > end_timestamp:
+                return
+            if timestamp >= start_timestamp:
+                yield row
+
+    def iter_system_rows(self) -> Iterator[dict[str, str]]:
+        """
+        Yields the samples the SystemMonitor wrote next to the log, once a second. They have the
+        IMU timestamp of the latest loop, to line them up with the rows of the log. Logs from before
+        the SystemMonitor have none.
+        """
+        path = self.log_dir / SYSTEM_LOG_NAME
+        if not path.exists():
+            return
+        with path.open(newline="") as system_file:
+            yield from csv.DictReader(system_file)
@@ -0,0 +1,180 @@
+"""Module for the tool which recovers a write-ahead log after a crash or a power loss, e.g. on
+landing impact."""
+
+import argparse
+import mmap
+from collections.abc import Iterator
+from pathlib import Path
+
+import msgspec
+import numpy as np
+
+from payload.constants import (
+    LOG_MANIFEST_NAME,
+    WAL_RECOVERY_CHUNK_BYTES,
+    WAL_RECOVERY_MAX_RECORD_BYTES,
+)
+from payload.data_handling.log_segments import LogManifest
+from payload.data_handling.write_ahead_log import RECORD_HEADER, iter_records, read_record
+
+
+class RecoveryReport(msgspec.Struct):
+    """
+    The result of recovering one write-ahead log segment.
+    """
+
+    file_name: str
+    valid_records: int
+    """The number of records which passed their checksum, including the header line."""
+    valid_bytes: int
+    """The size of the segment after it is truncated after the last valid record."""
+    discarded_bytes: int
+    """The number of bytes after the last valid record which were not preallocated zeroes."""
+    lost_records: int
+    """The number of records which were damaged or came after a damaged record. This is 0 when the
+    segment ends cleanly. Records longer than WAL_RECOVERY_MAX_RECORD_BYTES after the damaged
+    record aren't counted."""
+
+
+def recover_segment(segment_path: Path, truncate: bool = True) -> RecoveryReport:
+    """
+    Finds the last valid record of a write-ahead log segment, and truncates the segment after it.
+    :param segment_path: The path of the (uncompressed) segment.
+    :param truncate: Whether to truncate the segment, or only report what would be lost.
+    :return: What was recovered.
+    """
+    valid_records = 0
+    valid_bytes = 0
+    discarded_bytes = 0
+    lost_records = 0
+
+    with segment_path.open("r+b" if truncate else "rb") as segment_file:
+        if segment_path.stat().st_size:
+            with mmap.mmap(segment_file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                for record_end, _ in iter_records(buffer):
+                    valid_records += 1
+                    valid_bytes = record_end
+
+                # Everything after the valid records which isn't preallocated zeroes was lost:
+                data_end = len(buffer[valid_bytes:].rstrip(b"\x00")) + valid_bytes
+                discarded_bytes = data_end - valid_bytes
+                lost_records = _count_lost_records(buffer, valid_bytes, data_end)
+
+        if truncate:
+            segment_file.truncate(valid_bytes)
+
+    return RecoveryReport(
+        file_name=segment_path.name,
+        valid_records=valid_records,
+        valid_bytes=valid_bytes,
+        discarded_bytes=discarded_bytes,
+        lost_records=lost_records,
+    )
+
+
+def _find_record_candidates(buffer: mmap.mmap, start: int, end: int) -> Iterator[int]:
+    """
+    Yields the offsets between the start and the end where a record could start, in order. Those
+    are the offsets where the length in the header is between 1 and WAL_RECOVERY_MAX_RECORD_BYTES.
+    The lengths at every offset of a chunk are read at once with NumPy, so the search runs at
+    about the speed of reading the data, and only a few offsets are left to check the checksum of.
+    :param buffer: The contents of the segment.
+    :param start: The first offset to search.
+    :param end: The offset the search stops before.
+    """
+    for chunk_start in range(start, end, WAL_RECOVERY_CHUNK_BYTES):
+        # The headers which start at the end of the chunk reach into the next one
+        number_of_offsets = min(chunk_start + WAL_RECOVERY_CHUNK_BYTES, end) - chunk_start
+        chunk = buffer[chunk_start : chunk_start + number_of_offsets + RECORD_HEADER.size - 1]
+        candidates = [np.empty(0, dtype=np.intp)]
+        # A length is read at every 4th offset at once, so this goes over the 4 phases of them
+        for phase in range(4):
+            count = (len(chunk) - phase) // 4
+            if count <= 0:
+                continue
+            lengths = np.frombuffer(chunk, dtype="<u4", count=count, offset=phase)
+            plausible = np.flatnonzero((lengths > 0) & (lengths <= WAL_RECOVERY_MAX_RECORD_BYTES))
+            candidates.append(plausible * 4 + phase)
+        for offset in np.sort(np.concatenate(candidates)):
+            if offset < number_of_offsets:
+                yield chunk_start + int(offset)
+
+
+def _count_lost_records(buffer: mmap.mmap, start: int, end: int) -> int:
+    """
+    Counts the records between the first damaged record and the end of the data. The damaged
+    record counts as one, and every valid record we can find after it is also lost, since we can't
+    trust the data in between.
+    :param buffer: The contents of the segment.
+    :param start: The offset of the first damaged record.
+    :param end: The offset of the end of the data.
+    :return: The number of lost records.
+    """
+    if start >= end:
+        return 0
+    lost_records = 1
+    # A record found inside one we already counted is part of its data
+    next_offset = start + 1
+    for offset in _find_record_candidates(buffer, start + 1, end):
+        if offset < next_offset:
+            continue
+        data = read_record(buffer, offset)
+        if data is not None:
+            lost_records += 1
+            next_offset = offset + RECORD_HEADER.size + len(data)
+    return lost_records
+
+
+def recover_log(log_dir: Path, truncate: bool = True) -> list[RecoveryReport]:
+    """
+    Recovers all the write-ahead log segments of a log which were not closed properly, and updates
+    the manifest with what was recovered.
+    :param log_dir: The directory of the log.
+    :param truncate: Whether to truncate the segments and update the manifest, or only report
+    what would be lost.
+    :return: The reports of the recovered segments.
+    """
+    manifest_path = log_dir / LOG_MANIFEST_NAME
+    manifest = msgspec.json.decode(manifest_path.read_bytes(), type=LogManifest)
+
+    reports = []
+    for segment in manifest.segments:
+        if segment.closed or segment.log_format != "wal":
+            continue
+        report = recover_segment(log_dir / segment.file_name, truncate)
+        reports.append(report)
+        if truncate:
+            # The first record is the header
+            segment.number_of_rows = max(report.valid_records - 1, 0)
+            segment.size_bytes = report.valid_bytes
+            segment.closed = True
+
+    if truncate and reports:
+        manifest_path.write_bytes(msgspec.json.format(msgspec.json.encode(manifest)))
+    return reports
+
+
+def main() -> None:
+    """Entry point of the recovery tool. Run it with `uv run recover logs/log_1`."""
+    parser = argparse.ArgumentParser(
+        description="Recovers a write-ahead log after a crash or a power loss. Every segment which "
+        "was not closed is truncated after its last valid record."
+    )
+    parser.add_argument("log_dir", type=Path, help="The directory of the log, e.g. logs/log_1")
+    parser.add_argument(
+        "-n",
+        "--dry-run",
+        help="Only report what would be lost, without modifying the log.",
+        action="store_true",
+        default=False,
+    )
+    args = parser.parse_args()
+
+    reports = recover_log(args.log_dir, truncate=not args.dry_run)
+    if not reports:
+        print("All the write-ahead log segments were closed properly. Nothing to recover.")
+    for report in reports:
+        print(
+            f"{report.file_name}: kept {report.valid_records} records ({report.valid_bytes} "
+            f"bytes), discarded {report.discarded_bytes} bytes, lost {report.lost_records} records"
+        )
@@ -0,0 +1,298 @@
+"""Module for writing the logs as a series of fixed size, preallocated segment files, which are
+compressed in the background once they are full."""
+
+import contextlib
+import csv
+import gzip
+import io
+import lzma
+import os
+import queue
+import shutil
+import threading
+from pathlib import Path
+from typing import Literal
+
+import msgspec
+
+from payload.constants import LOG_MANIFEST_NAME, LOG_SEGMENT_COMPRESSION_NICENESS
+from payload.data_handling.write_ahead_log import encode_record
+
+Compression = Literal["gzip", "lzma"]
+LogFormat = Literal["csv", "wal"]
+
+COMPRESSION_SUFFIXES: dict[Compression, str] = {"gzip": ".gz", "lzma": ".xz"}
+"""The file suffix added to a segment when it is compressed."""
+
+
+class LogSegment(msgspec.Struct):
+    """
+    Describes one segment of a log in the manifest.
+    """
+
+    file_name: str
+    """The name of the segment file, relative to the log directory. This is the name of the
+    compressed file once the segment has been compressed."""
+    number_of_rows: int = 0
+    """The number of rows (excluding the header) in the segment."""
+    size_bytes: int = 0
+    """The size of the uncompressed segment in bytes."""
+    first_timestamp: float | None = None
+    """The IMU timestamp of the first row in the segment."""
+    last_timestamp: float | None = None
+    """The IMU timestamp of the last row in the segment."""
+    closed: bool = False
+    """Whether the segment was closed properly. If it wasn't, the end of the segment may contain
+    the zeroes from the preallocation."""
+    compression: Compression | None = None
+    """How the segment file is compressed, if it is."""
+    log_format: LogFormat = "csv"
+    """Whether the segment is a plain CSV file, or a write-ahead log of CSV lines."""
+
+
+class LogManifest(msgspec.Struct):
+    """
+    Ties the segments of a log together, in the order they were written.
+    """
+
+    fieldnames: list[str]
+    segments: list[LogSegment] = msgspec.field(default_factory=list)
+
+
+class LogSegmentWriter:
+    """
+    Writes CSV rows to a series of segment files in a log directory. Every segment is preallocated
+    to its full size with posix_fallocate, so writing to it doesn't need to allocate blocks or
+    update the size of the file. Once a segment is full, it is trimmed to the size of its data,
+    and handed to a low priority background thread which compresses it.
+
+    In the "wal" format, every line is written as a checksummed write-ahead log record, so that
+    the log can be recovered up to the last complete record after a crash.
+
+    This is only used in the logger process.
+    """
+
+    __slots__ = (
+        "_compression",
+        "_compression_queue",
+        "_compression_thread",
+        "_file",
+        "_line_buffer",
+        "_line_writer",
+        "_lock",
+        "_log_format",
+        "_manifest",
+        "_offset",
+        "_segment",
+        "_segment_size_bytes",
+        "log_dir",
+    )
+
+    def __init__(
+        self,
+        log_dir: Path,
+        fieldnames: list[str],
+        segment_size_bytes: int,
+        compression: Compression | None,
+        log_format: LogFormat = "csv",
+    ) -> None:
+        """
+        :param log_dir: The directory which will hold the segments and the manifest.
+        :param fieldnames: The columns of the CSV rows.
+        :param segment_size_bytes: The size each segment is preallocated to.
+        :param compression: How to compress the closed segments, or None to not compress them.
+        :param log_format: Whether to write plain CSV lines, or write-ahead log records.
+        """
+        self.log_dir = log_dir
+        self._segment_size_bytes = segment_size_bytes
+        self._compression = compression
+        self._log_format = log_format
+        self._manifest = LogManifest(fieldnames=fieldnames)
+        # The manifest is modified by both the writer and the compression thread
+        self._lock = threading.Lock()
+
+        # We format every row into this buffer first, so we know how many bytes it takes
+        self._line_buffer = io.StringIO()
+        self._line_writer = csv.DictWriter(self._line_buffer, fieldnames=fieldnames)
+
+        self._file: io.BufferedWriter | None = None
+        self._segment: LogSegment | None = None
+        self._offset = 0
+
+        with self._lock:
+            self._write_manifest()
+
+        self._compression_queue: queue.SimpleQueue[LogSegment | None] = queue.SimpleQueue()
+        self._compression_thread = threading.Thread(
+            target=self._compression_loop, name="Log Compression Thread", daemon=True
+        )
+        if self._compression:
+            self._compression_thread.start()
+
+    @property
+    def segment_index(self) -> int:
+        """The index of the segment currently being written to."""
+        return len(self._manifest.segments) - 1
+
+    def write_row(self, row: dict[str, object]) -> tuple[int, int]:
+        """
+        Writes a row to the current segment, starting a new segment if it is full.
+        :param row: The row to write.
+        :return: The index of the segment the row was written to, and its offset in that segment.
+        """
+        data = self._format_row(row)
+
+        if self._file is None or self._offset + len(data) > self._segment_size_bytes:
+            self._open_next_segment()
+
+        offset = self._offset
+        self._file.write(data)
+        self._offset += len(data)
+        self._update_segment(row)
+        return self.segment_index, offset
+
+    def flush(self) -> None:
+        """
+        Gives the data to the OS and makes sure it is written to the disk. Since the segment is
+        preallocated, the size of the file doesn't change, so fdatasync doesn't need to write any
+        metadata.
+        """
+        if self._file is None:
+            return
+        self._file.flush()
+        # fdatasync is not available on macOS
+        getattr(os, "fdatasync", os.fsync)(self._file.fileno())
+
+    def close(self) -> None:
+        """
+        Closes the current segment and waits for all the segments to be compressed.
+        """
+        self._close_segment()
+        if self._compression:
+            self._compression_queue.put(None)
+            self._compression_thread.join()
+
+    def _format_row(self, row: dict[str, object] | None) -> bytes:
+        """
+        Formats the row as a CSV line, or a write-ahead log record of the CSV line.
+        :param row: The row to format, or None to format the header.
+        :return: The bytes to write to the segment.
+        """
+        self._line_buffer.seek(0)
+        self._line_buffer.truncate()
+        if row is None:
+            self._line_writer.writeheader()
+        else:
+            self._line_writer.writerow(row)
+        line = self._line_buffer.getvalue().encode()
+        return encode_record(line) if self._log_format == "wal" else line
+
+    def _update_segment(self, row: dict[str, object]) -> None:
+        """
+        Updates the row count and timestamps of the current segment in the manifest.
+        :param row: The row which was just written.
+        """
+        # The rows are already formatted, so the timestamp is usually a string
+        timestamp = row.get("timestamp")
+        timestamp = float(timestamp) if timestamp is not None else None
+        with self._lock:
+            self._segment.number_of_rows += 1
+            self._segment.size_bytes = self._offset
+            if self._segment.first_timestamp is None:
+                self._segment.first_timestamp = timestamp
+            self._segment.last_timestamp = timestamp
+
+    def _open_next_segment(self) -> None:
+        """
+        Closes the current segment, and opens and preallocates the next one. The header is written
+        to every segment, so each of them can be read on its own.
+        """
+        self._close_segment()
+
+        segment_path = (
+            self.log_dir
+            / f"{self.log_dir.name}_{len(self._manifest.segments):03}.{self._log_format}"
+        )
+        file_descriptor = os.open(segment_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o666)
+        # Not every filesystem supports preallocation, in which case we just write normally
+        with contextlib.suppress(OSError, AttributeError):
+            os.posix_fallocate(file_descriptor, 0, self._segment_size_bytes)
+        self._file = os.fdopen(file_descriptor, "wb")
+
+        self._segment = LogSegment(file_name=segment_path.name, log_format=self._log_format)
+        with self._lock:
+            self._manifest.segments.append(self._segment)
+            self._write_manifest()
+
+        header = self._format_row(None)
+        self._file.write(header)
+        self._offset = len(header)
+
+    def _close_segment(self) -> None:
+        """
+        Trims the current segment to the size of its data, and hands it over to be compressed.
+        """
+        if self._file is None:
+            return
+        self._file.flush()
+        # Remove the unused preallocated space at the end of the segment
+        self._file.truncate(self._offset)
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
+
+        with self._lock:
+            self._segment.closed = True
+            self._write_manifest()
+
+        if self._compression:
+            self._compression_queue.put(self._segment)
+
+    def _write_manifest(self) -> None:
+        """
+        Atomically replaces the manifest with the current one. Must be called with the lock held.
+        """
+        temporary_path = self.log_dir / f"{LOG_MANIFEST_NAME}.tmp"
+        temporary_path.write_bytes(msgspec.json.format(msgspec.json.encode(self._manifest)))
+        temporary_path.replace(self.log_dir / LOG_MANIFEST_NAME)
+
+    # ----------------------- ALL METHODS BELOW RUN IN THE COMPRESSION THREAD ----------------------
+    def _compression_loop(self) -> None:
+        """
+        Compresses the closed segments until it gets None. It runs at a low priority so it doesn't
+        take CPU time away from the logging.
+        """
+        # On Linux, the niceness is per thread:
+        with contextlib.suppress(OSError, AttributeError):
+            os.setpriority(
+                os.PRIO_PROCESS, threading.get_native_id(), LOG_SEGMENT_COMPRESSION_NICENESS
+            )
+
+        while (segment := self._compression_queue.get()) is not None:
+            try:
+                self._compress_segment(segment)
+            except OSError as e:
+                print(f"Error compressing log segment {segment.file_name}: {e}")
+
+    def _compress_segment(self, segment: LogSegment) -> None:
+        """
+        Compresses the segment, points the manifest to the compressed file, and deletes the
+        uncompressed file.
+        :param segment: The segment to compress.
+        """
+        segment_path = self.log_dir / segment.file_name
+        compressed_path = segment_path.with_name(
+            segment_path.name + COMPRESSION_SUFFIXES[self._compression]
+        )
+        temporary_path = compressed_path.with_name(compressed_path.name + ".tmp")
+
+        open_compressed = gzip.open if self._compression == "gzip" else lzma.open
+        with segment_path.open("rb") as source, open_compressed(temporary_path, "wb") as target:
+            shutil.copyfileobj(source, target)
+        temporary_path.replace(compressed_path)
+
+        with self._lock:
+            segment.file_name = compressed_path.name
+            segment.compression = self._compression
+            self._write_manifest()
+        segment_path.unlink()
@@ -1,67 +1,118 @@
-"""Module for logging data to a CSV file in real time."""
+"""Module for logging data to CSV files in real time."""
 
-import csv
-import os
+import contextlib
 import multiprocessing
+import queue
+import re
+import resource
 import signal
+import time
+from collections import deque
 from pathlib import Path
-from typing import Any, Literal
+from typing import TYPE_CHECKING, Any, Literal
 
+import msgspec
 from msgspec import to_builtins
 
-from payload.constants import STOP_SIGNAL, NUMBER_OF_LINES_TO_LOG_BEFORE_FLUSHING
+from payload.constants import (
+    IDLE_LOG_BUFFER_SECONDS,
+    IDLE_LOG_SUMMARY_FREQUENCY,
+    IMU_APPROXIMATE_FREQUENCY,
+    LOG_INDEX_NAME,
+    LOG_INDEX_TIMESTAMP_INTERVAL,
+    LOG_SEGMENT_COMPRESSION,
+    LOG_SEGMENT_SIZE_BYTES,
+    LOGGER_FSYNC_STALL_SECONDS,
+    LOGGER_LATENCY_SAMPLE_SIZE,
+    LOGGER_STATISTICS_INTERVAL_SECONDS,
+    NUMBER_OF_LINES_TO_LOG_BEFORE_FLUSHING,
+    STOP_SIGNAL,
+)
+from payload.data_handling.log_index import LogIndexWriter
+from payload.data_handling.log_segments import LogFormat, LogSegmentWriter
 from payload.data_handling.packets.context_data_packet import ContextDataPacket
 from payload.data_handling.packets.imu_data_packet import IMUDataPacket
 from payload.data_handling.packets.logger_data_packet import LoggerDataPacket
+from payload.data_handling.packets.logger_statistics_packet import LoggerStatisticsPacket
 from payload.data_handling.packets.processor_data_packet import ProcessorDataPacket
 
+if TYPE_CHECKING:
+    from payload.data_handling.metrics import MetricsRegistry
+
+LOG_NAME_PATTERN = re.compile(r"log_(\d+)(\.csv)?")
+"""The name of a log directory, e.g. "log_3", or of an old single file log, e.g. "log_3.csv"."""
+
 
 class Logger:
     """
-    A class that logs data to a CSV file. Similar to the IMU class, it runs in a separate process.
+    A class that logs data to CSV files. Similar to the IMU class, it runs in a separate process.
     This is because the logging process is I/O-bound, meaning that it spends most of its time
     waiting for the file to be written to. By running it in a separate process, we can continue to
     log data while the main loop is running.
 
     It uses Python's csv module to append the payload's current state and IMU data to
-    our logs in real time.
+    our logs in real time. Each log is a directory of fixed size CSV segments, which are compressed
+    once they are full, a manifest listing them, and an index of the state changes and messages.
+    Use the LogReader to read them back. In the write-ahead log format, every line is checksummed so
+    the log can be recovered after a crash with `uv run recover`.
+
+    While we are in one of the LOG_BUFFER_STATES, the full rate data is only kept in memory for the
+    last IDLE_LOG_BUFFER_SECONDS, and only a decimated version of it is written to the log. The
+    buffer is written to the log as soon as we leave those states (e.g. when the motor starts
+    burning).
     """
 
-    LOG_BUFFER_STATES = ("StandbyState", "LandedState")
+    LOG_BUFFER_STATES = ("S", "L")
+    """The first letter of the states (StandbyState and LandedState) which are buffered."""
 
     __slots__ = (
-        "_log_counter",
+        "_last_summary_timestamp",
+        "_log_buffer",
+        "_log_format",
         "_log_process",
         "_log_queue",
+        "_statistics",
+        "_statistics_queue",
         "log_path",
     )
 
-    def __init__(self, log_dir: Path) -> None:
+    def __init__(self, log_dir: Path, log_format: LogFormat = "csv") -> None:
         """
-        Initializes the logger object. It creates a new log file in the specified directory. Like
-        the IMU class, it creates a queue to store log messages, and starts a separate process to
-        handle the logging. We are logging a lot of data, and logging is I/O-bound, so running it
-        in a separate process allows the main loop to continue running without waiting for the log
-        file to be written to.
-        :param log_dir: The directory where the log files will be.
+        Initializes the logger object. It creates a new log directory in the specified directory.
+        Like the IMU class, it creates a queue to store log messages, and starts a separate process
+        to handle the logging. We are logging a lot of data, and logging is I/O-bound, so running
+        it in a separate process allows the main loop to continue running without waiting for the
+        log file to be written to.
+        :param log_dir: The directory where the logs will be.
+        :param log_format: "csv" to write plain CSV segments, or "wal" to write every line as a
+        checksummed write-ahead log record.
         """
         # Create the log directory if it doesn't exist
         log_dir.mkdir(parents=True, exist_ok=True)
 
-        # Get all existing log files and find the highest suffix number
-        existing_logs = list(log_dir.glob("log_*.csv"))
-        max_suffix = (
-            max(int(log.stem.split("_")[-1]) for log in existing_logs) if existing_logs else 0
+        # Find the highest number of the existing logs, which are log directories, or the old
+        # single file CSV logs. Anything else in the directory, like an archived log, is skipped.
+        max_suffix = max(
+            (
+                int(match.group(1))
+                for log in log_dir.iterdir()
+                if (match := LOG_NAME_PATTERN.fullmatch(log.name))
+                and (log.is_dir() or match.group(2))
+            ),
+            default=0,
         )
 
-        # Buffer for StandbyState and LandedState
-        self._log_counter = 0
+        # Buffer for StandbyState and LandedState. It holds the data packets which have not been
+        # logged yet, in the order they were received.
+        self._log_buffer: deque[LoggerDataPacket] = deque()
+        # The IMU timestamp of the last buffered packet which was written to the log
+        self._last_summary_timestamp: float = float("-inf")
 
-        # Create a new log file with the next number in sequence
-        self.log_path = log_dir / f"log_{max_suffix + 1}.csv"
-        with self.log_path.open(mode="w", newline="") as file_writer:
-            writer = csv.DictWriter(file_writer, fieldnames=list(LoggerDataPacket.__annotations__))
-            writer.writeheader()
+        # Create a new log directory with the next number in sequence. The segments are created in
+        # the logging process.
+        self.log_path = log_dir / f"log_{max_suffix + 1}"
+        self.log_path.mkdir()
+        self._log_format = log_format
 
         # Makes a queue to store log messages, basically it's a process-safe list that you add to
         # the back and pop from front, meaning that things will be logged in the order they were
@@ -71,6 +122,13 @@ class Logger:
             multiprocessing.Queue()
         )
 
+        # The logger process periodically reports how it is keeping up through this queue. It only
+        # holds the latest report, so it never fills up when nobody reads the statistics.
+        self._statistics_queue: multiprocessing.Queue[LoggerStatisticsPacket] = (
+            multiprocessing.Queue(maxsize=1)
+        )
+        self._statistics = LoggerStatisticsPacket()
+
         # Start the logging process
         self._log_process = multiprocessing.Process(
             target=self._logging_loop, name="Logger Process"
@@ -83,6 +141,82 @@ class Logger:
         """
         return self._log_process.is_alive()
 
+    @property
+    def pid(self) -> int | None:
+        """
+        Returns the process ID of the logging process, or None if it hasn't been started.
+        """
+        return self._log_process.pid
+
+    @property
+    def statistics(self) -> LoggerStatisticsPacket:
+        """
+        Returns the latest statistics reported by the logging process. They are reported every
+        LOGGER_STATISTICS_INTERVAL_SECONDS, and when the logging process stops.
+        """
+        while True:
+            try:
+                self._statistics = self._statistics_queue.get_nowait()
+            except queue.Empty:
+                return self._statistics
+
+    def register_metrics(self, registry: "MetricsRegistry") -> None:
+        """
+        Registers the metrics of the logger. They are read from the latest statistics reported by
+        the logging process when they are scraped.
+        :param registry: The registry to add them to.
+        """
+        registry.gauge(
+            "payload_logger_queue_depth",
+            "The number of rows waiting for the logging process.",
+            self._log_queue_depth,
+        )
+        registry.gauge(
+            "payload_logger_buffered_rows",
+            "The number of rows of standby or landed held back in the main process.",
+            lambda: len(self._log_buffer),
+        )
+        registry.counter(
+            "payload_logger_rows_total",
+            "The number of rows written to the log.",
+            lambda: self.statistics.rows_logged,
+        )
+        registry.counter(
+            "payload_logger_fsyncs_total",
+            "The number of times the log was synced to disk.",
+            lambda: self.statistics.fsync_count,
+        )
+        registry.counter(
+            "payload_logger_fsync_seconds_total",
+            "The total time spent syncing the log to disk.",
+            lambda: self.statistics.fsync_total_ns / 1e9,
+        )
+        registry.gauge(
+            "payload_logger_fsync_max_seconds",
+            "The longest time a single sync of the log took.",
+            lambda: self.statistics.fsync_max_ns / 1e9,
+        )
+        registry.counter(
+            "payload_logger_fsync_stalls_total",
+            "The number of syncs which took longer than LOGGER_FSYNC_STALL_SECONDS.",
+            lambda: self.statistics.fsync_stall_count,
+        )
+        registry.gauge(
+            "payload_logger_latency_max_seconds",
+            "The longest time from processing a recent row to it being synced to disk.",
+            lambda: max(self.statistics.recent_latencies_ns, default=0) / 1e9,
+        )
+
+    def _log_queue_depth(self) -> int:
+        """
+        Returns the number of rows waiting in the queue to the logging process, or -1 where the
+        queue can't tell (macOS).
+        """
+        try:
+            return self._log_queue.qsize()
+        except NotImplementedError:
+            return -1
+
     @staticmethod
     def _convert_unknown_type(unknown_object: Any) -> str:
         """
@@ -144,6 +278,8 @@ class Logger:
         """
         Stops the logging process. It will finish logging the current message and then stop.
         """
+        # Don't lose the last few seconds of data if we are stopped while buffering:
+        self._flush_log_buffer()
         self._log_queue.put(STOP_SIGNAL)  # Put the stop signal in the queue
         print("put logging stop signal in queue")
         # Waits for the process to finish before stopping it
@@ -168,8 +304,47 @@ class Logger:
             processed_data_packet,
         )
 
+        # If we are in Standby or Landed State, we only keep the data in memory:
+        if context_data_packet.state_name in Logger.LOG_BUFFER_STATES:
+            self._buffer_idle_packet(logged_data_packet)
+            return
+
+        # We have left the buffered states, so we write the full rate buffer first:
+        self._flush_log_buffer()
         self._log_queue.put(logged_data_packet)
 
+    def _buffer_idle_packet(self, logged_data_packet: LoggerDataPacket) -> None:
+        """
+        Adds the data packet to the in memory buffer, and removes the packets which are older than
+        IDLE_LOG_BUFFER_SECONDS from it. Out of the removed packets, we log one every
+        1 / IDLE_LOG_SUMMARY_FREQUENCY seconds, so the log still has a summary of the idle time.
+        Logging them only when they leave the buffer keeps the rows in the log in order.
+        :param logged_data_packet: The data packet to buffer.
+        """
+        self._log_buffer.append(logged_data_packet)
+
+        newest_timestamp = logged_data_packet["timestamp"]
+        buffer_window_ms = IDLE_LOG_BUFFER_SECONDS * 1e3
+        summary_period_ms = 1e3 / IDLE_LOG_SUMMARY_FREQUENCY
+        # In case the IMU timestamps don't increase, we also bound the size of the buffer:
+        max_buffer_length = int(2 * IDLE_LOG_BUFFER_SECONDS * IMU_APPROXIMATE_FREQUENCY)
+
+        while (
+            newest_timestamp - self._log_buffer[0]["timestamp"] > buffer_window_ms
+            or len(self._log_buffer) > max_buffer_length
+        ):
+            oldest_packet = self._log_buffer.popleft()
+            if oldest_packet["timestamp"] - self._last_summary_timestamp >= summary_period_ms:
+                self._last_summary_timestamp = oldest_packet["timestamp"]
+                self._log_queue.put(oldest_packet)
+
+    def _flush_log_buffer(self) -> None:
+        """
+        Writes all the buffered data packets to the log, and empties the buffer.
+        """
+        while self._log_buffer:
+            self._log_queue.put(self._log_buffer.popleft())
+
     # ------------------------ ALL METHODS BELOW RUN IN A SEPARATE PROCESS -------------------------
     @staticmethod
     def _truncate_floats(data: LoggerDataPacket) -> dict[str, str | object]:
@@ -190,28 +365,90 @@ class Logger:
         # Ignore the SIGINT (Ctrl+C) signal, because we only want the main process to handle it
         signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ignores the interrupt signal
 
-        # Set up the csv logging in the new process
-        with self.log_path.open(mode="a", newline="") as file_writer:
-            number_of_lines_logged: int = 0
+        # Set up the segmented csv logging in the new process
+        writer = LogSegmentWriter(
+            self.log_path,
+            fieldnames=list(LoggerDataPacket.__annotations__),
+            segment_size_bytes=LOG_SEGMENT_SIZE_BYTES,
+            compression=LOG_SEGMENT_COMPRESSION,
+            log_format=self._log_format,
+        )
+        index_writer = LogIndexWriter(
+            self.log_path / LOG_INDEX_NAME, timestamp_interval=LOG_INDEX_TIMESTAMP_INTERVAL
+        )
+        number_of_lines_logged: int = 0
+
+        statistics = LoggerStatisticsPacket()
+        # The update timestamps of the rows which haven't been synced to disk yet, and the
+        # latencies of the last rows which were
+        unsynced_update_timestamps: list[int] = []
+        latencies = deque(maxlen=LOGGER_LATENCY_SAMPLE_SIZE)
+        next_report_time = time.monotonic() + LOGGER_STATISTICS_INTERVAL_SECONDS
 
-            writer = csv.DictWriter(file_writer, fieldnames=list(LoggerDataPacket.__annotations__))
+        try:
             while True:
                 # Get a message from the queue (this will block until a message is available)
                 message_field: LoggerDataPacket | Literal["STOP"] = self._log_queue.get()
                 # If the message is the stop signal, break out of the loop
                 if message_field == STOP_SIGNAL:
                     return
-                writer.writerow(Logger._truncate_floats(message_field))
+                row = Logger._truncate_floats(message_field)
+                segment, offset = writer.write_row(row)
+                index_writer.add_row(row, segment, offset)
                 number_of_lines_logged += 1
+                unsynced_update_timestamps.append(message_field.get("update_timestamp_ns", 0))
 
                 if number_of_lines_logged % NUMBER_OF_LINES_TO_LOG_BEFORE_FLUSHING == 0:
-                    # Tell Python to flush the data. This gives the data to the OS, and it is
-                    # stored as a dirty page cache (in memory) until the OS decides to write it
-                    # to disk. Technically python automatically flushes the data when the python
-                    # buffer is full (8192 bytes, which would be about 25 lines of data).
-                    file_writer.flush()
-                    # Tell the OS to write the file to disk from the dirty page cache. This
-                    # ensures that the data is written to disk and not just stored in memory.
-                    # This operation is the one which is actually "blocking" when talking about
-                    # file I/O.
-                    os.fsync(file_writer.fileno())
+                    # Give the data to the OS, and tell the OS to write it to disk from the dirty
+                    # page cache. This ensures that the data is written to disk and not just
+                    # stored in memory. This operation is the one which is actually "blocking"
+                    # when talking about file I/O.
+                    fsync_start = time.perf_counter_ns()
+                    writer.flush()
+                    fsync_duration = time.perf_counter_ns() - fsync_start
+                    index_writer.flush()
+
+                    # Rows buffered in StandbyState have a long latency, which is expected
+                    synced_time = time.time_ns()
+                    latencies.extend(synced_time - t for t in unsynced_update_timestamps)
+                    unsynced_update_timestamps.clear()
+                    statistics.fsync_count += 1
+                    statistics.fsync_total_ns += fsync_duration
+                    statistics.fsync_max_ns = max(statistics.fsync_max_ns, fsync_duration)
+                    if fsync_duration > LOGGER_FSYNC_STALL_SECONDS * 1e9:
+                        statistics.fsync_stall_count += 1
+
+                if time.monotonic() >= next_report_time:
+                    next_report_time += LOGGER_STATISTICS_INTERVAL_SECONDS
+                    self._report_statistics(statistics, number_of_lines_logged, latencies)
+        finally:
+            # Closes the last segment, and waits for the segments to be compressed
+            writer.close()
+            index_writer.close()
+            self._report_statistics(statistics, number_of_lines_logged, latencies)
+
+    def _report_statistics(
+        self, statistics: LoggerStatisticsPacket, rows_logged: int, latencies: deque[int]
+    ) -> None:
+        """
+        Sends the statistics of the logging process to the main process.
+        :param statistics: The statistics collected so far.
+        :param rows_logged: The number of rows logged so far.
+        :param latencies: The latencies of the most recently synced rows.
+        """
+        # The queue pickles the packet later in another thread, so we send a copy of it:
+        report = msgspec.structs.replace(
+            statistics,
+            rows_logged=rows_logged,
+            recent_latencies_ns=list(latencies),
+            # ru_maxrss is in kilobytes on Linux
+            max_rss_kilobytes=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        )
+        try:
+            self._statistics_queue.put_nowait(report)
+        except queue.Full:
+            # The main process hasn't read the last report yet, so we replace it with this one
+            with contextlib.suppress(queue.Empty):
+                self._statistics_queue.get_nowait()
+            with contextlib.suppress(queue.Full):
+                self._statistics_queue.put_nowait(report)
@@ -0,0 +1,273 @@
+"""Module for the metrics registry, and the HTTP server which serves it in the Prometheus text
+format, so bench runs and replays can be monitored without reading the code."""
+
+import bisect
+import math
+import threading
+from collections.abc import Callable, Sequence
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from payload.constants import METRICS_HOST
+
+MetricReader = Callable[[], float | dict[str, float]]
+"""Reads the value of a metric when it is scraped, so nothing is measured in the flight loop. A
+metric with a label returns the value of every label value, e.g. {"main": 1.0}."""
+
+
+def _format_value(value: float) -> str:
+    """
+    Formats a value the way Prometheus reads it.
+    :param value: The value.
+    """
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def _escape_label_value(value: str) -> str:
+    """
+    Escapes a label value for the Prometheus text format.
+    :param value: The label value.
+    """
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Counter:
+    """
+    A value which only goes up, like the number of loops. It is either counted with `inc`, or read
+    from whatever already counts it when it is scraped.
+    """
+
+    TYPE = "counter"
+
+    __slots__ = ("_read", "help", "label", "name", "value")
+
+    def __init__(
+        self, name: str, help: str, read: MetricReader | None = None, label: str | None = None
+    ) -> None:
+        """
+        :param name: The name of the metric, e.g. "payload_loops_total".
+        :param help: What the metric is.
+        :param read: If given, the value is read with it when it is scraped.
+        :param label: The name of the label the values of `read` are for, if it has one.
+        """
+        self.name = name
+        self.help = help
+        self.label = label
+        self._read = read
+        self.value: float = 0
+
+    def inc(self, amount: float = 1) -> None:
+        """
+        Adds to the counter.
+        :param amount: How much to add.
+        """
+        self.value += amount
+
+    def samples(self) -> list[str]:
+        """
+        Returns the lines of the values of the metric.
+        """
+        value = self.value if self._read is None else self._read()
+        if isinstance(value, dict):
+            return [
+                f'{self.name}{{{self.label}="{_escape_label_value(label_value)}"}} '
+                f"{_format_value(sample)}"
+                for label_value, sample in value.items()
+            ]
+        return [f"{self.name} {_format_value(value)}"]
+
+
+class Gauge(Counter):
+    """
+    A value which goes up and down, like a queue depth. It is either set with `set`, or read when
+    it is scraped.
+    """
+
+    TYPE = "gauge"
+
+    __slots__ = ()
+
+    def set(self, value: float) -> None:
+        """
+        Sets the gauge.
+        :param value: The new value.
+        """
+        self.value = value
+
+
+class Histogram:
+    """
+    Counts how many observations, like loop durations, fell into each bucket. Observing a value
+    is a binary search and two additions.
+    """
+
+    TYPE = "histogram"
+
+    __slots__ = ("_bucket_counts", "bounds", "count", "help", "name", "sum")
+
+    def __init__(self, name: str, help: str, bounds: Sequence[float]) -> None:
+        """
+        :param name: The name of the metric, e.g. "payload_loop_processing_seconds".
+        :param help: What the metric is.
+        :param bounds: The upper bounds of the buckets, in increasing order. The +Inf bucket is
+        added.
+        """
+        self.name = name
+        self.help = help
+        self.bounds = list(bounds)
+        self._bucket_counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """
+        Adds an observation.
+        :param value: The observed value.
+        """
+        self._bucket_counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def samples(self) -> list[str]:
+        """
+        Returns the lines of the cumulative buckets, the sum and the count.
+        """
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip([*self.bounds, math.inf], self._bucket_counts, strict=True):
+            cumulative += bucket_count
+            lines.append(f'{self.name}_bucket{{le="{_format_value(bound)}"}} {cumulative}')
+        lines.append(f"{self.name}_sum {_format_value(self.sum)}")
+        lines.append(f"{self.name}_count {self.count}")
+        return lines
+
+
+Metric = Counter | Gauge | Histogram
+
+
+class MetricsRegistry:
+    """
+    Holds the metrics of all the components, and renders them in the Prometheus text format. The
+    components register their metrics with `register_metrics(registry)`, and most of them are read
+    from the counters the components keep anyway, so they cost nothing until they are scraped.
+    """
+
+    __slots__ = ("_metrics",)
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+
+    def counter(
+        self, name: str, help: str, read: MetricReader | None = None, label: str | None = None
+    ) -> Counter:
+        """
+        Registers a counter. See `Counter` for the arguments.
+        """
+        counter = Counter(name, help, read, label)
+        self._register(counter)
+        return counter
+
+    def gauge(
+        self, name: str, help: str, read: MetricReader | None = None, label: str | None = None
+    ) -> Gauge:
+        """
+        Registers a gauge. See `Gauge` for the arguments.
+        """
+        gauge = Gauge(name, help, read, label)
+        self._register(gauge)
+        return gauge
+
+    def histogram(self, name: str, help: str, bounds: Sequence[float]) -> Histogram:
+        """
+        Registers a histogram. See `Histogram` for the arguments.
+        """
+        histogram = Histogram(name, help, bounds)
+        self._register(histogram)
+        return histogram
+
+    def render(self) -> str:
+        """
+        Returns every metric in the Prometheus text format. A metric which fails to be read is
+        left out, rather than failing the whole scrape.
+        """
+        lines = []
+        for metric in list(self._metrics.values()):
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                print(f"Failed to read the metric {metric.name}: {e}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.TYPE}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric: Metric) -> None:
+        """
+        Adds a metric to the registry.
+        :param metric: The metric.
+        """
+        if metric.name in self._metrics:
+            raise ValueError(f"A metric named {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    """Serves the metrics of the registry of the server at /metrics."""
+
+    server: "MetricsServer"
+
+    def do_GET(self) -> None:
+        """Responds with the metrics, or 404 for any other path."""
+        if self.path != "/metrics":
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        body = self.server.registry.render().encode()
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        """Doesn't print every request, since they would mess up the display."""
+
+
+class MetricsServer(ThreadingHTTPServer):
+    """
+    Serves the metrics at http://METRICS_HOST:port/metrics on a thread, for Prometheus to scrape.
+    It only listens on localhost.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, registry: MetricsRegistry, port: int) -> None:
+        """
+        :param registry: The registry with the metrics.
+        :param port: The port to listen on, or 0 for any free port.
+        """
+        super().__init__((METRICS_HOST, port), _MetricsRequestHandler)
+        self.registry = registry
+        self._thread = threading.Thread(
+            target=self.serve_forever, daemon=True, name="Metrics Server"
+        )
+
+    @property
+    def port(self) -> int:
+        """
+        Returns the port the server listens on.
+        """
+        return self.server_address[1]
+
+    def start(self) -> None:
+        """Starts serving the metrics."""
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops serving the metrics and closes the socket."""
+        self.shutdown()
+        self.server_close()
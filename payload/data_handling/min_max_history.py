@@ -0,0 +1,119 @@
+"""Module for the MinMaxHistory class, which keeps a fixed size summary of a whole flight."""
+
+
+class MinMaxHistory:
+    """
+    The history of a value, e.g. the altitude, downsampled into a fixed number of buckets which
+    each keep the minimum and maximum of the samples in them. When every bucket is full, pairs of
+    neighbouring buckets are merged, so each bucket covers twice as many samples. That way it
+    always covers the whole flight in the same memory, appending is O(1) on average, and peaks
+    like apogee or the max velocity are never averaged away.
+    """
+
+    __slots__ = (
+        "_bucket_count",
+        "_bucket_samples",
+        "_bucket_size",
+        "_max_indices",
+        "_maxes",
+        "_min_indices",
+        "_mins",
+        "capacity",
+        "samples",
+    )
+
+    def __init__(self, capacity: int) -> None:
+        """
+        :param capacity: The number of buckets. It must be even, so they can be merged in pairs.
+        """
+        if capacity < 2 or capacity % 2:
+            raise ValueError(f"The capacity must be even and at least 2, not {capacity}")
+        self.capacity = capacity
+        self.samples = 0
+        """The number of values appended so far."""
+        self._mins = [0.0] * capacity
+        self._maxes = [0.0] * capacity
+        # The sample numbers of the minimum and maximum, so they are given back in order
+        self._min_indices = [0] * capacity
+        self._max_indices = [0] * capacity
+        self._bucket_count = 0
+        self._bucket_size = 1
+        self._bucket_samples = 0  # The number of samples in the last bucket
+
+    def append(self, value: float) -> None:
+        """
+        Adds the next value.
+        :param value: The value.
+        """
+        index = self.samples
+        self.samples += 1
+        if self._bucket_samples in (0, self._bucket_size):
+            if self._bucket_count == self.capacity:
+                self._merge()
+            bucket = self._bucket_count
+            self._bucket_count += 1
+            self._bucket_samples = 1
+            self._mins[bucket] = self._maxes[bucket] = value
+            self._min_indices[bucket] = self._max_indices[bucket] = index
+            return
+
+        bucket = self._bucket_count - 1
+        self._bucket_samples += 1
+        if value < self._mins[bucket]:
+            self._mins[bucket] = value
+            self._min_indices[bucket] = index
+        elif value > self._maxes[bucket]:
+            self._maxes[bucket] = value
+            self._max_indices[bucket] = index
+
+    def values(self) -> list[float]:
+        """
+        Returns the minimum and maximum of every bucket, in the order they happened. This is at
+        most twice the capacity, no matter how many values were appended.
+        """
+        values = []
+        for bucket in range(self._bucket_count):
+            minimum, maximum = self._mins[bucket], self._maxes[bucket]
+            if self._min_indices[bucket] == self._max_indices[bucket]:
+                values.append(minimum)
+            elif self._min_indices[bucket] < self._max_indices[bucket]:
+                values += (minimum, maximum)
+            else:
+                values += (maximum, minimum)
+        return values
+
+    @property
+    def minimum(self) -> float | None:
+        """
+        Returns the smallest value so far, or None if there are none.
+        """
+        return min(self._mins[: self._bucket_count]) if self._bucket_count else None
+
+    @property
+    def maximum(self) -> float | None:
+        """
+        Returns the largest value so far, or None if there are none.
+        """
+        return max(self._maxes[: self._bucket_count]) if self._bucket_count else None
+
+    def _merge(self) -> None:
+        """
+        Merges every pair of neighbouring buckets, which frees up half of the buckets.
+        """
+        for bucket in range(self.capacity // 2):
+            first, second = 2 * bucket, 2 * bucket + 1
+            if self._mins[second] < self._mins[first]:
+                self._mins[bucket] = self._mins[second]
+                self._min_indices[bucket] = self._min_indices[second]
+            else:
+                self._mins[bucket] = self._mins[first]
+                self._min_indices[bucket] = self._min_indices[first]
+            if self._maxes[second] > self._maxes[first]:
+                self._maxes[bucket] = self._maxes[second]
+                self._max_indices[bucket] = self._max_indices[second]
+            else:
+                self._maxes[bucket] = self._maxes[first]
+                self._max_indices[bucket] = self._max_indices[first]
+        self._bucket_count = self.capacity // 2
+        self._bucket_size *= 2
+        self._bucket_samples = self._bucket_size  # The merged buckets are all full
@@ -0,0 +1,37 @@
+"""Module for describing the statistics the DataBus keeps about each topic."""
+
+import msgspec
+
+
+class SubscriberStatisticsPacket(msgspec.Struct):
+    """
+    How one subscriber of a topic is keeping up.
+    """
+
+    name: str
+    """The name the subscriber gave when subscribing, e.g. "display"."""
+    delivered: int
+    """The number of packets handed to the subscriber, after the decimation."""
+    dropped: int
+    """The number of packets which didn't fit in the subscriber's buffer."""
+    errors: int
+    """The number of packets the subscriber's handler raised an error on."""
+    queued: int
+    """The number of packets waiting in the subscriber's buffer."""
+
+
+class TopicStatisticsPacket(msgspec.Struct):
+    """
+    Statistics about one topic of the DataBus. The publish times include running the subscribers
+    which handle the packets right away, e.g. the logger.
+    """
+
+    topic: str
+    """The name of the topic."""
+    published: int
+    """The number of packets published on the topic."""
+    publish_total_ns: int
+    """The total time spent publishing, in nanoseconds."""
+    publish_max_ns: int
+    """The longest time a single publish took, in nanoseconds."""
+    subscribers: list[SubscriberStatisticsPacket]
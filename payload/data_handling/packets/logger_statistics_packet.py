@@ -0,0 +1,26 @@
+"""Module for describing the statistics the logger process reports about itself."""
+
+import msgspec
+
+
+class LoggerStatisticsPacket(msgspec.Struct):
+    """
+    Statistics about how the logger process is keeping up, sent from the logger process to the
+    main process. The latencies are measured from the `update_timestamp_ns` of a row to the end of
+    the fsync which wrote it to disk.
+    """
+
+    rows_logged: int = 0
+    """The number of rows written to the log so far."""
+    fsync_count: int = 0
+    """The number of times the log was synced to disk."""
+    fsync_total_ns: int = 0
+    """The total time spent syncing the log to disk, in nanoseconds."""
+    fsync_max_ns: int = 0
+    """The longest time a single sync took, in nanoseconds."""
+    fsync_stall_count: int = 0
+    """The number of syncs which took longer than LOGGER_FSYNC_STALL_SECONDS."""
+    recent_latencies_ns: list[int] = msgspec.field(default_factory=list)
+    """The end to end latencies of the most recently synced rows, in nanoseconds."""
+    max_rss_kilobytes: int = 0
+    """The peak resident memory of the logger process, in kilobytes."""
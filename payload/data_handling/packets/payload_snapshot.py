@@ -0,0 +1,28 @@
+"""Module for the PayloadSnapshot class."""
+
+import msgspec
+
+from payload.data_handling.packets.context_data_packet import ContextDataPacket
+from payload.data_handling.packets.imu_data_packet import IMUDataPacket
+from payload.data_handling.packets.processor_data_packet import ProcessorDataPacket
+from payload.data_handling.packets.transmitter_data_packet import TransmitterDataPacket
+
+
+class PayloadSnapshot(msgspec.Struct, frozen=True):
+    """
+    Everything the PayloadContext worked out in one loop, published at the end of the loop for
+    readers on other threads, like the display. A new snapshot is made every loop and never
+    changed, so a reader which takes `PayloadContext.snapshot` once gets values which all come
+    from the same loop.
+    """
+
+    sequence: int
+    """Counts up by one every loop, so a reader can tell whether it has seen this one."""
+    state_name: str
+    """The name of the state at the end of the loop, e.g. "CoastState"."""
+    state_start_time_ms: int
+    """The IMU timestamp at which that state started."""
+    imu_data_packet: IMUDataPacket
+    processed_data_packet: ProcessorDataPacket
+    context_data_packet: ContextDataPacket
+    transmission_packet: TransmitterDataPacket | None
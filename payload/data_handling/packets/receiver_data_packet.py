@@ -0,0 +1,16 @@
+"""Module for the ReceiverDataPacket class."""
+
+import msgspec
+
+
+class ReceiverDataPacket(msgspec.Struct):
+    """
+    A command received from the ground station.
+    """
+
+    message: str
+    """The command, e.g. TRANSMIT_MESSAGE or STOP_MESSAGE."""
+
+    received_timestamp_ns: int
+    """The `time.time_ns` at which the receiver read the command, which is comparable to the
+    `update_timestamp_ns` of the ContextDataPacket of the loop that acted on it."""
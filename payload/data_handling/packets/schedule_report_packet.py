@@ -0,0 +1,19 @@
+"""Module for describing what applying the scheduling profile did to each thread and process."""
+
+import msgspec
+
+
+class ScheduleReportPacket(msgspec.Struct):
+    """
+    What was applied to one thread or process of a component of the scheduling profile, and what
+    couldn't be, e.g. because the payload isn't allowed to raise its priority.
+    """
+
+    component: str
+    """The component of the profile, e.g. "imu"."""
+    target: str
+    """The thread or process it was applied to, e.g. "IO Reactor (thread 1234)"."""
+    applied: list[str] = msgspec.field(default_factory=list)
+    """The settings which were applied, e.g. "CPUs 3"."""
+    failed: list[str] = msgspec.field(default_factory=list)
+    """The settings which couldn't be applied, and why."""
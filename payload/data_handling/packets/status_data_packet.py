@@ -0,0 +1,24 @@
+"""Module for the StatusDataPacket class."""
+
+from typing import Literal
+
+import msgspec
+
+
+class StatusDataPacket(msgspec.Struct):
+    """
+    The in-flight status we send to the ground station during coast and free fall, taken from the
+    ProcessorDataPacket of the loop it was made in.
+    """
+
+    state_name: Literal["S", "M", "C", "F", "L"]
+    """The stage of flight we are in."""
+
+    current_altitude: float
+    """The zeroed-out altitude, in meters."""
+
+    vertical_velocity: float
+    """The velocity in the upward axis, in meters per second."""
+
+    crew_survivability: float
+    """The crew survivability calculated so far, as a fraction."""
@@ -0,0 +1,64 @@
+"""Module for describing the samples of the SystemMonitor."""
+
+import msgspec
+
+
+class SystemStatusPacket(msgspec.Struct):
+    """
+    One sample of the load, memory and temperature of the Pi, taken by the SystemMonitor. The CPU
+    percentages are averaged over the time since the previous sample. 100% is one full core.
+    """
+
+    update_timestamp_ns: int
+    """When the sample was taken, from `time.time_ns()`, like the rows of the flight log."""
+    timestamp: int | None
+    """The IMU timestamp of the latest loop, in milliseconds, or None before the first loop."""
+    state_name: str
+    """The first letter of the state of the latest loop, like in the flight log, or "" before the
+    first loop."""
+    cpu_percent: float
+    """The CPU usage of the whole system, 100% being all the cores."""
+    cpu_percent_per_core: list[float]
+    """The CPU usage of each core."""
+    load_average: float
+    """The one minute load average of the system."""
+    memory_percent: float
+    """How much of the memory of the system is used."""
+    main_rss_bytes: int
+    """The resident memory of the main process."""
+    logger_rss_bytes: int
+    """The resident memory of the logger process, or 0 if it isn't running."""
+    thread_cpu_percent: dict[str, float]
+    """The CPU usage of each thread of the main process, by thread name."""
+    soc_temperature_celsius: float | None
+    """The temperature of the SoC, or None where it can't be read."""
+    throttled: int | None
+    """The throttling flags of the Pi firmware (see THROTTLED_FLAGS), or None when not on a Pi."""
+
+
+class SystemStatisticsPacket(msgspec.Struct):
+    """
+    The running statistics of the samples of the SystemMonitor, which are summarized when it stops.
+    They are kept instead of the samples, so they don't grow during a long wait on the pad.
+    """
+
+    sample_count: int = 0
+    """The number of samples taken."""
+    cpu_percent_total: float = 0.0
+    """The sum of the CPU usage of the samples, for the mean."""
+    cpu_percent_max: float = 0.0
+    """The highest CPU usage of a sample."""
+    main_rss_max_bytes: int = 0
+    """The highest resident memory of the main process."""
+    logger_rss_max_bytes: int = 0
+    """The highest resident memory of the logger process."""
+    soc_temperature_count: int = 0
+    """The number of samples the temperature of the SoC could be read in."""
+    soc_temperature_total_celsius: float = 0.0
+    """The sum of the temperatures of the SoC, for the mean."""
+    soc_temperature_max_celsius: float | None = None
+    """The highest temperature of the SoC, or None if it couldn't be read."""
+    throttled: int | None = None
+    """Every throttling flag which was set in any sample, or None when not on a Pi."""
+    thread_cpu_percent_total: dict[str, float] = msgspec.field(default_factory=dict)
+    """The sum of the CPU usage of each thread, by thread name, for the means."""
@@ -0,0 +1,309 @@
+"""Module for the thread which samples the load, memory and temperature of the Pi while the payload
+runs, so a slow loop can be matched to the CPU being busy or the Pi throttling."""
+
+import csv
+import os
+import shutil
+import subprocess
+import threading
+import time
+from collections.abc import Callable
+from typing import TYPE_CHECKING
+
+import msgspec
+import psutil
+
+from payload.constants import (
+    SOC_TEMPERATURE_PATH,
+    SYSTEM_LOG_NAME,
+    SYSTEM_MONITOR_INTERVAL_SECONDS,
+    THROTTLED_FLAGS,
+    THROTTLED_PATH,
+)
+from payload.data_handling.packets.system_status_packet import (
+    SystemStatisticsPacket,
+    SystemStatusPacket,
+)
+
+if TYPE_CHECKING:
+    from io import TextIOWrapper
+
+    from payload.data_handling.logger import Logger
+    from payload.data_handling.packets.payload_snapshot import PayloadSnapshot
+
+
+def read_soc_temperature() -> float | None:
+    """
+    Returns the temperature of the SoC in degrees Celsius, or None where it can't be read.
+    """
+    try:
+        return int(SOC_TEMPERATURE_PATH.read_text()) / 1000
+    except (OSError, ValueError):
+        return None
+
+
+def read_throttled_file() -> int | None:
+    """
+    Returns the throttling flags of the Pi firmware from its sysfs file, or None where it can't be
+    read.
+    """
+    try:
+        return int(THROTTLED_PATH.read_text(), 16)
+    except (OSError, ValueError):
+        return None
+
+
+def read_throttled_vcgencmd() -> int | None:
+    """
+    Returns the throttling flags of the Pi firmware from vcgencmd, for the kernels which don't have
+    the sysfs file, or None if it fails.
+    """
+    try:
+        # Prints e.g. "throttled=0x50005"
+        output = subprocess.run(
+            ["vcgencmd", "get_throttled"],
+            capture_output=True,
+            text=True,
+            check=True,
+            timeout=1,
+        ).stdout
+        return int(output.strip().split("=")[1], 16)
+    except (OSError, subprocess.SubprocessError, IndexError, ValueError):
+        return None
+
+
+def find_throttled_reader() -> Callable[[], int | None] | None:
+    """
+    Returns the function which reads the throttling flags here, or None when not on a Pi. It is
+    found once, so a sample doesn't try the sysfs file and then start vcgencmd every time.
+    """
+    if read_throttled_file() is not None:
+        return read_throttled_file
+    if shutil.which("vcgencmd") is not None and read_throttled_vcgencmd() is not None:
+        return read_throttled_vcgencmd
+    return None
+
+
+def describe_throttled(throttled: int) -> str:
+    """
+    Returns the names of the throttling flags which are set, e.g. "throttled (since boot:
+    under-voltage, throttled)".
+    :param throttled: The throttling flags.
+    """
+    now = [name for flag, name in THROTTLED_FLAGS.items() if throttled & flag]
+    since_boot = [name for flag, name in THROTTLED_FLAGS.items() if throttled & (flag << 16)]
+    description = ", ".join(now) or "not throttled"
+    if since_boot:
+        description += f" (since boot: {', '.join(since_boot)})"
+    return description
+
+
+class SystemMonitor:
+    """
+    Samples the CPU usage of the system, of each core and of each thread of the main process, the
+    memory of the main and logger processes, and the temperature and throttling of the Pi, once
+    every SYSTEM_MONITOR_INTERVAL_SECONDS on its own thread. Every sample is written as a row of
+    SYSTEM_LOG_NAME in the log directory, with the IMU timestamp and state of the latest loop, so
+    it can be lined up with the flight log. A summary is printed when it stops.
+    """
+
+    __slots__ = (
+        "_file",
+        "_last_sample_time",
+        "_logger",
+        "_logger_process",
+        "_process",
+        "_read_snapshot",
+        "_read_throttled",
+        "_stop_event",
+        "_thread",
+        "_thread_cpu_times",
+        "_writer",
+        "latest",
+        "statistics",
+    )
+
+    def __init__(
+        self, logger: "Logger", read_snapshot: Callable[[], "PayloadSnapshot | None"]
+    ) -> None:
+        """
+        :param logger: The logger, whose log directory the samples are written to, and whose
+        process is sampled.
+        :param read_snapshot: Returns the snapshot of the latest loop, for the flight timestamps.
+        """
+        self._logger = logger
+        self._read_snapshot = read_snapshot
+        # Found when we start, see `find_throttled_reader`
+        self._read_throttled: Callable[[], int | None] | None = None
+        self._process = psutil.Process(os.getpid())
+        self._logger_process: psutil.Process | None = None
+        # The CPU time of each thread at the previous sample, by native thread ID
+        self._thread_cpu_times: dict[int, float] = {}
+        self._last_sample_time = time.monotonic()
+        self._file: TextIOWrapper | None = None
+        self._writer: csv.DictWriter | None = None
+        self.latest: SystemStatusPacket | None = None
+        self.statistics = SystemStatisticsPacket()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="System Monitor")
+
+    def start(self) -> None:
+        """
+        Opens the system log and starts sampling.
+        """
+        self._file = (self._logger.log_path / SYSTEM_LOG_NAME).open("w", newline="")
+        self._writer = csv.DictWriter(self._file, fieldnames=SystemStatusPacket.__struct_fields__)
+        self._writer.writeheader()
+        self._read_throttled = find_throttled_reader()
+        # The CPU percentages are measured from the previous call, so the first one starts them
+        self.sample()
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops sampling, closes the system log, and prints a summary of the samples.
+        """
+        self._stop_event.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        if self._file is not None:
+            self._file.close()
+        print(self.summary())
+
+    def sample(self) -> SystemStatusPacket:
+        """
+        Takes a sample of the system.
+        """
+        snapshot = self._read_snapshot()
+        return SystemStatusPacket(
+            update_timestamp_ns=time.time_ns(),
+            timestamp=None if snapshot is None else snapshot.imu_data_packet.timestamp,
+            state_name="" if snapshot is None else snapshot.state_name[0],
+            cpu_percent=psutil.cpu_percent(),
+            cpu_percent_per_core=psutil.cpu_percent(percpu=True),
+            load_average=psutil.getloadavg()[0],
+            memory_percent=psutil.virtual_memory().percent,
+            main_rss_bytes=self._process.memory_info().rss,
+            logger_rss_bytes=self._read_logger_rss(),
+            thread_cpu_percent=self._read_thread_cpu_percent(),
+            soc_temperature_celsius=read_soc_temperature(),
+            throttled=None if self._read_throttled is None else self._read_throttled(),
+        )
+
+    def summary(self) -> str:
+        """
+        Returns a summary of the samples taken so far.
+        """
+        stats = self.statistics
+        if not stats.sample_count:
+            return "System monitor: no samples were taken"
+        summary = (
+            f"System monitor: {stats.sample_count} samples, CPU mean "
+            f"{stats.cpu_percent_total / stats.sample_count:.1f}% max "
+            f"{stats.cpu_percent_max:.1f}%, peak RSS main "
+            f"{stats.main_rss_max_bytes / 1e6:.1f} MB, logger "
+            f"{stats.logger_rss_max_bytes / 1e6:.1f} MB"
+        )
+        lines = [summary]
+        if stats.soc_temperature_max_celsius is not None:
+            lines.append(
+                f"SoC temperature: mean "
+                f"{stats.soc_temperature_total_celsius / stats.soc_temperature_count:.1f} °C, "
+                f"max {stats.soc_temperature_max_celsius:.1f} °C"
+            )
+        if stats.throttled is not None:
+            lines.append(f"Throttling: {describe_throttled(stats.throttled)}")
+        busiest = sorted(
+            stats.thread_cpu_percent_total.items(), key=lambda item: item[1], reverse=True
+        )[:5]
+        if busiest:
+            lines.append(
+                "Busiest threads: "
+                + ", ".join(f"{name} {total / stats.sample_count:.1f}%" for name, total in busiest)
+            )
+        return "\n".join(lines)
+
+    def _record(self, sample: SystemStatusPacket) -> None:
+        """
+        Adds a sample to the statistics.
+        :param sample: The sample.
+        """
+        stats = self.statistics
+        stats.sample_count += 1
+        stats.cpu_percent_total += sample.cpu_percent
+        stats.cpu_percent_max = max(stats.cpu_percent_max, sample.cpu_percent)
+        stats.main_rss_max_bytes = max(stats.main_rss_max_bytes, sample.main_rss_bytes)
+        stats.logger_rss_max_bytes = max(stats.logger_rss_max_bytes, sample.logger_rss_bytes)
+        if sample.soc_temperature_celsius is not None:
+            stats.soc_temperature_count += 1
+            stats.soc_temperature_total_celsius += sample.soc_temperature_celsius
+            stats.soc_temperature_max_celsius = max(
+                stats.soc_temperature_max_celsius or sample.soc_temperature_celsius,
+                sample.soc_temperature_celsius,
+            )
+        if sample.throttled is not None:
+            stats.throttled = (stats.throttled or 0) | sample.throttled
+        for name, percent in sample.thread_cpu_percent.items():
+            stats.thread_cpu_percent_total[name] = (
+                stats.thread_cpu_percent_total.get(name, 0.0) + percent
+            )
+
+    def _read_logger_rss(self) -> int:
+        """
+        Returns the resident memory of the logger process, or 0 if it isn't running.
+        """
+        if self._logger_process is None and self._logger.pid is not None:
+            self._logger_process = psutil.Process(self._logger.pid)
+        if self._logger_process is None:
+            return 0
+        try:
+            return self._logger_process.memory_info().rss
+        except psutil.NoSuchProcess:
+            return 0
+
+    def _read_thread_cpu_percent(self) -> dict[str, float]:
+        """
+        Returns the CPU usage of each thread of the main process since the previous sample, by
+        thread name. Threads which weren't started from Python, e.g. by NumPy, are named by their
+        native ID.
+        """
+        names = {thread.native_id: thread.name for thread in threading.enumerate()}
+        now = time.monotonic()
+        elapsed = now - self._last_sample_time
+        thread_cpu_times = {
+            thread.id: thread.user_time + thread.system_time for thread in self._process.threads()
+        }
+        previous = self._thread_cpu_times
+        self._thread_cpu_times = thread_cpu_times
+        self._last_sample_time = now
+        if not previous or elapsed <= 0:
+            return {}
+        return {
+            names.get(thread_id, f"Thread {thread_id}"): round(
+                100 * (cpu_time - previous.get(thread_id, 0.0)) / elapsed, 1
+            )
+            for thread_id, cpu_time in thread_cpu_times.items()
+        }
+
+    def _write_sample(self, sample: SystemStatusPacket) -> None:
+        """
+        Writes a sample as a row of the system log.
+        :param sample: The sample.
+        """
+        row = {
+            field: msgspec.json.encode(value).decode() if isinstance(value, list | dict) else value
+            for field, value in msgspec.structs.asdict(sample).items()
+        }
+        self._writer.writerow(row)
+        # Flushed every row, since they are rare and we want them if the Pi loses power
+        self._file.flush()
+
+    def _run(self) -> None:
+        """
+        Takes and writes a sample every interval until stopped.
+        """
+        while not self._stop_event.wait(SYSTEM_MONITOR_INTERVAL_SECONDS):
+            sample = self.sample()
+            self.latest = sample
+            self._record(sample)
+            self._write_sample(sample)
@@ -0,0 +1,107 @@
+"""Module for the TelemetryStream class, which sends the data of every loop to local listeners."""
+
+import socket
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+import msgspec
+
+from payload.constants import TELEMETRY_STREAM_DECIMATION, TELEMETRY_STREAM_MAX_DATAGRAM_SIZE
+from payload.data_handling.packets.payload_snapshot import PayloadSnapshot
+
+
+def parse_address(address: str) -> tuple[socket.AddressFamily, str | tuple[str, int]]:
+    """
+    Works out which socket an address is for. "HOST:PORT", e.g. "127.0.0.1:5005", is a UDP port,
+    and anything else is the path of a Unix datagram socket, e.g. "/tmp/payload.sock".
+    :param address: The address.
+    :return: The address family, and the address in the form `socket` takes it.
+    """
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit():
+        return socket.AF_INET, (host, int(port))
+    return socket.AF_UNIX, address
+
+
+class TelemetryStream:
+    """
+    Sends the PayloadSnapshot of every loop as a msgpack datagram to a local UDP port or Unix
+    socket, so plotting tools and the ground station software can follow a mock or bench run
+    live. It is fire and forget: the socket never blocks, and a datagram which can't be sent
+    right away, e.g. because nobody is listening, is dropped and counted. Encoding and sending a
+    loop takes a few microseconds.
+    """
+
+    __slots__ = (
+        "_address",
+        "_buffer",
+        "_encoder",
+        "_socket",
+        "decimation",
+        "dropped",
+        "sent",
+    )
+
+    def __init__(self, address: str, decimation: int = TELEMETRY_STREAM_DECIMATION) -> None:
+        """
+        :param address: Where to send the data to, see `parse_address`.
+        :param decimation: Only every Nth loop is sent.
+        """
+        if decimation < 1:
+            raise ValueError(f"The decimation must be at least 1, not {decimation}")
+        family, self._address = parse_address(address)
+        self._socket = socket.socket(family, socket.SOCK_DGRAM)
+        self._socket.setblocking(False)
+        # The processed data is made of NumPy floats, which msgpack doesn't know about
+        self._encoder = msgspec.msgpack.Encoder(enc_hook=float)
+        # Encoded into the same buffer every loop, so nothing is allocated
+        self._buffer = bytearray()
+        self.decimation = decimation
+        self.sent = 0
+        self.dropped = 0
+        """The number of datagrams which couldn't be sent, e.g. because nobody was listening."""
+
+    def publish(self, snapshot: PayloadSnapshot) -> None:
+        """
+        Sends the snapshot, unless it is skipped by the decimation. This never blocks.
+        :param snapshot: The snapshot of the latest loop.
+        """
+        if snapshot.sequence % self.decimation:
+            return
+        self._encoder.encode_into(snapshot, self._buffer)
+        try:
+            self._socket.sendto(self._buffer, self._address)
+        except OSError:
+            # Nobody is bound to the Unix socket, or the socket buffer is full
+            self.dropped += 1
+        else:
+            self.sent += 1
+
+    def close(self) -> None:
+        """
+        Closes the socket, and prints how many datagrams were sent.
+        """
+        self._socket.close()
+        print(f"Telemetry stream: {self.sent} datagrams sent, {self.dropped} dropped")
+
+
+def listen(address: str) -> Iterator[dict[str, Any]]:
+    """
+    Binds to the address and yields every snapshot sent to it by a TelemetryStream, decoded into
+    a dictionary. A Unix socket is removed when the generator is closed.
+    :param address: The address the TelemetryStream sends to, see `parse_address`.
+    """
+    family, bind_address = parse_address(address)
+    if family == socket.AF_UNIX:
+        # A socket left behind by a listener which crashed can't be bound to again
+        Path(bind_address).unlink(missing_ok=True)
+    decoder = msgspec.msgpack.Decoder()
+    with socket.socket(family, socket.SOCK_DGRAM) as listener:
+        listener.bind(bind_address)
+        try:
+            while True:
+                yield decoder.decode(listener.recv(TELEMETRY_STREAM_MAX_DATAGRAM_SIZE))
+        finally:
+            if family == socket.AF_UNIX:
+                Path(bind_address).unlink(missing_ok=True)
@@ -0,0 +1,53 @@
+"""Module for the crash-consistent write-ahead log format. In this format, every CSV line of a
+segment is stored as a record which is prefixed with its length and CRC32 checksum, so we know
+exactly which records were completely written to disk."""
+
+import mmap
+import struct
+import zlib
+from collections.abc import Iterator
+
+RECORD_HEADER = struct.Struct("<II")
+"""The header of every record: the length of the data and its CRC32 checksum, little-endian."""
+
+
+def encode_record(data: bytes) -> bytes:
+    """
+    Prefixes the data with its length and checksum.
+    :param data: The data of the record. It can't be empty, since a length of 0 marks the end of
+    the records, e.g. in the preallocated part of a segment.
+    :return: The record, ready to be written.
+    """
+    return RECORD_HEADER.pack(len(data), zlib.crc32(data)) + data
+
+
+def read_record(buffer: bytes | mmap.mmap, offset: int) -> bytes | None:
+    """
+    Reads the record at the offset in the buffer.
+    :param buffer: The contents of a segment.
+    :param offset: The offset of the record.
+    :return: The data of the record, or None if there is no complete, valid record there.
+    """
+    data_start = offset + RECORD_HEADER.size
+    if data_start > len(buffer):
+        return None
+    length, checksum = RECORD_HEADER.unpack_from(buffer, offset)
+    if length == 0 or data_start + length > len(buffer):
+        return None
+    data = buffer[data_start : data_start + length]
+    if zlib.crc32(data) != checksum:
+        return None
+    return data
+
+
+def iter_records(buffer: bytes | mmap.mmap, offset: int = 0) -> Iterator[tuple[int, bytes]]:
+    """
+    Yields the valid records in the buffer, starting at the offset, until the first record which
+    is incomplete or damaged.
+    :param buffer: The contents of a segment.
+    :param offset: The offset of the first record to read.
+    :return: The offset of the end of each record, and its data.
+    """
+    while (data := read_record(buffer, offset)) is not None:
+        offset += RECORD_HEADER.size + len(data)
+        yield offset, data
@@ -0,0 +1,252 @@
+"""Module for the API mode of the XBee, in which everything to and from the XBee is sent in frames
+which are delimited, escaped and checksummed, and for the commands the ground station sends us in
+them. This uses API mode 2 (AP=2), in which the special bytes are escaped, so a start delimiter in
+the stream always starts a frame."""
+
+import re
+
+import msgspec
+
+from payload.constants import STOP_MESSAGE, TRANSMIT_MESSAGE, XBEE_MAX_FRAME_DATA_SIZE
+
+START_DELIMITER = 0x7E
+ESCAPE = 0x7D
+ESCAPE_MASK = 0x20
+"""An escaped byte is sent as ESCAPE followed by the byte XORed with this."""
+
+ESCAPED_BYTES_PATTERN = re.compile(rb"[\x7e\x7d\x11\x13]")
+"""The bytes which are escaped: the start delimiter, the escape, and the XON and XOFF of software
+flow control."""
+
+TRANSMIT_REQUEST = 0x10
+"""The frame type which asks the XBee to send data to another XBee."""
+RECEIVE_PACKET = 0x90
+"""The frame type of data the XBee received from another XBee."""
+
+COMMAND_TYPE = ord("C")
+"""The first byte of a command, which is followed by its sequence number and its code."""
+ACK_TYPE = ord("A")
+"""The first byte of an acknowledgment, which is followed by the sequence number it
+acknowledges."""
+
+COMMAND_CODES = {TRANSMIT_MESSAGE: 1, STOP_MESSAGE: 2}
+"""The code each command is sent as."""
+COMMANDS_BY_CODE = {code: message for message, code in COMMAND_CODES.items()}
+
+# The states of XBeeFrameParser
+_WAITING_FOR_START = 0
+_LENGTH_HIGH_BYTE = 1
+_LENGTH_LOW_BYTE = 2
+_FRAME_DATA = 3
+_CHECKSUM = 4
+
+
+class XBeeReceivePacket(msgspec.Struct):
+    """
+    Data the XBee received from another XBee, or is asked to send to another XBee.
+    """
+
+    address: int
+    """The 64-bit address of the XBee it was received from, or is sent to."""
+    data: bytes
+
+
+class UplinkCommand(msgspec.Struct):
+    """
+    A command sent to us by the ground station.
+    """
+
+    sequence: int
+    """The sequence number, which the ground station increments for every new command, and which
+    we send back in the acknowledgment."""
+    message: str
+    """The command, e.g. TRANSMIT_MESSAGE."""
+
+
+def _escape(match: re.Match) -> bytes:
+    return bytes((ESCAPE, match[0][0] ^ ESCAPE_MASK))
+
+
+def encode_api_frame(frame_data: bytes) -> bytes:
+    """
+    Wraps the frame data in an API frame: a start delimiter, the length, the data and a checksum,
+    with everything after the start delimiter escaped.
+    :param frame_data: The frame type and its fields.
+    :return: The bytes to write to the XBee.
+    """
+    checksum = 0xFF - (sum(frame_data) & 0xFF)
+    body = len(frame_data).to_bytes(2, "big") + frame_data + bytes((checksum,))
+    return bytes((START_DELIMITER,)) + ESCAPED_BYTES_PATTERN.sub(_escape, body)
+
+
+class XBeeFrameParser:
+    """
+    Finds the API frames in the bytes read from the XBee. It is a state machine which is fed
+    bytes as they arrive, so a frame can be split across any number of reads, and the frame data
+    is collected in one buffer which is reused for every frame. Frames with a wrong checksum are
+    dropped, and a start delimiter in the middle of a frame drops that frame and starts a new one,
+    so the parser gets back in step after noise.
+    """
+
+    __slots__ = (
+        "_buffer",
+        "_checksum",
+        "_escaped",
+        "_length",
+        "_position",
+        "_state",
+        "checksum_errors",
+        "dropped_frames",
+    )
+
+    def __init__(self, max_frame_data_size: int = XBEE_MAX_FRAME_DATA_SIZE) -> None:
+        """
+        :param max_frame_data_size: The size of the buffer. Longer frames are dropped.
+        """
+        self._buffer = bytearray(max_frame_data_size)
+        self._state = _WAITING_FOR_START
+        self._escaped = False
+        self._length = 0
+        self._position = 0
+        self._checksum = 0
+        self.checksum_errors = 0
+        """The number of frames dropped because their checksum was wrong."""
+        self.dropped_frames = 0
+        """The number of frames dropped because they were cut short or too long."""
+
+    def feed(self, data: bytes) -> list[bytes]:
+        """
+        Parses the bytes read from the XBee.
+        :param data: The bytes, which can start and end in the middle of frames.
+        :return: The frame data of every frame completed by these bytes.
+        """
+        frames = []
+        for byte in data:
+            if byte == START_DELIMITER:
+                if self._state != _WAITING_FOR_START:
+                    self.dropped_frames += 1
+                self._state = _LENGTH_HIGH_BYTE
+                self._escaped = False
+                continue
+            if self._state == _WAITING_FOR_START:
+                continue
+            if byte == ESCAPE:
+                self._escaped = True
+                continue
+            if self._escaped:
+                byte ^= ESCAPE_MASK  # noqa: PLW2901
+                self._escaped = False
+
+            if self._state == _LENGTH_HIGH_BYTE:
+                self._length = byte << 8
+                self._state = _LENGTH_LOW_BYTE
+            elif self._state == _LENGTH_LOW_BYTE:
+                self._length |= byte
+                if not 0 < self._length <= len(self._buffer):
+                    self.dropped_frames += 1
+                    self._state = _WAITING_FOR_START
+                    continue
+                self._position = 0
+                self._checksum = 0
+                self._state = _FRAME_DATA
+            elif self._state == _FRAME_DATA:
+                self._buffer[self._position] = byte
+                self._position += 1
+                self._checksum += byte
+                if self._position == self._length:
+                    self._state = _CHECKSUM
+            else:
+                # The checksum makes the sum of the frame data end in 0xFF
+                if (self._checksum + byte) & 0xFF == 0xFF:
+                    frames.append(bytes(self._buffer[: self._length]))
+                else:
+                    self.checksum_errors += 1
+                self._state = _WAITING_FOR_START
+        return frames
+
+
+def build_transmit_request(destination_address: int, data: bytes, frame_id: int = 0) -> bytes:
+    """
+    Builds the frame data which asks the XBee to send data to another XBee.
+    :param destination_address: The 64-bit address of the XBee to send it to.
+    :param data: The data to send.
+    :param frame_id: If not 0, the XBee reports whether the data was delivered in a frame with
+    this ID.
+    :return: The frame data.
+    """
+    return (
+        bytes((TRANSMIT_REQUEST, frame_id))
+        + destination_address.to_bytes(8, "big")
+        # The 16-bit address is unknown, and the default broadcast radius and options are used
+        + b"\xff\xfe\x00\x00"
+        + data
+    )
+
+
+def build_receive_packet(address: int, data: bytes) -> bytes:
+    """
+    Builds the frame data the XBee gives us when it receives data, e.g. for a fake XBee.
+    :param address: The 64-bit address of the XBee it was sent from.
+    :param data: The data.
+    :return: The frame data.
+    """
+    # The 16-bit address is unknown, and the receive options say it was acknowledged
+    return bytes((RECEIVE_PACKET,)) + address.to_bytes(8, "big") + b"\xff\xfe\x01" + data
+
+
+def parse_receive_packet(frame_data: bytes) -> XBeeReceivePacket | None:
+    """
+    Parses the frame data of data the XBee received.
+    :param frame_data: The frame data.
+    :return: The received packet, or None if it is another type of frame.
+    """
+    if len(frame_data) < 12 or frame_data[0] != RECEIVE_PACKET:
+        return None
+    return XBeeReceivePacket(int.from_bytes(frame_data[1:9], "big"), frame_data[12:])
+
+
+def parse_transmit_request(frame_data: bytes) -> XBeeReceivePacket | None:
+    """
+    Parses the frame data which asks the XBee to send data, e.g. for a fake XBee.
+    :param frame_data: The frame data.
+    :return: The data and the address it is sent to, or None if it is another type of frame.
+    """
+    if len(frame_data) < 14 or frame_data[0] != TRANSMIT_REQUEST:
+        return None
+    return XBeeReceivePacket(int.from_bytes(frame_data[2:10], "big"), frame_data[14:])
+
+
+def encode_command(command: UplinkCommand) -> bytes:
+    """
+    :param command: The command.
+    :return: The 3 bytes of the command, which are sent in a transmit request.
+    """
+    return bytes((COMMAND_TYPE, command.sequence & 0xFF, COMMAND_CODES[command.message]))
+
+
+def decode_command(data: bytes) -> UplinkCommand | None:
+    """
+    :param data: The data of a receive packet.
+    :return: The command, or None if it isn't a known command.
+    """
+    if len(data) != 3 or data[0] != COMMAND_TYPE or data[2] not in COMMANDS_BY_CODE:
+        return None
+    return UplinkCommand(data[1], COMMANDS_BY_CODE[data[2]])
+
+
+def encode_ack(sequence: int) -> bytes:
+    """
+    :param sequence: The sequence number of the command which is acknowledged.
+    :return: The 2 bytes of the acknowledgment.
+    """
+    return bytes((ACK_TYPE, sequence & 0xFF))
+
+
+def decode_ack(data: bytes) -> int | None:
+    """
+    :param data: The data of a receive packet.
+    :return: The sequence number which is acknowledged, or None if it isn't an acknowledgment.
+    """
+    if len(data) != 2 or data[0] != ACK_TYPE:
+        return None
+    return data[1]
@@ -0,0 +1,126 @@
+"""The ground station decoder. It demodulates our transmissions from WAV recordings or from the
+sound card, and prints the data packets they carry. It can also print the telemetry stream of a
+mock or bench run. Run it with `uv run ground-station`."""
+
+import argparse
+import queue
+import time
+from contextlib import suppress
+from pathlib import Path
+
+import msgspec
+
+from payload.constants import AFSK_DEMODULATOR_BLOCK_SIZE, AFSK_SAMPLE_RATE
+from payload.data_handling.afsk_demodulator import AFSKDemodulator, demodulate_wav
+from payload.data_handling.aprs import decode_transmission
+from payload.data_handling.ax25 import parse_ui_frame
+from payload.data_handling.telemetry_stream import listen
+
+# PortAudio is only installed where there is a sound card, so we ignore it if it is not available
+with suppress(ImportError, OSError):
+    import sounddevice
+
+
+def print_frame(frame: bytes) -> None:
+    """
+    Prints a received frame, decoded into a data packet if it is one of our transmissions.
+    :param frame: The AX.25 frame, without the flags and the FCS.
+    """
+    decoded = decode_transmission(frame)
+    if decoded is not None:
+        source, packet = decoded
+        print(f"{source}: {msgspec.json.encode(packet, enc_hook=float).decode()}")
+        return
+    ui_frame = parse_ui_frame(frame)
+    if ui_frame is not None:
+        print(f"{ui_frame.source} (not ours): {ui_frame.info.decode('latin-1')}")
+
+
+def decode_recordings(paths: list[Path]) -> None:
+    """
+    Decodes our transmissions in WAV recordings.
+    :param paths: The paths of the WAV files.
+    """
+    for path in paths:
+        start_time = time.perf_counter()
+        number_of_frames = 0
+        for frame in demodulate_wav(path):
+            print_frame(frame)
+            number_of_frames += 1
+        print(
+            f"Decoded {number_of_frames} frames from {path} in "
+            f"{time.perf_counter() - start_time:.2f} s"
+        )
+
+
+def decode_live(sample_rate: int) -> None:
+    """
+    Decodes our transmissions from the sound card until interrupted.
+    :param sample_rate: The sample rate to record at.
+    """
+    demodulator = AFSKDemodulator(sample_rate)
+    blocks: queue.Queue = queue.Queue()
+    with sounddevice.InputStream(
+        samplerate=sample_rate,
+        channels=1,
+        blocksize=AFSK_DEMODULATOR_BLOCK_SIZE // 16,
+        # The callback runs on the audio thread, so it only hands the block over
+        callback=lambda block, *_: blocks.put(block[:, 0].copy()),
+    ):
+        print(f"Listening at {sample_rate} Hz, press Ctrl+C to stop")
+        with suppress(KeyboardInterrupt):
+            while True:
+                for frame in demodulator.feed(blocks.get()):
+                    print_frame(frame)
+
+
+def print_telemetry_stream(address: str) -> None:
+    """
+    Prints every loop sent on the telemetry stream of a mock or bench run, until interrupted.
+    :param address: The address given to `--telemetry-stream` of the payload.
+    """
+    print(f"Listening on {address}, press Ctrl+C to stop")
+    with suppress(KeyboardInterrupt):
+        for snapshot in listen(address):
+            print(msgspec.json.encode(snapshot).decode())
+
+
+def main() -> None:
+    """Entry point of the ground station decoder."""
+    parser = argparse.ArgumentParser(
+        description="Decodes the transmissions of the payload from recordings or the sound card."
+    )
+    parser.add_argument(
+        "recordings",
+        help="The WAV recordings to decode. The sound card is used if none are given.",
+        type=Path,
+        nargs="*",
+    )
+    parser.add_argument(
+        "-s",
+        "--sample-rate",
+        help="The sample rate to record from the sound card at.",
+        type=int,
+        default=AFSK_SAMPLE_RATE,
+    )
+    parser.add_argument(
+        "-t",
+        "--telemetry-stream",
+        help="Print the telemetry stream sent to this address by a mock or bench run, instead of "
+        "decoding transmissions.",
+        type=str,
+        default=None,
+        metavar="ADDRESS",
+    )
+    args = parser.parse_args()
+
+    if args.telemetry_stream:
+        print_telemetry_stream(args.telemetry_stream)
+    elif args.recordings:
+        decode_recordings(args.recordings)
+    else:
+        decode_live(args.sample_rate)
+
+
+if __name__ == "__main__":
+    main()
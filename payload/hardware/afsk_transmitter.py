@@ -0,0 +1,112 @@
+"""Module for the AFSKTransmitter class, which modulates the APRS packets itself and plays them
+into the transceiver, without Direwolf."""
+
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from payload.constants import AFSK_SAMPLE_RATE
+from payload.data_handling.afsk import modulate_frame, write_wav
+from payload.data_handling.packets.status_data_packet import StatusDataPacket
+from payload.data_handling.packets.transmitter_data_packet import TransmitterDataPacket
+from payload.hardware.transmission_scheduler import TransmissionJob
+from payload.hardware.transmitter import Transmitter
+
+# PortAudio is only installed where there is a sound card, so we can't play the audio without it
+try:
+    import sounddevice
+except (ImportError, OSError):
+    sounddevice = None
+
+
+class AFSKTransmitter(Transmitter):
+    """
+    Controls the SA85 transceiver like the Transmitter, but the APRS frames are built and
+    modulated to AFSK1200 audio in this process, and played on the sound card while the PTT is
+    held. There is no Direwolf process to configure or restart, so a transmission starts as soon
+    as the audio is ready, and the audio is cached since we send the same message many times.
+    """
+
+    __slots__ = ("_sample_rate", "_wav_path")
+
+    def __init__(
+        self,
+        gpio_pin: int,
+        callsign: str,
+        *,
+        compact_telemetry: bool = False,
+        downlink_duty_cycle: float = 0.0,
+        sample_rate: int = AFSK_SAMPLE_RATE,
+        wav_path: Path | None = None,
+    ) -> None:
+        """
+        :param gpio_pin: The GPIO pin number that is connected to the PTT pin of the transceiver.
+        :param callsign: The callsign the frames are sent from.
+        :param compact_telemetry: Whether to send the compressed position and compact telemetry,
+        which take less than half the air time.
+        :param downlink_duty_cycle: The largest fraction of the time the PTT is held on for the
+        in-flight status beacons, or 0 to not send them.
+        :param sample_rate: The sample rate of the sound card.
+        :param wav_path: If given, the audio is written to this WAV file instead of being played,
+        e.g. to test the modulation.
+        :raises RuntimeError: If the audio has to be played, but PortAudio isn't installed.
+        """
+        # Checked here, so we never key the PTT without being able to play anything
+        if sounddevice is None and wav_path is None:
+            raise RuntimeError(
+                "The AFSK transmitter needs PortAudio to play the audio, install it or use --kiss"
+            )
+        super().__init__(
+            gpio_pin,
+            None,
+            callsign,
+            compact_telemetry=compact_telemetry,
+            downlink_duty_cycle=downlink_duty_cycle,
+        )
+        self._sample_rate = sample_rate
+        self._wav_path = wav_path
+
+    def _render(self, message: TransmitterDataPacket | StatusDataPacket) -> np.ndarray:
+        """
+        Modulates the frame of the message into the audio we play.
+        :param message: The message to render.
+        :return: The audio samples.
+        """
+        return modulate_frame(self._create_frame(message), self._sample_rate)
+
+    def stop(self) -> None:
+        """
+        Stops the transmissions, cutting off any audio which is playing.
+        """
+        self._scheduler.stop()
+        self.pull_pin_low()
+
+        print("Stopped Transmitter")
+
+    def _transmit(self, job: TransmissionJob, cancelled: threading.Event) -> None:
+        """
+        Plays the message of the job once, holding the PTT on while it plays. The PTT is keyed
+        before the audio is modulated, which takes less time than the transceiver takes to start
+        transmitting. This runs on the thread of the scheduler.
+        :param job: The job to transmit.
+        :param cancelled: Set when the job is cancelled or the transmitter is stopping.
+        """
+        if self._wav_path is not None:
+            write_wav(self._wav_path, self._render(job.message), self._sample_rate)
+            return
+
+        self.pull_pin_high()  # Activate PTT via GPIO pin pull-down
+        self._scheduler.mark_keyed(job)
+        audio = self._render(job.message)
+        try:
+            sounddevice.play(audio, self._sample_rate)
+            # Waits for the audio to finish playing, or for a cancellation, which cuts it off
+            if cancelled.wait(len(audio) / self._sample_rate):
+                sounddevice.stop()
+            else:
+                sounddevice.wait()
+        except sounddevice.PortAudioError as e:
+            print(f"Error playing the transmission: {e}")
+        finally:
+            self.pull_pin_low()  # Deactivate PTT via GPIO pin pull-up
@@ -6,6 +6,7 @@ import serial
 
 from payload.constants import ARDUINO_SERIAL_TIMEOUT, PACKET_BYTE_SIZE, PACKET_START_MARKER
 from payload.data_handling.packets.imu_data_packet import IMUDataPacket
+from payload.hardware.io_reactor import IOReactor
 from payload.interfaces.base_imu import BaseIMU
 
 
@@ -15,20 +16,23 @@ class IMU(BaseIMU):
     Arduino.
     """
 
-    __slots__ = ("_baud_rate", "_buffer", "_port", "_serial")
+    __slots__ = ("_baud_rate", "_buffer", "_port", "_reactor", "_serial")
 
-    def __init__(self, port: str, baud_rate: int) -> None:
+    def __init__(self, port: str, baud_rate: int, reactor: IOReactor | None = None) -> None:
         """
         Initializes the object that interacts with the Arduino connected to the Pi.
 
         :param port: The port that the Arduino is connected to (e.g., '/dev/ttyUSB0').
         :param baud_rate: The baud rate of the serial channel (e.g., 115200).
+        :param reactor: If given, the serial port is read on the thread of the reactor, instead of
+        on a thread of its own.
         """
         super().__init__()
         self._port = port
         self._baud_rate = baud_rate
+        self._reactor = reactor
         self._serial = None
-        self._buffer = b""  # Initialize an empty buffer to store serial data
+        self._buffer = bytearray()  # Initialize an empty buffer to store serial data
 
     @staticmethod
     def _process_packet_data(binary_packet: bytes) -> IMUDataPacket:
@@ -57,31 +61,49 @@ class IMU(BaseIMU):
     def _read_data(self) -> None:
         """Function that reads data from the serial port and processes it."""
         while self.is_running:
-            new_data = self._serial.read(self._serial.in_waiting)
+            # Blocks until at least one byte arrives or the timeout passes, then also takes
+            # whatever else has arrived
+            new_data = self._serial.read(max(1, self._serial.in_waiting))
             if new_data:
-                self._buffer += new_data
-                # Process buffer for packets
-                marker_idx = self._buffer.find(PACKET_START_MARKER)
-                if marker_idx == -1:  # No marker found
-                    continue
-
-                packet_start = marker_idx + len(PACKET_START_MARKER)
-                if len(self._buffer) >= packet_start + PACKET_BYTE_SIZE:
-                    # Extract and process packet
-                    packet = self._buffer[packet_start : packet_start + PACKET_BYTE_SIZE]
-                    self._buffer = self._buffer[packet_start + PACKET_BYTE_SIZE :]
-                    data_packet = self._process_packet_data(packet)
-                    self._queued_imu_packets.put(data_packet)
-                else:
-                    continue  # Not enough data for a full packet
+                self._handle_data(new_data)
+
+    def _handle_data(self, new_data: bytes) -> None:
+        """
+        Finds the packets in the data read from the serial port, and queues them. The data can
+        start and end in the middle of a packet.
+
+        :param new_data: The data read from the serial port.
+        """
+        self._buffer += new_data
+        while True:
+            marker_idx = self._buffer.find(PACKET_START_MARKER)
+            if marker_idx == -1:  # No marker found
+                # Keeps the end, which could be the start of a marker
+                del self._buffer[: -len(PACKET_START_MARKER) + 1]
+                return
+
+            packet_start = marker_idx + len(PACKET_START_MARKER)
+            if len(self._buffer) < packet_start + PACKET_BYTE_SIZE:
+                return  # Not enough data for a full packet
+
+            # Extract and process packet
+            packet = bytes(self._buffer[packet_start : packet_start + PACKET_BYTE_SIZE])
+            del self._buffer[: packet_start + PACKET_BYTE_SIZE]
+            self._queued_imu_packets.put(self._process_packet_data(packet))
 
     def start(self):
         """Opens the serial connection to the Arduino."""
         self._serial = serial.Serial(self._port, self._baud_rate, timeout=ARDUINO_SERIAL_TIMEOUT)
-        super().start()
+        if self._reactor is None:
+            super().start()
+            return
+        self._is_running.set()
+        self._reactor.register(self._serial.fileno(), self._handle_data)
 
     def stop(self):
         """Closes the serial connection to the Arduino."""
+        if self._reactor is not None and self._serial:
+            self._reactor.unregister(self._serial.fileno())
         super().stop()
         if self._serial:
             self._serial.close()
@@ -0,0 +1,162 @@
+"""Module for the IOReactor class, which reads all the serial ports on one thread."""
+
+import contextlib
+import os
+import selectors
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+
+from payload.constants import (
+    IO_REACTOR_ERROR_REPORT_INTERVAL,
+    IO_REACTOR_LATENCY_SAMPLE_SIZE,
+    IO_REACTOR_READ_SIZE,
+    IO_REACTOR_STOP_TIMEOUT_SECONDS,
+)
+
+DataHandler = Callable[[bytes], None]
+"""Handles the bytes read from a file, e.g. by finding the packets in them. It runs on the reactor
+thread, so it should be quick and pass what it finds on through a queue. If it raises, the error is
+counted and the other files are still read."""
+
+
+class IOReactor:
+    """
+    Waits for data on a set of file descriptors with `selectors`, on a single thread, and passes
+    whatever is read to the handler of each one. This replaces a thread per serial port, so there
+    are fewer threads competing with the main loop for the GIL, and the time it takes to handle
+    the data of every port is measured in one place.
+
+    The thread is started by the first `register`, and stops after the last `unregister`.
+    """
+
+    __slots__ = (
+        "_lock",
+        "_selector",
+        "_thread",
+        "_wake_read_fd",
+        "_wake_write_fd",
+        "bytes_read",
+        "handle_times_ns",
+        "handler_errors",
+        "wakeups",
+    )
+
+    def __init__(self) -> None:
+        self._selector = selectors.DefaultSelector()
+        # Reentrant, so a handler can unregister its own file
+        self._lock = threading.RLock()
+        # Writing to this pipe wakes up the thread, so it notices when it should stop
+        self._wake_read_fd, self._wake_write_fd = os.pipe()
+        os.set_blocking(self._wake_read_fd, False)
+        self._selector.register(self._wake_read_fd, selectors.EVENT_READ)
+        self._thread: threading.Thread | None = None
+        self.handle_times_ns: deque[int] = deque(maxlen=IO_REACTOR_LATENCY_SAMPLE_SIZE)
+        """The time from the thread waking up to all the data it read being handled, for each
+        time it woke up."""
+        self.wakeups = 0
+        self.bytes_read = 0
+        self.handler_errors: dict[int, int] = {}
+        """The number of times the handler of each file descriptor raised an error."""
+
+    @property
+    def is_running(self) -> bool:
+        """
+        Returns whether the reactor thread is running.
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def register(self, fd: int, handler: DataHandler) -> None:
+        """
+        Starts passing the data read from the file descriptor to the handler. The file descriptor
+        must be non-blocking, which it is for a pyserial port.
+        :param fd: The file descriptor, e.g. `serial.Serial.fileno()`.
+        :param handler: The function which handles the data.
+        """
+        with self._lock:
+            self._selector.register(fd, selectors.EVENT_READ, handler)
+            if not self.is_running:
+                # A thread which is still stopping exits by itself when it sees this one
+                self._thread = threading.Thread(target=self._run, daemon=True, name="IO Reactor")
+                self._thread.start()
+
+    def unregister(self, fd: int) -> None:
+        """
+        Stops reading the file descriptor, and stops the thread if it was the last one. This
+        doesn't close it.
+        :param fd: The file descriptor.
+        """
+        with self._lock:
+            try:
+                self._selector.unregister(fd)
+            except KeyError:
+                return
+            thread = self._thread
+            if len(self._selector.get_map()) > 1:
+                return
+            self._thread = None
+        os.write(self._wake_write_fd, b"\0")
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=IO_REACTOR_STOP_TIMEOUT_SECONDS)
+            if self.handle_times_ns:
+                print(
+                    f"I/O reactor handled {self.bytes_read} bytes in {self.wakeups} wakeups, "
+                    f"taking at most {max(self.handle_times_ns) / 1e6:.2f} ms"
+                )
+            for error_fd, errors in self.handler_errors.items():
+                print(f"I/O reactor handler of file {error_fd} failed {errors} times")
+
+    def _run(self) -> None:
+        """
+        Waits for data and hands it to the handlers until there is nothing left to read. The
+        thread sleeps in `select` while none of the files have data.
+        """
+        while True:
+            events = self._selector.select()
+            woke_ns = time.perf_counter_ns()
+            # Holding the lock while handling the data means that once `unregister` returns, the
+            # file is no longer read and can be closed
+            with self._lock:
+                if self._thread is not threading.current_thread():
+                    return
+                for key, _ in events:
+                    if key.fd == self._wake_read_fd:
+                        with contextlib.suppress(BlockingIOError):
+                            os.read(self._wake_read_fd, IO_REACTOR_READ_SIZE)
+                        continue
+                    if self._selector.get_map().get(key.fd) is not key:
+                        continue  # Unregistered since the select
+                    try:
+                        data = os.read(key.fd, IO_REACTOR_READ_SIZE)
+                    except BlockingIOError:
+                        continue
+                    except OSError as e:
+                        # The device was unplugged
+                        print(f"I/O reactor stopped reading file {key.fd}: {e}")
+                        self._selector.unregister(key.fd)
+                        continue
+                    if not data:
+                        print(f"I/O reactor stopped reading file {key.fd}: end of file")
+                        self._selector.unregister(key.fd)
+                        continue
+                    self.bytes_read += len(data)
+                    self._handle(key.fd, key.data, data)
+                self.wakeups += 1
+            self.handle_times_ns.append(time.perf_counter_ns() - woke_ns)
+
+    def _handle(self, fd: int, handler: DataHandler, data: bytes) -> None:
+        """
+        Hands the data to the handler of a file. An error in one handler mustn't stop the thread,
+        since it reads every other file too, e.g. a receiver fault would stop the IMU.
+        :param fd: The file descriptor the data was read from.
+        :param handler: The handler of the file.
+        :param data: The data.
+        """
+        try:
+            handler(data)
+        except Exception as e:
+            errors = self.handler_errors.get(fd, 0) + 1
+            self.handler_errors[fd] = errors
+            if errors == 1 or errors % IO_REACTOR_ERROR_REPORT_INTERVAL == 0:
+                print(f"I/O reactor handler of file {fd} failed (error {errors}): {e!r}")
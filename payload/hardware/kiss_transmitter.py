@@ -0,0 +1,145 @@
+"""Module for the KISSTransmitter class, which keeps one Direwolf running and sends it our frames
+over its KISS TCP port."""
+
+import os
+import subprocess
+import tempfile
+import threading
+from pathlib import Path
+
+from payload.constants import (
+    AFSK_BAUD_RATE,
+    DIREWOLF_STOP_TIMEOUT_SECONDS,
+    KISS_CONNECT_TIMEOUT_SECONDS,
+    KISS_HOST,
+    KISS_PORT,
+    KISS_PTT_PADDING_SECONDS,
+)
+from payload.data_handling.ax25 import estimate_air_time
+from payload.data_handling.kiss import KISSClient
+from payload.hardware.transmission_scheduler import TransmissionJob
+from payload.hardware.transmitter import Transmitter
+
+
+class KISSTransmitter(Transmitter):
+    """
+    Controls the SA85 transceiver like the Transmitter, but instead of rewriting the Direwolf
+    configuration and restarting Direwolf for every transmission, Direwolf is started once and we
+    build the APRS frames ourselves. A transmission then only takes as long as the frame is on the
+    air, rather than seconds of Direwolf starting up.
+    """
+
+    __slots__ = ("_direwolf_process", "_kiss_client", "kiss_config_path")
+
+    def __init__(
+        self,
+        gpio_pin: int,
+        config_path: Path,
+        callsign: str,
+        *,
+        compact_telemetry: bool = False,
+        downlink_duty_cycle: float = 0.0,
+        host: str = KISS_HOST,
+        port: int = KISS_PORT,
+    ) -> None:
+        """
+        :param gpio_pin: The GPIO pin number that is connected to the PTT pin of the transceiver.
+        :param config_path: The path to the Direwolf configuration file.
+        :param callsign: The callsign the frames are sent from.
+        :param compact_telemetry: Whether to send the compressed position and compact telemetry,
+        which take less than half the air time.
+        :param downlink_duty_cycle: The largest fraction of the time the PTT is held on for the
+        in-flight status beacons, or 0 to not send them.
+        :param host: The host Direwolf is running on.
+        :param port: The KISS TCP port of Direwolf.
+        """
+        super().__init__(
+            gpio_pin,
+            config_path,
+            callsign,
+            compact_telemetry=compact_telemetry,
+            downlink_duty_cycle=downlink_duty_cycle,
+        )
+        self._kiss_client = KISSClient(host, port)
+        self._direwolf_process: subprocess.Popen | None = None
+        # The copy of the configuration Direwolf is started with, see `_write_direwolf_config`
+        self.kiss_config_path: Path | None = None
+
+    def start(self) -> None:
+        """
+        Starts Direwolf and connects to its KISS port.
+        """
+        self.kiss_config_path = self._write_direwolf_config()
+        config_arguments = (
+            [] if self.kiss_config_path is None else ["-c", str(self.kiss_config_path)]
+        )
+        # Stops any Direwolf which is still running from a previous run, since it holds the port
+        subprocess.run(["pkill", "-f", "direwolf"], check=False)
+        self._direwolf_process = self._start_direwolf(*config_arguments)
+        self._kiss_client.connect(KISS_CONNECT_TIMEOUT_SECONDS)
+        self._scheduler.start()
+
+    def stop(self) -> None:
+        """
+        Stops the transmissions, closes the connection and stops Direwolf.
+        """
+        self._scheduler.stop()
+        self.pull_pin_low()
+        self._kiss_client.close()
+
+        if self._direwolf_process:
+            self._direwolf_process.terminate()
+            try:
+                self._direwolf_process.wait(DIREWOLF_STOP_TIMEOUT_SECONDS)
+            except subprocess.TimeoutExpired:
+                self._direwolf_process.kill()
+
+        if self.kiss_config_path is not None:
+            self.kiss_config_path.unlink(missing_ok=True)
+        print("Stopped Transmitter")
+
+    def _write_direwolf_config(self) -> Path | None:
+        """
+        Writes a copy of the Direwolf configuration with our callsign, and with any PBEACON line
+        commented out, since we send the beacons ourselves. The configuration itself is left as it
+        is, since the Transmitter needs its PBEACON line.
+        :return: The path of the copy, or None if there is no configuration.
+        """
+        try:
+            lines = self.config_path.read_text().splitlines(keepends=True)
+        except FileNotFoundError:
+            print("Configuration file not found.")
+            return None
+
+        for i, line in enumerate(lines):
+            if line.startswith("MYCALL"):
+                lines[i] = f"MYCALL {self.callsign}\n"
+            elif line.startswith("PBEACON"):
+                lines[i] = f"#{line}"
+        file_descriptor, path = tempfile.mkstemp(prefix="direwolf_kiss_", suffix=".conf")
+        with os.fdopen(file_descriptor, "w") as file:
+            file.write("".join(lines))
+        return Path(path)
+
+    def _transmit(self, job: TransmissionJob, cancelled: threading.Event) -> None:
+        """
+        Sends the message of the job once, holding the PTT on for as long as the frame takes to be
+        transmitted. The PTT is keyed before the frame is built, since the transceiver takes
+        longer than that to start transmitting. This runs on the thread of the scheduler.
+        :param job: The job to transmit.
+        :param cancelled: Set when the job is cancelled or the transmitter is stopping.
+        """
+        # Reconnects if Direwolf was restarted or wasn't ready when we started
+        if not self._kiss_client.is_connected and not self._kiss_client.connect(
+            KISS_CONNECT_TIMEOUT_SECONDS
+        ):
+            return
+
+        self.pull_pin_high()  # Activate PTT via GPIO pin pull-down
+        self._scheduler.mark_keyed(job)
+        frame = self._render(job.message)
+        ptt_seconds = estimate_air_time(frame, AFSK_BAUD_RATE) + KISS_PTT_PADDING_SECONDS
+        if self._kiss_client.send_frame(frame):
+            # Waiting on the event lets a cancellation cut the transmission short
+            cancelled.wait(ptt_seconds)
+        self.pull_pin_low()  # Deactivate PTT via GPIO pin pull-up
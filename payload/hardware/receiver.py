@@ -1,10 +1,29 @@
 """Module for the Receiver class."""
 
+import contextlib
+import queue
 import threading
+import time
 
 import serial
 
-from payload.constants import NO_MESSAGE, RECEIVER_SERIAL_TIMEOUT, RECEIVER_THREAD_TIMEOUT
+from payload.constants import (
+    NO_MESSAGE,
+    RECEIVER_QUEUE_SIZE,
+    RECEIVER_READ_TIMEOUT_SECONDS,
+    RECEIVER_THREAD_TIMEOUT,
+    RECEIVER_WRITE_TIMEOUT_SECONDS,
+)
+from payload.data_handling.packets.receiver_data_packet import ReceiverDataPacket
+from payload.data_handling.xbee import (
+    XBeeFrameParser,
+    build_transmit_request,
+    decode_command,
+    encode_ack,
+    encode_api_frame,
+    parse_receive_packet,
+)
+from payload.hardware.io_reactor import IOReactor
 from payload.interfaces.base_receiver import BaseReceiver
 
 
@@ -12,14 +31,56 @@ class Receiver(BaseReceiver):
     """
     This is the class that controls the Xbee Pro s3b. On a separate thread, it listens for incoming
     messages from the transmitter and then makes them available to the main thread.
+
+    The XBee is either in transparent mode, where the commands are lines of text, or in API mode,
+    where they are framed, checksummed and numbered, and each one is acknowledged.
     """
 
-    __slots__ = ("_baud_rate", "_latest_message", "_lock", "_port", "_stop_event", "_thread")
+    __slots__ = (
+        "_api_mode",
+        "_baud_rate",
+        "_last_sequences",
+        "_latest_message",
+        "_lock",
+        "_messages",
+        "_parser",
+        "_partial_line",
+        "_port",
+        "_reactor",
+        "_serial",
+        "_stop_event",
+        "_thread",
+        "dropped_messages",
+    )
 
-    def __init__(self, port: str, baud_rate: int) -> None:
+    def __init__(
+        self,
+        port: str,
+        baud_rate: int,
+        api_mode: bool = False,
+        reactor: IOReactor | None = None,
+    ) -> None:
+        """
+        :param port: The serial port of the XBee.
+        :param baud_rate: The baud rate of the serial port.
+        :param api_mode: Whether the XBee is in API mode (AP=2).
+        :param reactor: If given, the serial port is read on the thread of the reactor, instead of
+        on a thread of its own.
+        """
         self._port = port
         self._baud_rate = baud_rate
+        self._api_mode = api_mode
+        self._reactor = reactor
+        self._serial: serial.Serial | None = None
+        self._partial_line = b""
+        self._parser = XBeeFrameParser()
+        # The sequence number of the last command from each ground station, so a command which is
+        # sent again because its acknowledgment was lost isn't handled twice
+        self._last_sequences: dict[int, int] = {}
         self._latest_message: str = NO_MESSAGE
+        # Every command goes through this queue, so none are missed if several arrive in a loop
+        self._messages: queue.Queue[ReceiverDataPacket] = queue.Queue(maxsize=RECEIVER_QUEUE_SIZE)
+        self.dropped_messages = 0
 
         self._lock = threading.Lock()
         self._stop_event = threading.Event()
@@ -31,31 +92,129 @@ class Receiver(BaseReceiver):
         with self._lock:
             return self._latest_message
 
+    def get_messages(self) -> list[ReceiverDataPacket]:
+        """
+        Returns the commands received since the last call, oldest first.
+        """
+        messages = []
+        # Checking first avoids raising queue.Empty in the usual case where nothing was received
+        while not self._messages.empty():
+            try:
+                messages.append(self._messages.get_nowait())
+            except queue.Empty:
+                break
+        return messages
+
     def start(self) -> None:
-        """Starts the listening thread."""
+        """Starts the listening thread, or starts listening on the thread of the reactor."""
         self._stop_event.clear()
-        self._thread.start()
+        if self._reactor is None:
+            self._thread.start()
+            return
+        try:
+            self._serial = serial.Serial(
+                self._port,
+                self._baud_rate,
+                timeout=0,
+                write_timeout=RECEIVER_WRITE_TIMEOUT_SECONDS,
+            )
+        except serial.SerialException as e:
+            print(f"Receiver couldn't start listening: {e}")
+            return
+        self._reactor.register(self._serial.fileno(), self._handle_data)
 
     def stop(self) -> None:
         """Stops the listening thread safely."""
         self._stop_event.set()  # Signal thread to exit
-        self._thread.join(timeout=RECEIVER_THREAD_TIMEOUT)  # Wait for thread to stop
+        if self._reactor is None:
+            self._thread.join(timeout=RECEIVER_THREAD_TIMEOUT)  # Wait for thread to stop
+        elif self._serial is not None:
+            self._reactor.unregister(self._serial.fileno())
+            self._serial.close()
 
     def _listen(self) -> None:
         """
-        Continuously listens for incoming messages from the ground station. It runs on a separate
-        thread and reads the serial port for incoming messages. When a message is received, it is
-        stored in the latest_message attribute.
-        """
-        with serial.Serial(
-            self._port, self._baud_rate, timeout=RECEIVER_SERIAL_TIMEOUT
-        ) as serial_connection:
-            while not self._stop_event.is_set():
-                if serial_connection.in_waiting > 0:
-                    # This reads the incoming message from the serial port and decodes it. If it has
-                    # an error decoding, it will ignore the error it and just keep going. This could
-                    # be a potential issue if we start getting junk data.
-                    line = serial_connection.readline().decode("utf-8", "ignore").strip()
-                    if line:
-                        with self._lock:
-                            self._latest_message = line.strip()
+        Listens for incoming messages from the ground station until the receiver is stopped. It
+        runs on a separate thread, and sleeps in the read of the serial port until data arrives,
+        so it uses no CPU while nothing is received. Every complete line, or command in API mode,
+        is queued with the time it was read.
+        """
+        try:
+            with serial.Serial(
+                self._port,
+                self._baud_rate,
+                timeout=RECEIVER_READ_TIMEOUT_SECONDS,
+                write_timeout=RECEIVER_WRITE_TIMEOUT_SECONDS,
+            ) as self._serial:
+                while not self._stop_event.is_set():
+                    # Blocks until at least one byte arrives or the timeout passes, then also
+                    # takes whatever else has arrived
+                    data = self._serial.read(max(1, self._serial.in_waiting))
+                    if data:
+                        self._handle_data(data)
+        except serial.SerialException as e:
+            print(f"Receiver stopped listening: {e}")
+
+    def _handle_data(self, data: bytes) -> None:
+        """
+        Queues the commands in the data read from the XBee, which can start and end in the middle
+        of a command.
+        :param data: The data read from the XBee.
+        """
+        if self._api_mode:
+            self._handle_frames(data)
+            return
+        *lines, self._partial_line = (self._partial_line + data).split(b"\n")
+        for line in lines:
+            # If it has an error decoding, it will ignore the error and just keep
+            # going. This could be a potential issue if we start getting junk data.
+            message = line.decode("utf-8", "ignore").strip()
+            if message:
+                self._add_message(message)
+
+    def _handle_frames(self, data: bytes) -> None:
+        """
+        Parses the API frames in the data read from the XBee, queues the commands in them, and
+        acknowledges each command, including ones we already have, by writing to the XBee. If the
+        XBee doesn't take the acknowledgment within RECEIVER_WRITE_TIMEOUT_SECONDS, it is dropped,
+        and the ground station sends the command again.
+        :param data: The data read from the XBee.
+        """
+        for frame_data in self._parser.feed(data):
+            packet = parse_receive_packet(frame_data)
+            if packet is None:
+                continue
+            command = decode_command(packet.data)
+            if command is None:
+                print(f"Receiver ignored unknown data: {packet.data!r}")
+                continue
+            if self._last_sequences.get(packet.address) != command.sequence:
+                self._last_sequences[packet.address] = command.sequence
+                self._add_message(command.message)
+            try:
+                self._serial.write(
+                    encode_api_frame(
+                        build_transmit_request(packet.address, encode_ack(command.sequence))
+                    )
+                )
+            except serial.SerialException as e:
+                print(f"Receiver couldn't acknowledge command {command.sequence}: {e}")
+
+    def _add_message(self, message: str) -> None:
+        """
+        Queues a received command. If the queue is full, the oldest command is dropped, since the
+        newest one is the most relevant.
+        :param message: The command.
+        """
+        packet = ReceiverDataPacket(message, time.time_ns())
+        with self._lock:
+            self._latest_message = message
+        while True:
+            try:
+                self._messages.put_nowait(packet)
+                return
+            except queue.Full:
+                with contextlib.suppress(queue.Empty):
+                    self._messages.get_nowait()
+                self.dropped_messages += 1
+                print(f"Receiver queue is full, dropped a command ({self.dropped_messages} so far)")
@@ -0,0 +1,266 @@
+"""Module for the TransmissionScheduler class, which runs all the transmissions of a transmitter
+on one thread."""
+
+import heapq
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from typing import TYPE_CHECKING
+
+import msgspec
+
+from payload.constants import (
+    NUMBER_OF_TRANSMISSIONS,
+    TRANSMISSION_DELAY,
+    TRANSMISSION_LATENCY_SAMPLE_SIZE,
+    TRANSMISSION_SCHEDULER_STOP_TIMEOUT_SECONDS,
+)
+from payload.data_handling.packets.status_data_packet import StatusDataPacket
+from payload.data_handling.packets.transmitter_data_packet import TransmitterDataPacket
+
+if TYPE_CHECKING:
+    from payload.data_handling.metrics import Histogram
+
+
+class TransmissionJob(msgspec.Struct):
+    """
+    A message which is transmitted a number of times, with a delay between the transmissions.
+    """
+
+    key: str
+    """Identifies the job. Requests with the key of a job which is still scheduled are merged into
+    it, rather than transmitted on top of it."""
+    message: TransmitterDataPacket | StatusDataPacket
+    """The message to transmit. Merged requests replace it, so the latest data is sent."""
+    priority: int
+    """Of the jobs which are due, the one with the highest priority is transmitted first."""
+    remaining: int
+    """The number of transmissions left."""
+    interval: float
+    """The delay between the end of a transmission and the start of the next one, in seconds."""
+    requested_ns: int
+    """The `time.perf_counter_ns` at which the job was requested."""
+    deadline: float
+    """The `time.monotonic` at which the next transmission is due."""
+    keyed_ns: int | None = None
+    """The `time.perf_counter_ns` at which the PTT was first keyed for this job."""
+
+
+TransmitFunction = Callable[[TransmissionJob, threading.Event], None]
+"""Transmits a job once. It should return early when the event is set, which means the job was
+cancelled or the scheduler is stopping."""
+
+
+class TransmissionScheduler:
+    """
+    Transmits the scheduled jobs one at a time on a single thread, so transmissions never overlap.
+    The jobs are kept in a priority queue ordered by when they are due, and the thread sleeps on a
+    condition variable until the next one is due or the queue changes, so new requests and
+    cancellations take effect immediately.
+    """
+
+    __slots__ = (
+        "_cancel_event",
+        "_condition",
+        "_current_job",
+        "_is_running",
+        "_jobs",
+        "_queue",
+        "_sequence",
+        "_thread",
+        "_transmit",
+        "latencies_ns",
+        "latency_histogram",
+    )
+
+    def __init__(self, transmit: TransmitFunction) -> None:
+        """
+        :param transmit: The function which transmits a job once. It must call `mark_keyed` as
+        soon as the PTT is keyed.
+        """
+        self._transmit = transmit
+        self._condition = threading.Condition()
+        # Entries are (deadline, -priority, sequence, job). Cancelled jobs are left in the queue,
+        # and skipped when they come up because they are no longer in `_jobs`.
+        self._queue: list[tuple[float, int, int, TransmissionJob]] = []
+        self._jobs: dict[str, TransmissionJob] = {}
+        self._sequence = 0
+        self._current_job: TransmissionJob | None = None
+        self._cancel_event = threading.Event()
+        self._is_running = False
+        self._thread = threading.Thread(
+            target=self._run, daemon=True, name="Transmission Scheduler"
+        )
+        self.latencies_ns: deque[int] = deque(maxlen=TRANSMISSION_LATENCY_SAMPLE_SIZE)
+        """The time from the request of every job to when the PTT was first keyed for it."""
+        self.latency_histogram: Histogram | None = None
+        """If set, the latencies are also observed in it, in seconds, for the metrics."""
+
+    @property
+    def latency_ns(self) -> int | None:
+        """
+        Returns the time from the request to the first keying of the PTT of the latest job, or
+        None if nothing was transmitted yet.
+        """
+        return self.latencies_ns[-1] if self.latencies_ns else None
+
+    @property
+    def is_transmitting(self) -> bool:
+        """
+        Returns whether a job is being transmitted right now.
+        """
+        return self._current_job is not None
+
+    def start(self) -> None:
+        """Starts the scheduler thread."""
+        self._is_running = True
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Cancels all the jobs, interrupts the current transmission and stops the scheduler thread.
+        """
+        with self._condition:
+            self._is_running = False
+            self._jobs.clear()
+            self._queue.clear()
+            self._cancel_event.set()
+            self._condition.notify_all()
+        if self._thread.is_alive():
+            self._thread.join(TRANSMISSION_SCHEDULER_STOP_TIMEOUT_SECONDS)
+
+    def submit(
+        self,
+        message: TransmitterDataPacket | StatusDataPacket,
+        *,
+        key: str = "beacon",
+        priority: int = 0,
+        repeat: int = NUMBER_OF_TRANSMISSIONS,
+        interval: float = TRANSMISSION_DELAY,
+        delay: float = 0.0,
+        blocking: bool = True,
+        requested_ns: int | None = None,
+    ) -> TransmissionJob | None:
+        """
+        Schedules a message to be transmitted. If a job with the same key is still scheduled, the
+        request is merged into it: its message is replaced and it gets at least `repeat`
+        transmissions left, but it keeps its schedule.
+        :param message: The message to transmit.
+        :param key: Identifies the job, for merging and cancelling.
+        :param priority: The priority of the job among the jobs which are due.
+        :param repeat: How many times to transmit the message.
+        :param interval: The delay between the transmissions, in seconds.
+        :param delay: How long to wait before the first transmission, in seconds.
+        :param blocking: If False, the request is dropped rather than waiting for the scheduler
+        thread to release its lock, so the caller is never held up.
+        :param requested_ns: The `time.perf_counter_ns` the latency to the PTT is measured from,
+        if the request was made before this call. By default, it is the time of this call.
+        :return: The job the request was scheduled as, or None if it was dropped.
+        """
+        if not self._condition.acquire(blocking=blocking):
+            return None
+        try:
+            job = self._jobs.get(key)
+            if job is not None:
+                job.message = message
+                job.remaining = max(job.remaining, repeat)
+                return job
+
+            job = TransmissionJob(
+                key=key,
+                message=message,
+                priority=priority,
+                remaining=repeat,
+                interval=interval,
+                requested_ns=time.perf_counter_ns() if requested_ns is None else requested_ns,
+                deadline=time.monotonic() + delay,
+            )
+            self._jobs[key] = job
+            self._push(job)
+            return job
+        finally:
+            self._condition.release()
+
+    def cancel(self, key: str | None = None) -> None:
+        """
+        Cancels the scheduled jobs, and interrupts the current transmission if it is one of them.
+        :param key: The key of the job to cancel, or None to cancel all of them.
+        """
+        with self._condition:
+            if key is None:
+                self._jobs.clear()
+                self._queue.clear()
+            else:
+                self._jobs.pop(key, None)
+            if self._current_job is not None and key in (None, self._current_job.key):
+                self._cancel_event.set()
+            self._condition.notify_all()
+
+    def mark_keyed(self, job: TransmissionJob) -> None:
+        """
+        Records that the PTT was just keyed for the job. The first time this is called for a job,
+        the latency from its request is measured.
+        :param job: The job being transmitted.
+        """
+        if job.keyed_ns is None:
+            job.keyed_ns = time.perf_counter_ns()
+            self.latencies_ns.append(job.keyed_ns - job.requested_ns)
+            if self.latency_histogram is not None:
+                self.latency_histogram.observe((job.keyed_ns - job.requested_ns) / 1e9)
+
+    def _push(self, job: TransmissionJob) -> None:
+        """
+        Adds the job to the queue, and wakes up the scheduler thread since it may be due before
+        what the thread is waiting for. Must be called with the condition held.
+        :param job: The job to add.
+        """
+        self._sequence += 1
+        heapq.heappush(self._queue, (job.deadline, -job.priority, self._sequence, job))
+        self._condition.notify_all()
+
+    def _next_job(self) -> TransmissionJob | None:
+        """
+        Waits until the next job is due.
+        :return: The job, or None if the scheduler is stopping.
+        """
+        with self._condition:
+            while self._is_running:
+                now = time.monotonic()
+                # Of the jobs which are due, the one with the highest priority goes first
+                due = [entry for entry in self._queue if entry[0] <= now]
+                if due:
+                    entry = min(due, key=lambda entry: entry[1:3])
+                    self._queue.remove(entry)
+                    heapq.heapify(self._queue)
+                    job = entry[3]
+                    # Skips the jobs which were cancelled
+                    if self._jobs.get(job.key) is not job:
+                        continue
+                    self._current_job = job
+                    self._cancel_event.clear()
+                    return job
+                timeout = self._queue[0][0] - now if self._queue else None
+                self._condition.wait(timeout)
+            return None
+
+    def _run(self) -> None:
+        """
+        Transmits the jobs as they become due, until the scheduler is stopped.
+        """
+        while (job := self._next_job()) is not None:
+            try:
+                self._transmit(job, self._cancel_event)
+            except Exception as e:
+                print(f"Error while transmitting: {e}")
+
+            with self._condition:
+                self._current_job = None
+                job.remaining -= 1
+                if self._jobs.get(job.key) is not job:
+                    continue
+                if job.remaining > 0:
+                    job.deadline = time.monotonic() + job.interval
+                    self._push(job)
+                else:
+                    del self._jobs[job.key]
@@ -5,6 +5,7 @@ from pathlib import Path
 import subprocess
 import threading
 import time
+from typing import TYPE_CHECKING
 
 from payload.interfaces.base_transmitter import BaseTransmitter
 
@@ -14,14 +15,24 @@ try:
 except (ImportError, RuntimeError):
     pass
 
+from payload.data_handling.aprs import create_position_report, create_status_report
+from payload.data_handling.ax25 import build_ui_frame
+from payload.data_handling.packets.status_data_packet import StatusDataPacket
 from payload.data_handling.packets.transmitter_data_packet import TransmitterDataPacket
+from payload.hardware.transmission_scheduler import TransmissionJob, TransmissionScheduler
+from payload.scheduling import ComponentSchedule, apply_process_schedule
 from payload.interfaces.base_transmitter import BaseTransmitter
 from payload.constants import (
-    NUMBER_OF_TRANSMISSIONS,
+    APRS_DESTINATION,
+    TRANSMISSION_LATENCY_BUCKETS_SECONDS,
     TRANSMISSION_WINDOW_SECONDS,
-    TRANSMISSION_DELAY,
 )
 
+if TYPE_CHECKING:
+    import numpy as np
+
+    from payload.data_handling.metrics import MetricsRegistry
+
 
 class Transmitter(BaseTransmitter):
     """
@@ -29,20 +40,54 @@ class Transmitter(BaseTransmitter):
     to our ground station.
     """
 
-    __slots__ = ("_stop_event", "config_path", "gpio_pin", "message_worker_thread")
-
-    def __init__(self, gpio_pin: int, config_path: Path, callsign: str) -> None:
+    __slots__ = (
+        "_beacon_job",
+        "_configured_message",
+        "_scheduler",
+        "_status_not_before",
+        "callsign",
+        "compact_telemetry",
+        "config_path",
+        "direwolf_schedule",
+        "downlink_duty_cycle",
+        "gpio_pin",
+    )
+
+    def __init__(
+        self,
+        gpio_pin: int,
+        config_path: Path | None,
+        callsign: str,
+        compact_telemetry: bool = False,
+        downlink_duty_cycle: float = 0.0,
+    ) -> None:
         """
         Initializes the transmitter with the specified GPIO pin and Direwolf configuration file
         path.
         :param gpio_pin: The GPIO pin number that is connected to the PTT pin of the transceiver.
-        :param config_path: The path to the Direwolf configuration file.
+        :param config_path: The path to the Direwolf configuration file, or None for the
+        transmitters which don't use Direwolf.
+        :param compact_telemetry: Whether the frames made by `_create_frame` use the compressed
+        position and compact telemetry. Direwolf makes the frames of this class, so it doesn't
+        use it.
+        :param downlink_duty_cycle: The largest fraction of the time the PTT is held on for the
+        in-flight status beacons, or 0 to not send them. Direwolf only sends the beacon of its
+        configuration, so this class doesn't send them.
         """
         self.gpio_pin = gpio_pin
         self.config_path = config_path
-        self._stop_event = threading.Event()
-        self.message_worker_thread = None
+        # All the transmissions run on the thread of the scheduler, one at a time
+        self._scheduler = TransmissionScheduler(self._run_job)
+        self._configured_message: TransmitterDataPacket | None = None
+        self.downlink_duty_cycle = downlink_duty_cycle
+        # The time.monotonic before which no status beacon is sent, to keep to the duty cycle
+        self._status_not_before = 0.0
+        self._beacon_job: TransmissionJob | None = None
         self.callsign = callsign
+        self.compact_telemetry = compact_telemetry
+        self.direwolf_schedule: ComponentSchedule | None = None
+        """The schedule of the transmitter in the scheduling profile, if one was applied. Direwolf
+        is started again for every transmission, so it is scheduled every time it starts."""
 
         self.setup_gpio()
 
@@ -67,6 +112,30 @@ class Transmitter(BaseTransmitter):
     def cleanup_gpio(self):
         GPIO.cleanup()  # Clean up GPIO to ensure no resources are left hanging
 
+    def register_metrics(self, registry: "MetricsRegistry") -> None:
+        """
+        Registers the latency of the transmissions, and whether one is being transmitted.
+        :param registry: The registry to add them to.
+        """
+        self._scheduler.latency_histogram = registry.histogram(
+            "payload_transmission_latency_seconds",
+            "The time from the request of a transmission to keying the PTT.",
+            TRANSMISSION_LATENCY_BUCKETS_SECONDS,
+        )
+        registry.gauge(
+            "payload_transmitting",
+            "Whether a transmission is on the air.",
+            lambda: int(self._scheduler.is_transmitting),
+        )
+
+    @property
+    def scheduler(self) -> TransmissionScheduler:
+        """
+        Returns the scheduler of the transmissions, which measures the latency from the request of
+        a transmission to when the PTT is keyed.
+        """
+        return self._scheduler
+
     def _create_beacon_line(self, message: TransmitterDataPacket) -> str:
         lat = message.landing_coords[0]
         lon = message.landing_coords[1]
@@ -86,6 +155,28 @@ class Transmitter(BaseTransmitter):
         # return f'PBEACON delay=0:1 every=0:5 overlay=S symbol=\\O lat={lat_str} long={lon_str} comment="t=22.0,a=0.1,b=13.2,"'
         return f'PBEACON delay=0:1 every=0:5 overlay=S symbol=\\O lat={lat_str} long={lon_str} comment="{message.compress_packet()}"'
 
+    def _create_frame(self, message: TransmitterDataPacket | StatusDataPacket) -> bytes:
+        """
+        Builds the AX.25 frame of the APRS position report of the message, or the status report of
+        an in-flight status, for the transmitters which don't let Direwolf build it.
+        :param message: The message to send.
+        :return: The frame, without the flags and the FCS.
+        """
+        if isinstance(message, StatusDataPacket):
+            info = create_status_report(message)
+        else:
+            info = create_position_report(message, compact=self.compact_telemetry)
+        return build_ui_frame(self.callsign, APRS_DESTINATION, info)
+
+    def _render(self, message: TransmitterDataPacket | StatusDataPacket) -> "bytes | np.ndarray":
+        """
+        Renders the message into what is sent to the transceiver, which is the frame unless a
+        subclass sends something else.
+        :param message: The message to render.
+        :return: The rendered message.
+        """
+        return self._create_frame(message)
+
     def _update_beacon_comment(self, message: TransmitterDataPacket) -> bool:
         """
         Updates the Direwolf configuration file with the new comment.
@@ -121,53 +212,82 @@ class Transmitter(BaseTransmitter):
             print(f"Error updating configuration: {e}")
             return False
 
-    def restart_direwolf(self):
+    def restart_direwolf(self, cancelled: threading.Event | None = None) -> None:
+        """
+        Restarts Direwolf, which makes it send the beacon in its configuration.
+        :param cancelled: If given, the wait for Direwolf to exit is cut short when it is set.
+        """
         subprocess.run(["pkill", "-f", "direwolf"], check=False)  # Try to stop Direwolf
-        time.sleep(2)  # Wait for a moment to ensure the process has terminated
-        subprocess.Popen(
-            ["direwolf"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
-        )  # Start Direwolf again
-
-    def _send_message_worker(self, message: TransmitterDataPacket) -> None:
+        # Wait for a moment to ensure the process has terminated
+        if cancelled is None:
+            time.sleep(2)
+        elif cancelled.wait(2):
+            return
+        self._start_direwolf()  # Start Direwolf again
+
+    def _start_direwolf(self, *arguments: str) -> subprocess.Popen:
         """
-        When sending a message we sleep to give the transceiver time to start transmitting. We then
-        pull the PTT pin low to start the transmission. We then sleep for the duration of the
-        transmission before pulling the PTT pin high to stop the transmission. Because sleeping is
-        blocking, we run this in a separate thread.
-        :param message: The message to send.
+        Starts Direwolf, and schedules it like the rest of the transmitter.
+        :param arguments: The command line arguments of Direwolf.
+        :return: The Direwolf process.
         """
+        process = subprocess.Popen(
+            ["direwolf", *arguments], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        if self.direwolf_schedule is not None:
+            apply_process_schedule("transmitter", self.direwolf_schedule, "direwolf", process.pid)
+        return process
 
-        if self._update_beacon_comment(message):
-            for i in range(NUMBER_OF_TRANSMISSIONS):
-                # print("Configuration updated successfully.")
-                if self._stop_event.is_set():
-                    break
-                self.pull_pin_high()  # Activate PTT via GPIO pin pull-down
-                self.restart_direwolf()
-
-                time.sleep(
-                    TRANSMISSION_WINDOW_SECONDS
-                )  # Duration for which the pin should remain low
-
-                self.pull_pin_low()  # Deactivate PTT via GPIO pin pull-up
-                # print("Transmission complete. Pin reset.")
-                subprocess.run(["pkill", "-f", "direwolf"], check=False)  # Try to stop Direwolf
-
-                time.sleep(TRANSMISSION_DELAY)
-
-        else:
-            print("Failed to update the configuration. Please check the file and try again.")
+    def _run_job(self, job: TransmissionJob, cancelled: threading.Event) -> None:
+        """
+        Transmits the job once, and after a status beacon, holds off the next one for long enough
+        to keep to the duty cycle. This runs on the thread of the scheduler.
+        :param job: The job to transmit.
+        :param cancelled: Set when the job is cancelled or the transmitter is stopping.
+        """
+        start_time = time.monotonic()
+        self._transmit(job, cancelled)
+        if isinstance(job.message, StatusDataPacket):
+            end_time = time.monotonic()
+            on_air_time = end_time - start_time
+            self._status_not_before = end_time + on_air_time * (1 / self.downlink_duty_cycle - 1)
+
+    def _transmit(self, job: TransmissionJob, cancelled: threading.Event) -> None:
+        """
+        Transmits the message of the job once. The configuration of Direwolf is only rewritten
+        when the message changed, and we then restart Direwolf with the PTT held on for the
+        transmission window. This runs on the thread of the scheduler.
+        :param job: The job to transmit.
+        :param cancelled: Set when the job is cancelled or the transmitter is stopping.
+        """
+        if job.message is not self._configured_message:
+            if not self._update_beacon_comment(job.message):
+                print("Failed to update the configuration. Please check the file and try again.")
+                return
+            self._configured_message = job.message
+
+        self.pull_pin_high()  # Activate PTT via GPIO pin pull-down
+        self._scheduler.mark_keyed(job)
+        try:
+            self.restart_direwolf(cancelled)
+            # Waiting on the event lets a cancellation cut the transmission short
+            cancelled.wait(TRANSMISSION_WINDOW_SECONDS)
+        finally:
+            self.pull_pin_low()  # Deactivate PTT via GPIO pin pull-up
+            subprocess.run(["pkill", "-f", "direwolf"], check=False)  # Try to stop Direwolf
 
     def start(self) -> None:
         """
         Starts the transmitter.
         """
-        pass
+        self._scheduler.start()
 
     def stop(self) -> None:
         """
         Cleans up the GPIO pins when the transmitter is stopped.
         """
+        # Cancels the transmissions first, so a transmission can't key the PTT again afterwards
+        self._scheduler.stop()
 
         self.pull_pin_low()  # Deactivate PTT via GPIO pin pull-up
 
@@ -179,28 +299,45 @@ class Transmitter(BaseTransmitter):
             else:
                 print(f"Error while stopping Direwolf: {e}")
 
-        self._stop_event.set()
-
-        if self.message_worker_thread:
-            self.message_worker_thread.join(5)
-
         # GPIO.cleanup()
 
+        if self._beacon_job is not None and self._beacon_job.keyed_ns is not None:
+            latency_ns = self._beacon_job.keyed_ns - self._beacon_job.requested_ns
+            print(f"The beacon was keyed up {latency_ns / 1e6:.2f} ms after it was requested")
+
         print("Stopped Transmitter")
 
-    def send_message(self, message: TransmitterDataPacket) -> None:
+    def send_message(self, message: TransmitterDataPacket, requested_ns: int | None = None) -> None:
         """
-        Sends a message to the ground station.
+        Sends a message to the ground station. The message is scheduled NUMBER_OF_TRANSMISSIONS
+        times. If the beacon is still being sent, its message is replaced instead of a second
+        beacon being sent on top of it. Any status beacon is cut off, so this one goes out first.
+        :param message: The message to send.
+        :param requested_ns: The `time.perf_counter_ns` at which the message was asked for, e.g.
+        when landing was detected. The latency to the PTT being keyed is measured from it.
         """
+        self._scheduler.cancel("status")
+        self._beacon_job = self._scheduler.submit(message, requested_ns=requested_ns)
 
-        # self._send_message_worker(message)
-
-        self.message_worker_thread = threading.Thread(
-            target=self._send_message_worker, args=(message,)
+    def send_status(self, status: StatusDataPacket) -> bool:
+        """
+        Schedules an in-flight status beacon, as soon as the duty cycle allows. Until it is sent,
+        later statuses replace it, so the latest one goes out. This is called from the flight
+        loop, so it never waits on the transmission thread; the frame is built and transmitted
+        there.
+        :param status: The in-flight status.
+        :return: Whether the status was scheduled.
+        """
+        if self.downlink_duty_cycle <= 0:
+            return False
+        delay = max(0.0, self._status_not_before - time.monotonic())
+        job = self._scheduler.submit(
+            status, key="status", priority=-1, repeat=1, delay=delay, blocking=False
         )
+        return job is not None
 
-        # pid = os.getpid()
-        # p = psutil.Process(pid)
-        # p.nice(-20)
-
-        self.message_worker_thread.start()
+    def cancel_transmissions(self) -> None:
+        """
+        Cancels the scheduled transmissions, and cuts off the current one.
+        """
+        self._scheduler.cancel()
@@ -4,9 +4,13 @@ the IMU (Inertial measurement unit) on the rocket."""
 import threading
 from abc import ABC, abstractmethod
 from queue import Queue
+from typing import TYPE_CHECKING
 
 from payload.data_handling.packets.imu_data_packet import IMUDataPacket
 
+if TYPE_CHECKING:
+    from payload.data_handling.metrics import MetricsRegistry
+
 
 class BaseIMU(ABC):
     """
@@ -35,12 +39,19 @@ class BaseIMU(ABC):
         """
         return self._is_running.is_set()
 
+    @property
+    def queue_depth(self) -> int:
+        """
+        Returns the number of IMU packets waiting for the flight loop.
+        """
+        return self._queued_imu_packets.qsize()
+
     def start(self) -> None:
         """
         Starts the IMU.
         """
         self._is_running.set()
-        self._thread = threading.Thread(target=self._read_data, daemon=True)
+        self._thread = threading.Thread(target=self._read_data, daemon=True, name="IMU Thread")
         self._thread.start()
 
     def stop(self) -> None:
@@ -58,3 +69,14 @@ class BaseIMU(ABC):
         :return: The most recent IMU data packet.
         """
         return self._queued_imu_packets.get()
+
+    def register_metrics(self, registry: "MetricsRegistry") -> None:
+        """
+        Registers the metrics of the IMU, which are read when they are scraped.
+        :param registry: The registry to add them to.
+        """
+        registry.gauge(
+            "payload_imu_queue_depth",
+            "The number of IMU packets waiting for the flight loop.",
+            lambda: self.queue_depth,
+        )
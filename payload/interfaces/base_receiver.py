@@ -2,11 +2,13 @@
 
 from abc import ABC, abstractmethod
 
+from payload.data_handling.packets.receiver_data_packet import ReceiverDataPacket
+
 
 class BaseReceiver(ABC):
     """
-    Represents the receiver on the rocket. This class will read data and package it into an
-    ReceiverDataPacket that can be fetched with the fetch_data method.
+    Represents the receiver on the rocket. This class will read data and package it into
+    ReceiverDataPacket objects that can be fetched with the get_messages method.
     """
 
     @property
@@ -16,6 +18,13 @@ class BaseReceiver(ABC):
         Property to get the most recently received message.
         """
 
+    @abstractmethod
+    def get_messages(self) -> list[ReceiverDataPacket]:
+        """
+        Returns the commands received since the last call, oldest first. It must not block,
+        since it is called every loop.
+        """
+
     @abstractmethod
     def start(self) -> None:
         """
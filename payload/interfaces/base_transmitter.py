@@ -1,6 +1,11 @@
 """Module for defining the base class (BaseTransmitter)"""
 
 from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from payload.data_handling.metrics import MetricsRegistry
+    from payload.data_handling.packets.status_data_packet import StatusDataPacket
 
 
 class BaseTransmitter(ABC):
@@ -21,8 +26,26 @@ class BaseTransmitter(ABC):
         """
 
     @abstractmethod
-    def send_message(self, message: str) -> None:
+    def send_message(self, message: str, requested_ns: int | None = None) -> None:
         """
         Sends a message to the ground station.
         :param message: The message to send.
+        :param requested_ns: The `time.perf_counter_ns` at which the message was asked for, e.g.
+        when landing was detected, for the transmitters which measure their latency.
+        """
+
+    @abstractmethod
+    def send_status(self, status: "StatusDataPacket") -> bool:
+        """
+        Sends an in-flight status to the ground station, if the transmitter sends them. This is
+        called every loop during coast and free fall, so it must return right away.
+        :param status: The in-flight status.
+        :return: Whether the status was scheduled.
+        """
+
+    def register_metrics(self, registry: "MetricsRegistry") -> None:  # noqa: B027
+        """
+        Registers the metrics of the transmitter. The transmitters which don't measure anything
+        register none.
+        :param registry: The registry to add them to.
         """
@@ -3,12 +3,15 @@ and run the main loop."""
 
 import argparse
 import sys
+import threading
 import time
 import hashlib
+from typing import TYPE_CHECKING
 
 from payload.constants import (
     ARDUINO_BAUD_RATE,
     ARDUINO_SERIAL_PORT,
+    DEFAULT_SCHEDULING_PROFILE,
     DIREWOLF_CONFIG_PATH,
     LOGS_PATH,
     MOCK_MESSAGE_PATH,
@@ -22,12 +25,18 @@ from payload.constants import (
 )
 from payload.data_handling.data_processor import DataProcessor
 from payload.data_handling.logger import Logger
+from payload.data_handling.metrics import MetricsRegistry, MetricsServer
+from payload.data_handling.telemetry_stream import TelemetryStream
+from payload.hardware.afsk_transmitter import AFSKTransmitter
 from payload.hardware.camera import Camera
 from payload.hardware.imu import IMU
+from payload.hardware.io_reactor import IOReactor
+from payload.hardware.kiss_transmitter import KISSTransmitter
 from payload.hardware.receiver import Receiver
 from payload.hardware.transmitter import Transmitter
 from payload.interfaces.base_imu import BaseIMU
 from payload.interfaces.base_receiver import BaseReceiver
+from payload.memory_diagnostics import MemoryDiagnostics
 from payload.mock.display import FlightDisplay
 from payload.mock.mock_camera import MockCamera
 from payload.mock.mock_imu import MockIMU
@@ -35,8 +44,13 @@ from payload.mock.mock_logger import MockLogger
 from payload.mock.mock_receiver import MockReceiver
 from payload.mock.mock_transmitter import MockTransmitter
 from payload.payload import PayloadContext
+from payload.profiler import create_profiler
+from payload.scheduling import apply_scheduling_profile, load_scheduling_profile
 from payload.utils import arg_parser
 
+if TYPE_CHECKING:
+    from payload.mock.dashboard import FlightDashboard
+
 
 def run_real_flight() -> None:
     """Entry point for the application to run the real flight. Entered when run with
@@ -65,12 +79,46 @@ def run_flight(args: argparse.Namespace) -> None:
         validate_callsign(args)
 
     imu, logger, data_processor, transmitter, receiver, camera = create_components(args)
+    telemetry_stream = (
+        TelemetryStream(args.telemetry_stream, args.telemetry_decimation)
+        if args.telemetry_stream
+        else None
+    )
     # Initialize the payload context and display
-    payload = PayloadContext(imu, logger, data_processor, transmitter, receiver, camera)
-    flight_display = FlightDisplay(payload, mock_time_start, args)
+    payload = PayloadContext(
+        imu,
+        logger,
+        data_processor,
+        transmitter,
+        receiver,
+        camera,
+        telemetry_stream=telemetry_stream,
+    )
+    metrics_server = None
+    if args.metrics_port is not None:
+        registry = MetricsRegistry()
+        payload.register_metrics(registry)
+        metrics_server = MetricsServer(registry, args.metrics_port)
+        metrics_server.start()
+    # SIGUSR1 toggles tracing allocations, and SIGUSR2 writes a memory report
+    memory_diagnostics = MemoryDiagnostics(logger)
+    memory_diagnostics.install()
+
+    try:
+        if args.tui:
+            # Imported here, since Textual takes a quarter of a second to import
+            from payload.mock.dashboard import FlightDashboard  # noqa: PLC0415
 
-    # Run the main flight loop
-    run_flight_loop(payload, flight_display, args)
+            run_dashboard(payload, FlightDashboard(payload, mock_time_start, args), args)
+        else:
+            flight_display = FlightDisplay(payload, mock_time_start, args)
+
+            # Run the main flight loop
+            run_flight_loop(payload, flight_display, args)
+    finally:
+        memory_diagnostics.uninstall()
+        if metrics_server is not None:
+            metrics_server.stop()
 
 def validate_callsign(args: argparse.Namespace) -> None:
     """
@@ -104,24 +152,32 @@ def create_components(
     :param args: Command line arguments determining the configuration.
     :return: A tuple containing the objects needed to initialize `PayloadContext`.
     """
+    # The serial ports of the IMU and the receiver are read on this one thread
+    reactor = IOReactor()
     if args.mode == "mock":
         # Replace hardware with mock objects for mock replay
         imu = (
-            IMU(ARDUINO_SERIAL_PORT, ARDUINO_BAUD_RATE)
+            IMU(ARDUINO_SERIAL_PORT, ARDUINO_BAUD_RATE, reactor)
             if args.real_imu
             else MockIMU(
                 log_file_path=args.path,
                 real_time_replay=not args.fast_replay,
             )
         )
-        logger = MockLogger(LOGS_PATH, delete_log_file=not args.keep_log_file)
+        logger = MockLogger(
+            LOGS_PATH,
+            delete_log_file=not args.keep_log_file,
+            log_format="wal" if args.write_ahead_log else "csv",
+        )
         transmitter = (
-            Transmitter(TRANSMITTER_PIN, DIREWOLF_CONFIG_PATH)
+            create_transmitter(args)
             if args.real_transmitter
             else MockTransmitter(MOCK_MESSAGE_PATH)
         )
         receiver = (
-            Receiver(RECEIVER_SERIAL_PORT, RECEIVER_BAUD_RATE)
+            Receiver(
+                RECEIVER_SERIAL_PORT, RECEIVER_BAUD_RATE, api_mode=args.xbee_api, reactor=reactor
+            )
             if args.real_receiver
             else MockReceiver(
                 MOCK_RECEIVER_INITIAL_DELAY, MOCK_RECEIVER_RECEIVE_DELAY, TRANSMIT_MESSAGE
@@ -130,10 +186,12 @@ def create_components(
         camera = Camera() if args.real_camera else MockCamera()
     else:
         # Use real hardware components
-        imu = IMU(ARDUINO_SERIAL_PORT, ARDUINO_BAUD_RATE)
-        logger = Logger(LOGS_PATH)
-        transmitter = Transmitter(TRANSMITTER_PIN, DIREWOLF_CONFIG_PATH, args.callsign)
-        receiver = Receiver(RECEIVER_SERIAL_PORT, RECEIVER_BAUD_RATE)
+        imu = IMU(ARDUINO_SERIAL_PORT, ARDUINO_BAUD_RATE, reactor)
+        logger = Logger(LOGS_PATH, log_format="wal" if args.write_ahead_log else "csv")
+        transmitter = create_transmitter(args)
+        receiver = Receiver(
+            RECEIVER_SERIAL_PORT, RECEIVER_BAUD_RATE, api_mode=args.xbee_api, reactor=reactor
+        )
         camera = Camera()
 
     # Initialize data processing
@@ -141,8 +199,59 @@ def create_components(
     return imu, logger, data_processor, transmitter, receiver, camera
 
 
+def create_transmitter(args: argparse.Namespace) -> Transmitter:
+    """
+    Creates the real transmitter, with the backend chosen by the command line arguments.
+    :param args: Command line arguments determining the configuration.
+    :return: The transmitter.
+    """
+    if args.kiss:
+        return KISSTransmitter(
+            TRANSMITTER_PIN,
+            DIREWOLF_CONFIG_PATH,
+            args.callsign,
+            compact_telemetry=args.compact_telemetry,
+            downlink_duty_cycle=args.downlink_duty_cycle,
+        )
+    if args.afsk:
+        return AFSKTransmitter(
+            TRANSMITTER_PIN,
+            args.callsign,
+            compact_telemetry=args.compact_telemetry,
+            downlink_duty_cycle=args.downlink_duty_cycle,
+        )
+    return Transmitter(TRANSMITTER_PIN, DIREWOLF_CONFIG_PATH, args.callsign)
+
+
+def run_dashboard(
+    payload: PayloadContext, dashboard: "FlightDashboard", args: argparse.Namespace
+) -> None:
+    """
+    Runs the flight with the Textual dashboard. The dashboard has to run on the main thread, so
+    the flight loop runs on another one.
+    :param payload: The payload context managing the state machine.
+    :param dashboard: The dashboard showing the flight.
+    :param args: Command line arguments determining the configuration.
+    """
+    flight_thread = threading.Thread(
+        target=run_flight_loop,
+        args=(payload, dashboard, args),
+        daemon=True,
+        name="Flight Loop",
+    )
+    flight_thread.start()
+    dashboard.run()
+    try:
+        flight_thread.join()
+    except KeyboardInterrupt:
+        # The flight loop is stuck waiting for data, so the payload is stopped from here
+        payload.stop()
+
+
 def run_flight_loop(
-    payload: PayloadContext, flight_display: FlightDisplay, args: argparse.Namespace
+    payload: PayloadContext,
+    flight_display: "FlightDisplay | FlightDashboard",
+    args: argparse.Namespace,
 ) -> None:
     """
     Main flight control loop that runs until shutdown is requested or interrupted.
@@ -150,8 +259,23 @@ def run_flight_loop(
     :param flight_display: Display interface for flight data.
     :param args: Command line arguments determining the configuration.
     """
+    # Started on this thread, since cProfile only profiles the thread it was started on
+    profiler = create_profiler(args.profile, args.profile_interval)
+    if profiler is not None:
+        profiler.start()
     payload.start()
     flight_display.start()
+    # Applied once everything is started, since it is applied to the threads which are running
+    scheduling_profile = args.scheduling_profile or (
+        DEFAULT_SCHEDULING_PROFILE if args.mode == "real" else "none"
+    )
+    if scheduling_profile != "none":
+        apply_scheduling_profile(scheduling_profile, payload.logger.pid)
+        # The Transmitter starts Direwolf again for every transmission, after this
+        if isinstance(payload.transmitter, Transmitter):
+            payload.transmitter.direwolf_schedule = load_scheduling_profile(
+                scheduling_profile
+            ).get("transmitter")
 
     try:
         while True:
@@ -161,6 +285,9 @@ def run_flight_loop(
             # For some reason if you put the below as a loop condition, Ctrl+C doesn't work!!
             if payload.shutdown_requested:
                 break
+            # The user closed the dashboard
+            if flight_display.end_mock_interrupted.is_set():
+                break
             # Stop the replay when the data is exhausted
             if args.mode == "mock" and (not args.real_imu and not payload.imu.is_running):
                 break
@@ -179,6 +306,8 @@ def run_flight_loop(
         # Stop the display and payload
         flight_display.stop()
         payload.stop()
+        if profiler is not None:
+            profiler.stop()
 
 
 if __name__ == "__main__":
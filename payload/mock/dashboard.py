@@ -0,0 +1,306 @@
+"""File for the Textual dashboard, which is shown instead of the FlightDisplay with `--tui`."""
+
+import argparse
+import math
+import statistics
+import threading
+import time
+from collections import deque
+from typing import TYPE_CHECKING, ClassVar
+
+import msgspec
+from textual.app import App, ComposeResult
+from textual.binding import Binding
+from textual.containers import Horizontal, Vertical
+from textual.widgets import Footer, Header, Label, ProgressBar, Sparkline, Static
+
+from payload.constants import (
+    DASHBOARD_HISTORY_SIZE,
+    DASHBOARD_STOP_TIMEOUT_SECONDS,
+    DASHBOARD_SUBSCRIPTION_CAPACITY,
+    DISPLAY_FREQUENCY,
+    IMU_APPROXIMATE_FREQUENCY,
+)
+from payload.data_handling.data_bus import SNAPSHOT_TOPIC, DataBus
+from payload.data_handling.min_max_history import MinMaxHistory
+from payload.data_handling.packets.payload_snapshot import PayloadSnapshot
+from payload.utils import convert_milliseconds_to_seconds
+
+if TYPE_CHECKING:
+    from payload.payload import PayloadContext
+
+
+class SeriesSnapshot(msgspec.Struct):
+    """
+    A copy of one of the series of the FlightHistory, for drawing.
+    """
+
+    values: list[float]
+    """The downsampled values, see `MinMaxHistory.values`."""
+    minimum: float | None
+    maximum: float | None
+    samples: int
+
+
+class FlightHistory:
+    """
+    The history of the flight which the dashboard plots. It subscribes to the snapshot of every
+    loop, and the dashboard records them all at DISPLAY_FREQUENCY, so no peak is missed and the
+    flight loop doesn't do any of the work. Each series is a MinMaxHistory, so it takes the same
+    memory and time to draw however long the flight is.
+    """
+
+    __slots__ = (
+        "_last_state",
+        "_last_update_ns",
+        "_snapshots",
+        "_start_timestamp",
+        "acceleration",
+        "altitude",
+        "loop_times_ns",
+        "state_changes",
+        "velocity",
+    )
+
+    def __init__(self, data_bus: DataBus, capacity: int = DASHBOARD_HISTORY_SIZE) -> None:
+        """
+        :param data_bus: The data bus the snapshots are published on.
+        :param capacity: The number of buckets of each series.
+        """
+        self._snapshots = data_bus.subscribe(
+            SNAPSHOT_TOPIC, "dashboard", capacity=DASHBOARD_SUBSCRIPTION_CAPACITY
+        )
+        self.altitude = MinMaxHistory(capacity)
+        self.velocity = MinMaxHistory(capacity)
+        self.acceleration = MinMaxHistory(capacity)
+        """The magnitude of the compensated acceleration."""
+        self.state_changes: list[tuple[str, float]] = []
+        """The name of every state we were in, and the seconds into the data it started at."""
+        self.loop_times_ns: deque[int] = deque(maxlen=IMU_APPROXIMATE_FREQUENCY)
+        """The time between the latest loops, including waiting for the IMU."""
+        self._last_state = ""
+        self._last_update_ns: int | None = None
+        self._start_timestamp: int | None = None
+
+    @property
+    def latest(self) -> PayloadSnapshot | None:
+        """
+        Returns the snapshot of the latest loop, or None before the first loop.
+        """
+        return self._snapshots.latest
+
+    def update(self) -> None:
+        """
+        Records every loop since the last update.
+        """
+        for snapshot in self._snapshots.drain():
+            self.record(snapshot)
+
+    def record(self, snapshot: PayloadSnapshot) -> None:
+        """
+        Records one loop.
+        :param snapshot: The snapshot of the loop.
+        """
+        processed_data = snapshot.processed_data_packet
+        imu_data = snapshot.imu_data_packet
+        update_ns = snapshot.context_data_packet.update_timestamp_ns
+        if self._last_update_ns is not None:
+            self.loop_times_ns.append(update_ns - self._last_update_ns)
+        self._last_update_ns = update_ns
+        self.altitude.append(float(processed_data.current_altitude))
+        self.velocity.append(float(processed_data.vertical_velocity))
+        self.acceleration.append(
+            math.hypot(
+                imu_data.estCompensatedAccelX,
+                imu_data.estCompensatedAccelY,
+                imu_data.estCompensatedAccelZ,
+            )
+        )
+        state = snapshot.state_name
+        if state != self._last_state:
+            timestamp = imu_data.timestamp
+            if self._start_timestamp is None:
+                self._start_timestamp = timestamp
+            seconds = convert_milliseconds_to_seconds(timestamp - self._start_timestamp)
+            self.state_changes.append((state, seconds))
+            self._last_state = state
+
+    def snapshot(self) -> dict[str, SeriesSnapshot]:
+        """
+        Returns a copy of each series, for drawing.
+        """
+        return {
+            name: SeriesSnapshot(series.values(), series.minimum, series.maximum, series.samples)
+            for name, series in (
+                ("altitude", self.altitude),
+                ("velocity", self.velocity),
+                ("acceleration", self.acceleration),
+            )
+        }
+
+
+class FlightDashboardApp(App):
+    """
+    The Textual app with sparklines of the altitude, velocity and acceleration over the whole
+    flight, the timeline of the states, and gauges of how the payload is keeping up.
+    """
+
+    TITLE = "Payload"
+    CSS = """
+    Vertical.series {
+        height: 5;
+        border: round $primary;
+    }
+    Sparkline {
+        height: 2;
+    }
+    #gauges {
+        height: 5;
+        border: round $secondary;
+    }
+    #gauges Vertical {
+        width: 1fr;
+    }
+    """
+    BINDINGS: ClassVar = [Binding("q", "quit", "Stop the flight")]
+
+    def __init__(self, dashboard: "FlightDashboard") -> None:
+        """
+        :param dashboard: The dashboard which is shown.
+        """
+        super().__init__()
+        self._dashboard = dashboard
+
+    def compose(self) -> ComposeResult:
+        """Lays out the widgets of the dashboard."""
+        yield Header(show_clock=True)
+        yield Static(id="summary")
+        for name in ("altitude", "velocity", "acceleration"):
+            with Vertical(classes="series"):
+                yield Label(id=f"{name}-label")
+                yield Sparkline([], id=name)
+        yield Static(id="timeline")
+        with Horizontal(id="gauges"):
+            with Vertical():
+                yield Label("IMU queue")
+                yield ProgressBar(total=IMU_APPROXIMATE_FREQUENCY, show_eta=False, id="imu-queue")
+            yield Static(id="latencies")
+        yield Footer()
+
+    def on_mount(self) -> None:
+        """Starts refreshing the dashboard."""
+        self.sub_title = "Replay" if self._dashboard.args.mode == "mock" else "Standby"
+        self.set_interval(1 / DISPLAY_FREQUENCY, self.refresh_dashboard)
+
+    def refresh_dashboard(self) -> None:
+        """Updates every widget from the flight history, or exits if the flight has ended."""
+        if self._dashboard.stop_requested.is_set():
+            self.exit()
+            return
+        payload = self._dashboard.payload
+        history = self._dashboard.history
+        history.update()
+        snapshot = history.latest
+        if snapshot is not None:
+            processed_data = snapshot.processed_data_packet
+            self.query_one("#summary", Static).update(
+                f"Time: [b]{time.time() - self._dashboard.start_time:.1f}[/b] s   "
+                f"State: [b]{snapshot.state_name}[/b]   "
+                f"Altitude: [b]{processed_data.current_altitude:.1f}[/b] m   "
+                f"Velocity: [b]{processed_data.velocity_moving_average:.1f}[/b] m/s   "
+                f"Apogee: [b]{processed_data.maximum_altitude:.1f}[/b] m   "
+                f"Max velocity: [b]{processed_data.maximum_velocity:.1f}[/b] m/s"
+            )
+
+        units = {"altitude": "m", "velocity": "m/s", "acceleration": "m/s²"}
+        for name, series in history.snapshot().items():
+            self.query_one(f"#{name}", Sparkline).data = series.values
+            if series.samples:
+                self.query_one(f"#{name}-label", Label).update(
+                    f"{name.capitalize()} ({units[name]}): min {series.minimum:.1f}, "
+                    f"max {series.maximum:.1f}, {series.samples} samples"
+                )
+
+        self.query_one("#timeline", Static).update(
+            "States: "
+            + " → ".join(f"{state} {seconds:.1f} s" for state, seconds in history.state_changes)
+        )
+
+        self.query_one("#imu-queue", ProgressBar).update(progress=payload.imu.queue_depth)
+        latencies = []
+        loop_times_ns = history.loop_times_ns
+        if loop_times_ns:
+            latencies.append(
+                f"Loop period: {statistics.median(loop_times_ns) / 1e3:.0f} µs median, "
+                f"{max(loop_times_ns) / 1e3:.0f} µs max"
+            )
+        logger_latencies = payload.logger.statistics.recent_latencies_ns
+        if logger_latencies:
+            latencies.append(f"Log latency: {max(logger_latencies) / 1e6:.1f} ms max")
+        self.query_one("#latencies", Static).update("\n".join(latencies))
+
+
+class FlightDashboard:
+    """
+    Shows the flight in a Textual app, in place of the FlightDisplay. Textual has to run on the
+    main thread, so `run` is called there, and the flight loop runs on another thread. It has the
+    same `start`, `stop` and end events as the FlightDisplay, so the flight loop can use either.
+    """
+
+    __slots__ = (
+        "_app",
+        "_exited",
+        "args",
+        "end_mock_interrupted",
+        "end_mock_natural",
+        "history",
+        "payload",
+        "start_time",
+        "stop_requested",
+    )
+
+    def __init__(
+        self, payload: "PayloadContext", start_time: float, args: argparse.Namespace
+    ) -> None:
+        """
+        :param payload: The PayloadContext object.
+        :param start_time: The time (in seconds) the replay started.
+        :param args: The command line arguments.
+        """
+        self.payload = payload
+        self.start_time = start_time
+        self.args = args
+        self.history = FlightHistory(payload.data_bus)
+        self.stop_requested = threading.Event()
+        self.end_mock_natural = threading.Event()
+        self.end_mock_interrupted = threading.Event()
+        self._exited = threading.Event()
+        self._app = FlightDashboardApp(self)
+
+    def run(self) -> None:
+        """
+        Runs the app until the user quits or the flight loop stops the dashboard. This must be
+        called on the main thread. If the user quits, the flight loop is told to stop.
+        """
+        try:
+            self._app.run()
+        finally:
+            self._exited.set()
+        if not self.stop_requested.is_set():
+            self.end_mock_interrupted.set()
+        if self.end_mock_natural.is_set():
+            print(f"{'=' * 16} END OF REPLAY {'=' * 16}")
+        elif self.end_mock_interrupted.is_set():
+            print(f"{'=' * 14} INTERRUPTED REPLAY {'=' * 13}")
+
+    def start(self) -> None:
+        """
+        Does nothing, since the app is started by `run` on the main thread.
+        """
+
+    def stop(self) -> None:
+        """
+        Closes the app, and waits until it has given the terminal back.
+        """
+        self.stop_requested.set()
+        self._exited.wait(DASHBOARD_STOP_TIMEOUT_SECONDS)
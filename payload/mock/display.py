@@ -3,11 +3,18 @@
 import argparse
 import threading
 import time
+from collections import deque
 from typing import TYPE_CHECKING
 
 from colorama import Fore, Style, init
 
-from payload.constants import DisplayEndingType
+from payload.constants import (
+    DISPLAY_FREQUENCY,
+    DISPLAY_RENDER_COST_SAMPLE_SIZE,
+    DisplayEndingType,
+    DropPolicy,
+)
+from payload.data_handling.data_bus import SNAPSHOT_TOPIC
 from payload.utils import convert_milliseconds_to_seconds
 
 if TYPE_CHECKING:
@@ -22,26 +29,77 @@ Y = Fore.YELLOW
 C = Fore.CYAN
 RESET = Style.RESET_ALL
 
+# The templates of each section of the display, which are filled in with `str.format` every frame.
+# The colors and labels are put together once here, rather than in every frame.
+FLIGHT_DATA_TEMPLATE = "\n".join(
+    [
+        f"{Y}{'=' * 17} {{mode}} INFO {'=' * 17}{RESET}",
+        f"Replay file:                  {C}{{launch_file}}{RESET}",
+        f"Time since replay start:      {C}{{replay_time:<10.2f}}{RESET} {R}s{RESET}",
+        f"{Y}{'=' * 12} REAL TIME FLIGHT DATA {'=' * 12}{RESET}",
+        # Format time as MM:SS:
+        f"Launch time:               {G}T+{{launch_time}}{RESET}",
+        f"State:                     {G}{{state:<15}}{RESET}",
+        f"Current Altitude:          {G}{{current_altitude:<10.2f}}{RESET} {R}m{RESET}",
+        f"Maximum Altitude:          {G}{{max_altitude:<10.2f}}{RESET} {R}m{RESET}",
+        f"Current Velocity:          {G}{{current_velocity:<10.2f}}{RESET} {R}m/s{RESET}",
+        f"Maximum Velocity:          {G}{{max_velocity:<10.2f}}{RESET} {R}m/s{RESET}",
+        f"Crew survivability:        {G}{{crew_survivability:<10.2f}}{RESET} {R}%{RESET}",
+    ]
+)
+DEBUG_TEMPLATE = "\n".join(
+    [
+        f"{Y}{'=' * 18} DEBUG INFO {'=' * 17}{RESET}",
+        f"Landing velocity:          {G}{{landing_velocity:<10.2f}}{RESET} {R}m/s{RESET}",
+        f"Transmitter message:       {G}{{transmitter_message}}{RESET}",
+        f"Receiver message:          {G}{{receiver_message}}{RESET}",
+        f"Display render cost:       {G}{{render_cost:<10.2f}}{RESET} {R}ms{RESET}",
+        f"{Y}{'=' * 19} IMU INFO {'=' * 18}{RESET}",
+        f"Timestamp:                 {G}{{imu.timestamp:9.2f}}{RESET} {R}ms{RESET}",
+        f"Voltage pi:                {G}{{imu.voltage_pi:6.2f}}{RESET} {R}%{RESET}",
+        f"Voltage tx:                {G}{{imu.voltage_tx:6.2f}}{RESET} {R}%{RESET}",
+        f"Temperature:               {G}{{imu.ambientTemperature:6.2f}}{RESET} {R}°C{RESET}",
+        f"Pressure:                  {G}{{imu.ambientPressure:6.2f}}{RESET} {R}mbar{RESET}",
+        f"Pressure Altitude:         {G}{{imu.pressureAlt:6.2f}}{RESET} {R}m{RESET}",
+        f"Compensated Accel:         {G}<{{imu.estCompensatedAccelX:6.2f}}, {{imu.estCompensatedAccelY:6.2f}}, {{imu.estCompensatedAccelZ:6.2f}}>{RESET} {R}m/s²{RESET}",  # noqa: E501
+        f"Angular Rate:              {G}<{{imu.estAngularRateX:6.2f}}, {{imu.estAngularRateY:6.2f}}, {{imu.estAngularRateZ:6.2f}}>{RESET} {R}rad/s{RESET}",  # noqa: E501
+        f"Magnetic Field:            {G}<{{imu.magneticFieldX:6.2f}}, {{imu.magneticFieldY:6.2f}}, {{imu.magneticFieldZ:6.2f}}>{RESET} {R}microT{RESET}",  # noqa: E501
+        f"Orient Quaternions:        {G}<{{imu.estOrientQuaternionW:6.2f}}, {{imu.estOrientQuaternionX:6.2f}}, {{imu.estOrientQuaternionY:6.2f}}, {{imu.estOrientQuaternionZ:6.2f}}>{RESET}",  # noqa: E501
+        f"GPS Latitude:              {G}{{imu.gpsLatitude:6.2f}}{RESET} {R}°{RESET}",
+        f"GPS Longitude:             {G}{{imu.gpsLongitude:6.2f}}{RESET} {R}°{RESET}",
+        f"GPS Altitude:              {G}{{imu.gpsAltitude:6.2f}}{RESET} {R}m{RESET}",
+    ]
+)
+
 
 class FlightDisplay:
     """Class related to displaying real-time flight data in the terminal with pretty colors
-    and spacing.
+    and spacing. It is redrawn `DISPLAY_FREQUENCY` times a second, and only the lines which
+    changed are written, so it takes little time away from the main loop.
     """
 
     # Initialize Colorama
     MOVE_CURSOR_UP = "\033[F"  # Move cursor up one line
+    MOVE_CURSOR_DOWN = "\033[E"  # Move cursor down one line
+    CLEAR_LINE = "\033[K"  # Clear the rest of the line
+    CLEAR_BELOW = "\033[J"  # Clear everything below the cursor
 
     __slots__ = (
         "_args",
         "_coast_time",
         "_launch_file",
         "_launch_time",
+        "_lines",
         "_payload",
-        "_running",
+        "_snapshots",
         "_start_time",
+        "_stop_event",
         "_thread_target",
         "end_mock_interrupted",
         "end_mock_natural",
+        "lines_written",
+        "render_times_ns",
+        "skipped_frames",
     )
 
     def __init__(
@@ -53,11 +111,17 @@ class FlightDisplay:
         """
         init(autoreset=True)  # Automatically reset colors after each print
         self._payload = payload
+        # Only the latest snapshot is shown, so the older ones are replaced
+        self._snapshots = payload.data_bus.subscribe(
+            SNAPSHOT_TOPIC, "display", capacity=1, policy=DropPolicy.KEEP_LATEST
+        )
         self._start_time = start_time
-        self._running = threading.Event()
+        self._stop_event = threading.Event()
         self._args = args
         self._launch_time: int = 0  # Launch time from MotorBurnState
         self._coast_time: int = 0  # Coast time from CoastState
+        # The lines on the screen, so only the ones which changed are written
+        self._lines: list[str] = []
         # daemon threads are killed when the main thread exits.
         self._thread_target = threading.Thread(
             target=self.update_display, daemon=True, name="Real Time Display Thread"
@@ -65,6 +129,12 @@ class FlightDisplay:
         # Create events to signal the end of the replay.
         self.end_mock_natural = threading.Event()
         self.end_mock_interrupted = threading.Event()
+        self.render_times_ns: deque[int] = deque(maxlen=DISPLAY_RENDER_COST_SAMPLE_SIZE)
+        """The CPU time each of the latest frames took to render and write, which doesn't count
+        waiting for the GIL."""
+        self.lines_written = 0
+        self.skipped_frames = 0
+        """The number of frames which were skipped because the display fell behind."""
 
         try:
             # Try to get the launch file name (only available in MockIMU)
@@ -76,14 +146,14 @@ class FlightDisplay:
         """
         Starts the display.
         """
-        self._running.set()
+        self._stop_event.clear()
         self._thread_target.start()
 
     def stop(self) -> None:
         """
         Stops the display thread.
         """
-        self._running.clear()
+        self._stop_event.set()
         self._thread_target.join()
 
     def update_display(self) -> None:
@@ -95,8 +165,11 @@ class FlightDisplay:
         if self._args.debug:
             return
 
+        # The frames are due at fixed times, so the rate doesn't drift with how long they take
+        period = 1 / DISPLAY_FREQUENCY
+        deadline = time.monotonic()
         # Update the display as long as the program is running:
-        while self._running.is_set():
+        while not self._stop_event.is_set():
             self._update_display()
 
             # If we are running a real flight, we will stop the display when the rocket takes off:
@@ -104,6 +177,16 @@ class FlightDisplay:
             #     self._update_display(DisplayEndingType.TAKEOFF)
             #     break
 
+            deadline += period
+            now = time.monotonic()
+            if deadline < now:
+                # We fell behind, e.g. because the terminal was slow. The missed frames are
+                # skipped, rather than drawn back to back.
+                missed = int((now - deadline) / period) + 1
+                self.skipped_frames += missed
+                deadline += missed * period
+            self._stop_event.wait(deadline - now)
+
         # The program has ended, so we print the final display, depending on how it ended:
         if self.end_mock_natural.is_set():
             self._update_display(DisplayEndingType.NATURAL)
@@ -115,64 +198,57 @@ class FlightDisplay:
         Updates the display with real-time data.
         :param end_type: Whether the replay ended or was interrupted.
         """
-        data_processor = self._payload.data_processor
+        render_start_ns = time.thread_time_ns()
+        # Everything in a frame comes from this one snapshot, so it is all from the same loop
+        self._snapshots.drain()
+        snapshot = self._snapshots.latest
+        if snapshot is None:  # The first loop hasn't finished yet
+            return
+        processed_data = snapshot.processed_data_packet
+        imu_data = snapshot.imu_data_packet
         # Set the launch time if it hasn't been set yet:
-        if not self._launch_time and self._payload.state.name == "MotorBurnState":
-            self._launch_time = self._payload.state.start_time_ms
+        if not self._launch_time and snapshot.state_name == "MotorBurnState":
+            self._launch_time = snapshot.state_start_time_ms
 
         if self._launch_time:
             time_since_launch = convert_milliseconds_to_seconds(
-                self._payload.data_processor.current_timestamp - self._launch_time
+                imu_data.timestamp - self._launch_time
             )
         else:
             time_since_launch = 0
 
         # Prepare output
-        output = [
-            f"{Y}{'=' * 17} {'REPLAY' if self._args.mode == 'mock' else 'STANDBY'} INFO {'=' * 17}{RESET}",  # noqa: E501
-            f"Replay file:                  {C}{self._launch_file}{RESET}",
-            f"Time since replay start:      {C}{time.time() - self._start_time:<10.2f}{RESET} {R}s{RESET}",  # noqa: E501
-            f"{Y}{'=' * 12} REAL TIME FLIGHT DATA {'=' * 12}{RESET}",
-            # Format time as MM:SS:
-            f"Launch time:               {G}T+{time.strftime('%M:%S', time.gmtime(time_since_launch))}{RESET}",  # noqa: E501
-            f"State:                     {G}{self._payload.state.name:<15}{RESET}",
-            f"Current Altitude:          {G}{data_processor.current_altitude:<10.2f}{RESET} {R}m{RESET}",  # noqa: E501
-            f"Maximum Altitude:          {G}{data_processor.max_altitude:<10.2f}{RESET} {R}m{RESET}",  # noqa: E501
-            f"Current Velocity:          {G}{data_processor.velocity_moving_average:<10.2f}{RESET} {R}m/s{RESET}",  # noqa: E501
-            f"Maximum Velocity:          {G}{data_processor.max_vertical_velocity:<10.2f}{RESET} {R}m/s{RESET}",  # noqa: E501
-            f"Crew survivability:        {G}{100 * data_processor._crew_survivability:<10.2f}{RESET} {R}%{RESET}",  # noqa: E501
-        ]
-
-        imu_data = self._payload.imu_data_packet
+        output = FLIGHT_DATA_TEMPLATE.format(
+            mode="REPLAY" if self._args.mode == "mock" else "STANDBY",
+            launch_file=self._launch_file,
+            replay_time=time.time() - self._start_time,
+            launch_time=time.strftime("%M:%S", time.gmtime(time_since_launch)),
+            state=snapshot.state_name,
+            current_altitude=processed_data.current_altitude,
+            max_altitude=processed_data.maximum_altitude,
+            current_velocity=processed_data.velocity_moving_average,
+            max_velocity=processed_data.maximum_velocity,
+            crew_survivability=100 * processed_data.crew_survivability,
+        ).split("\n")
 
         # Adds additional info to the display if -v was specified
-        if self._args.verbose and imu_data:
+        if self._args.verbose:
             output.extend(
-                [
-                    f"{Y}{'=' * 18} DEBUG INFO {'=' * 17}{RESET}",
-                    f"Landing velocity:          {G}{data_processor._landing_velocity:<10.2f}{RESET} {R}m/s{RESET}",  # noqa: E501
-                    f"Transmitter message:       {G}{str(self._payload.transmission_packet)[:14]}{RESET}",  # noqa: E501
-                    f"Receiver message:          {G}{self._payload.receiver.latest_message[:14]}{RESET}",  # noqa: E501
-                    f"{Y}{'=' * 19} IMU INFO {'=' * 18}{RESET}",
-                    f"Timestamp:                 {G}{imu_data.timestamp:9.2f}{RESET} {R}ms{RESET}",
-                    f"Voltage pi:                {G}{imu_data.voltage_pi:6.2f}{RESET} {R}%{RESET}",
-                    f"Voltage tx:                {G}{imu_data.voltage_tx:6.2f}{RESET} {R}%{RESET}",
-                    f"Temperature:               {G}{imu_data.ambientTemperature:6.2f}{RESET} {R}°C{RESET}",  # noqa: E501
-                    f"Pressure:                  {G}{imu_data.ambientPressure:6.2f}{RESET} {R}mbar{RESET}",  # noqa: E501
-                    f"Pressure Altitude:         {G}{imu_data.pressureAlt:6.2f}{RESET} {R}m{RESET}",
-                    f"Compensated Accel:         {G}<{imu_data.estCompensatedAccelX:6.2f}, {imu_data.estCompensatedAccelY:6.2f}, {imu_data.estCompensatedAccelZ:6.2f}>{RESET} {R}m/s²{RESET}",  # noqa: E501
-                    f"Angular Rate:              {G}<{imu_data.estAngularRateX:6.2f}, {imu_data.estAngularRateY:6.2f}, {imu_data.estAngularRateZ:6.2f}>{RESET} {R}rad/s{RESET}",  # noqa: E501
-                    f"Magnetic Field:            {G}<{imu_data.magneticFieldX:6.2f}, {imu_data.magneticFieldY:6.2f}, {imu_data.magneticFieldZ:6.2f}>{RESET} {R}microT{RESET}",  # noqa: E501
-                    f"Orient Quaternions:        {G}<{imu_data.estOrientQuaternionW:6.2f}, {imu_data.estOrientQuaternionX:6.2f}, {imu_data.estOrientQuaternionY:6.2f}, {imu_data.estOrientQuaternionZ:6.2f}>{RESET}",  # noqa: E501
-                    f"GPS Latitude:              {G}{imu_data.gpsLatitude:6.2f}{RESET} {R}°{RESET}",
-                    f"GPS Longitude:             {G}{imu_data.gpsLongitude:6.2f}{RESET} {R}°{RESET}",  # noqa: E501
-                    f"GPS Altitude:              {G}{imu_data.gpsAltitude:6.2f}{RESET} {R}m{RESET}",
-                    # f"Status Flag:               {G}{imu_data.statusFlag:6.2f}{RESET} {R}{RESET}",  # noqa: E501
-                ]
+                DEBUG_TEMPLATE.format(
+                    landing_velocity=processed_data.landing_velocity,
+                    transmitter_message=snapshot.context_data_packet.transmitted_message[:14],
+                    receiver_message=snapshot.context_data_packet.received_message[:14],
+                    render_cost=(
+                        sum(self.render_times_ns) / len(self.render_times_ns) / 1e6
+                        if self.render_times_ns
+                        else 0.0
+                    ),
+                    imu=imu_data,
+                ).split("\n")
             )
 
         # Print the output
-        print("\n".join(output))
+        print(self._changed_lines(output), end="", flush=True)
 
         # Move the cursor up for the next update, if the replay hasn't ended:
         if not end_type:
@@ -186,3 +262,32 @@ class FlightDisplay:
                 print(f"{R}{'=' * 14} INTERRUPTED REPLAY {'=' * 13}{RESET}")
             case DisplayEndingType.TAKEOFF:
                 print(f"{R}{'=' * 13} ROCKET LAUNCHED {'=' * 14}{RESET}")
+
+        self.render_times_ns.append(time.thread_time_ns() - render_start_ns)
+
+    def _changed_lines(self, output: list[str]) -> str:
+        """
+        Returns what to print to turn the lines on the screen into the new ones, which is only the
+        lines which changed, with the cursor moved past the rest. The cursor must be at the start
+        of the first line, and is left after the last one.
+        :param output: The new lines.
+        :return: The text to print.
+        """
+        if len(output) != len(self._lines):
+            # Some lines were added or removed, so everything is drawn again
+            self._lines = []
+        text = []
+        unchanged = 0
+        for line, old_line in zip(output, self._lines or [None] * len(output), strict=True):
+            if line == old_line:
+                unchanged += 1
+                continue
+            text.append(self.MOVE_CURSOR_DOWN * unchanged)
+            text.append(f"{line}{self.CLEAR_LINE}\n")
+            unchanged = 0
+            self.lines_written += 1
+        text.append(self.MOVE_CURSOR_DOWN * unchanged)
+        if not self._lines:
+            text.append(self.CLEAR_BELOW)
+        self._lines = output
+        return "".join(text)
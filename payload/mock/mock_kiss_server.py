@@ -0,0 +1,77 @@
+"""Module for the MockKISSServer class, which stands in for the KISS TCP port of Direwolf."""
+
+import contextlib
+import socket
+import threading
+import time
+
+from payload.data_handling.kiss import KISSDecoder
+
+
+class MockKISSServer:
+    """
+    A TCP server which accepts connections like the KISS port of Direwolf, and records the frames
+    it receives instead of transmitting them. It runs on a separate thread.
+    """
+
+    __slots__ = ("_condition", "_server_socket", "_thread", "frames", "receive_times_ns")
+
+    def __init__(self, host: str = "localhost", port: int = 0) -> None:
+        """
+        :param host: The host to listen on.
+        :param port: The port to listen on. The default of 0 picks a free port, see `port`.
+        """
+        self._server_socket = socket.create_server((host, port))
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._serve, daemon=True, name="Mock KISS Server")
+        self.frames: list[bytes] = []
+        """The AX.25 frames received so far."""
+        self.receive_times_ns: list[int] = []
+        """The `time.perf_counter_ns` at which each frame was received."""
+
+    @property
+    def port(self) -> int:
+        """
+        Returns the port the server is listening on.
+        """
+        return self._server_socket.getsockname()[1]
+
+    def start(self) -> None:
+        """Starts accepting connections."""
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops accepting connections."""
+        self._server_socket.close()
+        self._thread.join(timeout=1)
+
+    def wait_for_frames(self, count: int, timeout: float) -> list[bytes]:
+        """
+        Waits until at least `count` frames were received.
+        :param count: The number of frames to wait for.
+        :param timeout: How long to wait for, in seconds.
+        :return: The frames received so far, which can be fewer than `count` after the timeout.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: len(self.frames) >= count, timeout)
+            return list(self.frames)
+
+    def _serve(self) -> None:
+        """
+        Accepts connections one after the other, and decodes the frames sent on them.
+        """
+        while True:
+            try:
+                connection, _ = self._server_socket.accept()
+            except OSError:
+                # The server socket was closed
+                return
+            decoder = KISSDecoder()
+            with connection, contextlib.suppress(ConnectionError):
+                while data := connection.recv(4096):
+                    frames = decoder.feed(data)
+                    receive_time_ns = time.perf_counter_ns()
+                    with self._condition:
+                        self.frames.extend(frames)
+                        self.receive_times_ns.extend(receive_time_ns for _ in frames)
+                        self._condition.notify_all()
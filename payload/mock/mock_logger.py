@@ -1,7 +1,9 @@
 """Mock Logger class for testing purposes. Currently only used to delete the log file."""
 
+import shutil
 from pathlib import Path
 
+from payload.data_handling.log_segments import LogFormat
 from payload.data_handling.logger import Logger
 
 
@@ -15,21 +17,24 @@ class MockLogger(Logger):
 
     __slots__ = ("_log_process", "delete_log_file")
 
-    def __init__(self, log_file_path: Path, delete_log_file: bool = True):
+    def __init__(
+        self, log_file_path: Path, delete_log_file: bool = True, log_format: LogFormat = "csv"
+    ):
         """
         Initializes the mock logger object. Behaves the same as the Logger class, but deletes the
         log file after stopping the logger.
         :param log_file_path: The path to the log file to.
         :param delete_log_file: True if the log file should be deleted after the logger stops.
+        :param log_format: The format of the log, see Logger.
         """
-        super().__init__(log_file_path)
+        super().__init__(log_file_path, log_format)
         self.delete_log_file = delete_log_file
         self._log_process.name = "Mock Logger Process"
 
     def stop(self):
         """
-        Stops the logger and deletes the log file if the delete_log_file attribute is True.
+        Stops the logger and deletes the log directory if the delete_log_file attribute is True.
         """
         super().stop()
         if self.delete_log_file:
-            self.log_path.unlink()
+            shutil.rmtree(self.log_path, ignore_errors=True)
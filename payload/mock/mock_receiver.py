@@ -4,6 +4,7 @@ import threading
 import time
 
 from payload.constants import NO_MESSAGE
+from payload.data_handling.packets.receiver_data_packet import ReceiverDataPacket
 from payload.interfaces.base_receiver import BaseReceiver
 
 
@@ -35,6 +36,10 @@ class MockReceiver(BaseReceiver):
         """Returns the predetermined message."""
         return self.message
 
+    def get_messages(self) -> list[ReceiverDataPacket]:
+        """Returns no commands, since the mock receiver doesn't receive any."""
+        return []
+
     def _listen(self) -> None:
         """Simulates listening by periodically updating the message."""
         # time.sleep(self.initial_delay)
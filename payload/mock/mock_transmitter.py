@@ -3,6 +3,7 @@
 from pathlib import Path
 from typing import TextIO
 
+from payload.data_handling.packets.status_data_packet import StatusDataPacket
 from payload.data_handling.packets.transmitter_data_packet import TransmitterDataPacket
 from payload.interfaces.base_transmitter import BaseTransmitter
 
@@ -30,11 +31,16 @@ class MockTransmitter(BaseTransmitter):
         if self.file:
             self.file.close()
 
-    def send_message(self, message: TransmitterDataPacket | str) -> None:
+    def send_message(
+        self,
+        message: TransmitterDataPacket | str,
+        requested_ns: int | None = None,  # noqa: ARG002
+    ) -> None:
         """
         Sends a message to the ground station.
         :param message: The message to send. Will be a string if it is a mock message, or a
         `TransmitterDataPacket` if it is a real message.
+        :param requested_ns: Not used, since writing to the file has no latency worth measuring.
         """
         if self.file:
             if isinstance(message, str):
@@ -44,3 +50,11 @@ class MockTransmitter(BaseTransmitter):
             # Makes sure the message is written to the file immediately rather than waiting for the
             # buffer to fill
             self.file.flush()
+
+    def send_status(self, status: StatusDataPacket) -> bool:  # noqa: ARG002
+        """
+        The message file only holds the landing messages, so the in-flight status isn't sent.
+        :param status: The in-flight status.
+        :return: False, since the status isn't sent.
+        """
+        return False
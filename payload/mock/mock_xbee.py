@@ -0,0 +1,137 @@
+"""Module for the MockXBee class, which stands in for the XBee of the payload in API mode."""
+
+import os
+import pty
+import select
+import threading
+import tty
+
+from payload.constants import XBEE_ACK_TIMEOUT_SECONDS, XBEE_COMMAND_RETRIES
+from payload.data_handling.xbee import (
+    UplinkCommand,
+    XBeeFrameParser,
+    build_receive_packet,
+    decode_ack,
+    encode_api_frame,
+    encode_command,
+    parse_transmit_request,
+)
+
+GROUND_STATION_ADDRESS = 0x0013A20041B2C3D4
+"""The address the commands of the mock come from."""
+
+
+class MockXBee:
+    """
+    A pseudo-terminal which behaves like the serial port of an XBee in API mode (AP=2), with the
+    ground station on the other end of the radio link. It sends commands the way the ground
+    station does, sending each one again until it is acknowledged, and records the
+    acknowledgments. It reads on a separate thread.
+    """
+
+    __slots__ = (
+        "_condition",
+        "_controller",
+        "_device",
+        "_parser",
+        "_sequence",
+        "_stop_event",
+        "_thread",
+        "acks",
+        "address",
+    )
+
+    def __init__(self, address: int = GROUND_STATION_ADDRESS) -> None:
+        """
+        :param address: The address of the ground station.
+        """
+        self._controller, self._device = pty.openpty()
+        # Otherwise the terminal would echo our writes, and change some of the bytes
+        tty.setraw(self._device)
+        self._parser = XBeeFrameParser()
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._read, daemon=True, name="Mock XBee")
+        self._sequence = 0
+        self.address = address
+        self.acks: list[int] = []
+        """The sequence numbers acknowledged so far, including repeats."""
+
+    @property
+    def port(self) -> str:
+        """
+        Returns the serial port to open in place of the XBee.
+        """
+        return os.ttyname(self._device)
+
+    def start(self) -> None:
+        """Starts reading what is written to the XBee."""
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops reading and closes the pseudo-terminal."""
+        self._stop_event.set()
+        self._thread.join(timeout=1)
+        os.close(self._controller)
+        os.close(self._device)
+
+    def write(self, data: bytes) -> None:
+        """
+        Writes raw bytes as if the XBee had sent them, e.g. noise.
+        :param data: The bytes.
+        """
+        os.write(self._controller, data)
+
+    def command_frame(self, command: UplinkCommand) -> bytes:
+        """
+        :param command: The command.
+        :return: The API frame in which the XBee passes on the command from the ground station.
+        """
+        return encode_api_frame(build_receive_packet(self.address, encode_command(command)))
+
+    def send_command(
+        self,
+        message: str,
+        retries: int = XBEE_COMMAND_RETRIES,
+        timeout: float = XBEE_ACK_TIMEOUT_SECONDS,
+    ) -> bool:
+        """
+        Sends a command with the next sequence number, and sends it again until it is
+        acknowledged.
+        :param message: The command, e.g. TRANSMIT_MESSAGE.
+        :param retries: How many times to send it.
+        :param timeout: How long to wait for the acknowledgment each time, in seconds.
+        :return: Whether the command was acknowledged.
+        """
+        self._sequence = (self._sequence + 1) & 0xFF
+        sequence = self._sequence
+        frame = self.command_frame(UplinkCommand(sequence, message))
+        for _ in range(retries):
+            self.write(frame)
+            with self._condition:
+                if self._condition.wait_for(lambda: sequence in self.acks, timeout):
+                    return True
+        return False
+
+    def _read(self) -> None:
+        """
+        Reads the frames written to the XBee until it is stopped, and records the
+        acknowledgments in them.
+        """
+        while not self._stop_event.is_set():
+            readable, _, _ = select.select([self._controller], [], [], 0.05)
+            if not readable:
+                continue
+            try:
+                data = os.read(self._controller, 1024)
+            except OSError:
+                return
+            for frame_data in self._parser.feed(data):
+                request = parse_transmit_request(frame_data)
+                if request is None or request.address != self.address:
+                    continue
+                sequence = decode_ack(request.data)
+                if sequence is not None:
+                    with self._condition:
+                        self.acks.append(sequence)
+                        self._condition.notify_all()
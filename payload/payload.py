@@ -1,22 +1,44 @@
 """Module which provides a high level interface to the payload system on the rocket."""
 
 import math
+import os
+import statistics
+import threading
 import time
+from collections import deque
 from typing import TYPE_CHECKING
 
-from payload.constants import STOP_MESSAGE, TRANSMIT_MESSAGE
+import numpy as np
+import psutil
+
+from payload.constants import (
+    DOWNLINK_COST_SAMPLE_SIZE,
+    DOWNLINK_LOOP_BUDGET_NS,
+    DOWNLINK_OVERRUN_BACKOFF_LOOPS,
+    LANDING_PACKET_REFRESH_SECONDS,
+    LOOP_PROCESSING_BUCKETS_SECONDS,
+    STOP_MESSAGE,
+    TRANSMIT_MESSAGE,
+)
+from payload.data_handling.data_bus import SNAPSHOT_TOPIC, DataBus
 from payload.data_handling.data_processor import DataProcessor
 from payload.data_handling.logger import Logger
 from payload.data_handling.packets.context_data_packet import ContextDataPacket
+from payload.data_handling.packets.payload_snapshot import PayloadSnapshot
+from payload.data_handling.packets.status_data_packet import StatusDataPacket
 from payload.data_handling.packets.transmitter_data_packet import TransmitterDataPacket
+from payload.data_handling.system_monitor import SystemMonitor
+from payload.data_handling.telemetry_stream import TelemetryStream
 from payload.hardware.camera import Camera
 from payload.interfaces.base_transmitter import BaseTransmitter
 from payload.interfaces.base_imu import BaseIMU
 from payload.interfaces.base_receiver import BaseReceiver
 from payload.state import StandbyState, State, LandedState
 from payload.mock.mock_imu import MockIMU
+from payload.utils import convert_milliseconds_to_seconds
 
 if TYPE_CHECKING:
+    from payload.data_handling.metrics import Histogram, MetricsRegistry
     from payload.data_handling.packets.processor_data_packet import ProcessorDataPacket
     from payload.hardware.imu import IMUDataPacket
 
@@ -32,19 +54,29 @@ class PayloadContext:
     """
 
     __slots__ = (
+        "_downlink_backoff_loops",
+        "_landing_packet_timestamp",
         "_last_transmission_time",
+        "_loop_histogram",
         "_stop_latch",
         "_transmitting_latch",
         "camera",
         "context_data_packet",
+        "data_bus",
         "data_processor",
+        "downlink_costs_ns",
+        "downlink_overruns",
         "imu",
         "imu_data_packet",
+        "landing_packet",
         "logger",
         "processed_data_packet",
         "receiver",
         "shutdown_requested",
+        "snapshot",
         "state",
+        "system_monitor",
+        "telemetry_stream",
         "transmission_packet",
         "transmitter",
     )
@@ -57,6 +89,8 @@ class PayloadContext:
         transmitter: BaseTransmitter,
         receiver: BaseReceiver,
         camera: Camera,
+        *,
+        telemetry_stream: TelemetryStream | None = None,
     ) -> None:
         """
         Initializes the payload context with the specified hardware objects, logger, and data
@@ -66,6 +100,7 @@ class PayloadContext:
         a mock IMU.
         :param logger: The logger object that logs data to a CSV file.
         :param data_processor: The data processor object that processes IMU data on a higher level.
+        :param telemetry_stream: If given, it is subscribed to the snapshot of every loop.
         """
         self.imu: BaseIMU = imu
         self.logger: Logger = logger
@@ -73,6 +108,7 @@ class PayloadContext:
         self.transmitter: BaseTransmitter = transmitter
         self.receiver: BaseReceiver = receiver
         self.camera: Camera = camera
+        self.telemetry_stream: TelemetryStream | None = telemetry_stream
 
         # The rocket starts in the StandbyState
         self.state: State = StandbyState(self)
@@ -81,10 +117,31 @@ class PayloadContext:
         self.processed_data_packet: ProcessorDataPacket | None = None
         self.context_data_packet: ContextDataPacket | None = None
         self.transmission_packet: TransmitterDataPacket | None = None
+        # Published at the end of every loop for the readers on other threads, see `update`
+        self.snapshot: PayloadSnapshot | None = None
+        # Everything which uses the data of a loop subscribes to the snapshots here, instead of
+        # `update` passing them on to each one
+        self.data_bus = DataBus()
+        self.data_bus.subscribe(SNAPSHOT_TOPIC, "logger", self._log_snapshot)
+        if telemetry_stream is not None:
+            self.data_bus.subscribe(SNAPSHOT_TOPIC, "telemetry", telemetry_stream.publish)
+        # Samples the load and temperature of the Pi into the log once a second
+        self.system_monitor = SystemMonitor(logger, lambda: self.snapshot)
+        # The landing message made ahead of time during free fall, see `stage_landing_packet`
+        self.landing_packet: TransmitterDataPacket | None = None
+        self._landing_packet_timestamp = 0
 
         self._transmitting_latch = False
         self._stop_latch = False
 
+        # How long handing the in-flight status to the transmitter took in each loop
+        self.downlink_costs_ns: deque[int] = deque(maxlen=DOWNLINK_COST_SAMPLE_SIZE)
+        self.downlink_overruns = 0
+        self._downlink_backoff_loops = 0
+
+        # Set by `register_metrics`, so the loops aren't timed unless the metrics are served
+        self._loop_histogram: Histogram | None = None
+
     def start(self) -> None:
         """
         Starts the components of our payload such as the IMU, Transmitter, Receiver, etc. Must be
@@ -93,8 +150,9 @@ class PayloadContext:
         # TODO: make threads safer by using a context manager
         self.imu.start()
         self.transmitter.start()
-        # self.receiver.start()
+        self.receiver.start()
         self.logger.start()
+        self.system_monitor.start()
         # self.camera.start()
 
     def stop(self) -> None:
@@ -107,10 +165,32 @@ class PayloadContext:
             return
         self.imu.stop()
         print("Stopped IMU")
-        # self.receiver.stop()
+        self.receiver.stop()
         print("Stopped Receiver")
         self.transmitter.stop()
         print("Stopped Transmitter")
+        if self.downlink_costs_ns:
+            print(
+                f"Downlink cost per loop: median "
+                f"{statistics.median(self.downlink_costs_ns) / 1e3:.1f} µs, max "
+                f"{max(self.downlink_costs_ns) / 1e3:.1f} µs, {self.downlink_overruns} loops over "
+                f"the {DOWNLINK_LOOP_BUDGET_NS / 1e3:.0f} µs budget"
+            )
+        for topic in self.data_bus.statistics():
+            average_ns = topic.publish_total_ns / max(topic.published, 1)
+            drops = ", ".join(
+                f"{subscriber.name} {subscriber.dropped}" for subscriber in topic.subscribers
+            )
+            errors = ", ".join(
+                f"{subscriber.name} {subscriber.errors}" for subscriber in topic.subscribers
+            )
+            print(
+                f"Data bus {topic.topic}: {topic.published} published, "
+                f"{average_ns / 1e3:.1f} µs per publish, dropped by {drops}, failed in {errors}"
+            )
+        if self.telemetry_stream is not None:
+            self.telemetry_stream.close()
+        self.system_monitor.stop()
         self.logger.stop()
         print("Stopped Logger")
         # self.camera.stop()
@@ -127,6 +207,7 @@ class PayloadContext:
 
         # We only get one data packet at a time from the IMU as it runs very slowly
         imu_data_packet = self.imu.get_data_packet()
+        loop_start_ns = time.perf_counter_ns()
         self.imu_data_packet = self.assign_previous_data(imu_data_packet)
 
         # Update the processed data with the new data packet.
@@ -135,8 +216,9 @@ class PayloadContext:
         # Get the processed data packet from the data processor
         self.processed_data_packet = self.data_processor.get_processor_data_packet()
 
-        # Check if we have a message from the ground station
-        self.remote_override(self.receiver.latest_message)
+        # Acts on every command received from the ground station since the last loop, in order
+        for received_packet in self.receiver.get_messages():
+            self.remote_override(received_packet.message)
 
         # Update the state machine
         self.state.update()
@@ -149,19 +231,147 @@ class PayloadContext:
             time.time_ns(),
         )
 
-        # Logs the current state, extension, IMU data, and processed data
+        # Readers on other threads only look at the snapshot, which is swapped in with a single
+        # assignment, so they never see half of one loop and half of the next
+        self.snapshot = PayloadSnapshot(
+            sequence=self.snapshot.sequence + 1 if self.snapshot else 1,
+            state_name=self.state.name,
+            state_start_time_ms=self.state.start_time_ms,
+            imu_data_packet=self.imu_data_packet,
+            processed_data_packet=self.processed_data_packet,
+            context_data_packet=self.context_data_packet,
+            transmission_packet=self.transmission_packet,
+        )
+        # Hands the snapshot to the logger, the display, etc.
+        self.data_bus.publish(SNAPSHOT_TOPIC, self.snapshot)
+
+        if self._loop_histogram is not None:
+            self._loop_histogram.observe((time.perf_counter_ns() - loop_start_ns) / 1e9)
+
+    def register_metrics(self, registry: "MetricsRegistry") -> None:
+        """
+        Registers the metrics of the flight loop, and of the IMU, logger and transmitter. Other
+        than the loop processing time, they are read when they are scraped.
+        :param registry: The registry to add them to.
+        """
+        self._loop_histogram = registry.histogram(
+            "payload_loop_processing_seconds",
+            "How long a loop takes after it gets its IMU packet.",
+            LOOP_PROCESSING_BUCKETS_SECONDS,
+        )
+        registry.counter(
+            "payload_loops_total",
+            "The number of loops run, one for every IMU packet.",
+            lambda: self.snapshot.sequence if self.snapshot else 0,
+        )
+        registry.gauge("payload_state", "The current state.", lambda: {self.state.name: 1}, "state")
+        registry.counter(
+            "payload_downlink_overruns_total",
+            "The number of loops where sending the status went over its budget.",
+            lambda: self.downlink_overruns,
+        )
+        registry.counter(
+            "payload_data_bus_dropped_total",
+            "The number of snapshots dropped by each subscriber of the data bus.",
+            lambda: {
+                subscriber.name: subscriber.dropped
+                for topic in self.data_bus.statistics()
+                for subscriber in topic.subscribers
+            },
+            "subscriber",
+        )
+        registry.counter(
+            "payload_data_bus_errors_total",
+            "The number of snapshots each subscriber of the data bus failed to handle.",
+            lambda: {
+                subscriber.name: subscriber.errors
+                for topic in self.data_bus.statistics()
+                for subscriber in topic.subscribers
+            },
+            "subscriber",
+        )
+        registry.gauge(
+            "payload_thread_alive",
+            "Each thread of the main process which is running.",
+            lambda: {thread.name: 1 for thread in threading.enumerate()},
+            "thread",
+        )
+        processes = {"main": psutil.Process(os.getpid())}
+
+        def read_rss() -> dict[str, int]:
+            if "logger" not in processes and self.logger.pid is not None:
+                processes["logger"] = psutil.Process(self.logger.pid)
+            rss = {}
+            for name, process in processes.items():
+                try:
+                    rss[name] = process.memory_info().rss
+                except psutil.NoSuchProcess:
+                    rss[name] = 0
+            return rss
+
+        registry.gauge(
+            "payload_process_rss_bytes", "The resident memory of each process.", read_rss, "process"
+        )
+        self.imu.register_metrics(registry)
+        self.logger.register_metrics(registry)
+        self.transmitter.register_metrics(registry)
+
+    def _log_snapshot(self, snapshot: PayloadSnapshot) -> None:
+        """
+        Logs the current state, extension, IMU data, and processed data. This is the logger's
+        subscription to the data bus.
+        :param snapshot: The snapshot of the loop.
+        """
         self.logger.log(
-            self.context_data_packet,
-            self.imu_data_packet,
-            self.processed_data_packet,
+            snapshot.context_data_packet,
+            snapshot.imu_data_packet,
+            snapshot.processed_data_packet,
         )
 
-    def transmit_data(self) -> None:
+    def stage_landing_packet(self) -> None:
         """
-        Transmits the processed data packet to the ground station using the transmitter.
+        Makes the landing message from the latest data every LANDING_PACKET_REFRESH_SECONDS. Called
+        every loop during free fall, so when we land, the orientation, which is the slow part, is
+        already calculated.
         """
-        (roll, pitch, yaw) = self.data_processor.calculate_orientation()
-        self.transmission_packet = TransmitterDataPacket(
+        timestamp = self.data_processor.current_timestamp
+        if (
+            self.landing_packet is not None
+            and convert_milliseconds_to_seconds(timestamp - self._landing_packet_timestamp)
+            < LANDING_PACKET_REFRESH_SECONDS
+        ):
+            return
+        self._landing_packet_timestamp = timestamp
+        self.landing_packet = self._create_transmission_packet(
+            self.data_processor.calculate_orientation()
+        )
+
+    def transmit_data(self, requested_ns: int | None = None) -> None:
+        """
+        Transmits the processed data packet to the ground station using the transmitter. If the
+        landing message was made during free fall, its orientation is reused and only the rest of
+        the values, which are final at landing, are swapped in.
+        :param requested_ns: The `time.perf_counter_ns` at which landing was detected, which the
+        transmitter measures its latency from.
+        """
+        orientation = (
+            self.data_processor.calculate_orientation()
+            if self.landing_packet is None
+            else self.landing_packet.orientation
+        )
+        self.transmission_packet = self._create_transmission_packet(orientation)
+        self.transmitter.send_message(self.transmission_packet, requested_ns)
+
+    def _create_transmission_packet(
+        self, orientation: tuple[np.float64, np.float64, np.float64]
+    ) -> TransmitterDataPacket:
+        """
+        Makes the message we transmit to the ground station from the latest data.
+        :param orientation: The roll, pitch and yaw, from `DataProcessor.calculate_orientation`.
+        :return: The message.
+        """
+        (roll, pitch, yaw) = orientation
+        return TransmitterDataPacket(
             temperature=self.imu_data_packet.ambientTemperature,
             apogee=self.processed_data_packet.maximum_altitude,
             battery_level_pi=self.imu_data_packet.voltage_pi,
@@ -174,7 +384,33 @@ class PayloadContext:
             landing_coords=(self.imu_data_packet.gpsLatitude, self.imu_data_packet.gpsLongitude),
         )
 
-        self.transmitter.send_message(self.transmission_packet)
+    def downlink_status(self) -> None:
+        """
+        Hands the in-flight status to the transmitter, which sends it as a status beacon when its
+        duty cycle allows. Called every loop during coast and free fall. The transmitter encodes
+        and transmits it on its own thread, so this only costs a few microseconds, which we
+        measure against the per-loop budget. If a loop goes over the budget, we stop handing over
+        the status for a while so the flight loop keeps up.
+        """
+        if self._downlink_backoff_loops > 0:
+            self._downlink_backoff_loops -= 1
+            return
+
+        start_time = time.perf_counter_ns()
+        self.transmitter.send_status(
+            StatusDataPacket(
+                state_name=self.state.name[0],
+                current_altitude=float(self.processed_data_packet.current_altitude),
+                vertical_velocity=float(self.processed_data_packet.vertical_velocity),
+                crew_survivability=float(self.processed_data_packet.crew_survivability),
+            )
+        )
+        cost_ns = time.perf_counter_ns() - start_time
+
+        self.downlink_costs_ns.append(cost_ns)
+        if cost_ns > DOWNLINK_LOOP_BUDGET_NS:
+            self.downlink_overruns += 1
+            self._downlink_backoff_loops = DOWNLINK_OVERRUN_BACKOFF_LOOPS
 
     def assign_previous_data(self, imu_data_packet: "IMUDataPacket") -> "IMUDataPacket":
         """The IMU data packet might have fields which are not updated every loop, e.g. GPS.
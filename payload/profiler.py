@@ -0,0 +1,165 @@
+"""The profilers which `--profile` runs around the flight loop, to find what the payload spends its
+time on without editing any code."""
+
+import cProfile
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from payload.constants import PROFILER_SAMPLE_INTERVAL_SECONDS, PROFILES_PATH
+
+if TYPE_CHECKING:
+    from types import CodeType
+
+
+def _profile_path(suffix: str) -> Path:
+    """
+    Returns a new path in PROFILES_PATH for a profile, named after the time it was started.
+    :param suffix: The file extension, e.g. ".prof".
+    """
+    PROFILES_PATH.mkdir(parents=True, exist_ok=True)
+    return PROFILES_PATH / f"profile_{time.strftime('%Y%m%d_%H%M%S')}{suffix}"
+
+
+class CProfileProfiler:
+    """
+    Runs cProfile on the flight loop thread, and writes the pstats file when it stops. It counts
+    every call, so it is exact, but it only sees the flight loop thread and slows it down. Read the
+    file with `python -m pstats` or snakeviz.
+    """
+
+    __slots__ = ("_profile", "path")
+
+    def __init__(self) -> None:
+        self._profile = cProfile.Profile()
+        self.path = _profile_path(".prof")
+
+    def start(self) -> None:
+        """
+        Starts profiling the calling thread, which must be the flight loop thread.
+        """
+        self._profile.enable()
+
+    def stop(self) -> None:
+        """
+        Stops profiling, and writes the profile.
+        """
+        self._profile.disable()
+        self._profile.dump_stats(self.path)
+        print(f"Wrote the cProfile profile to {self.path}")
+
+
+class SamplingProfiler:
+    """
+    Takes the stack of every thread of the payload with `sys._current_frames()` at a fixed
+    interval, on its own thread, and counts how often each stack was seen. Nothing is added to
+    the code being profiled, so it sees the flight loop, the IMU, the display and the receiver
+    threads as they really run, at a cost of about one stack walk per interval. When it stops,
+    the counts are written as collapsed stacks, which flamegraph.pl and speedscope read.
+    """
+
+    __slots__ = (
+        "_frame_names",
+        "_stacks",
+        "_stop_event",
+        "_thread",
+        "_thread_names",
+        "interval",
+        "path",
+        "samples",
+    )
+
+    def __init__(self, interval: float = PROFILER_SAMPLE_INTERVAL_SECONDS) -> None:
+        """
+        :param interval: The time between samples, in seconds.
+        """
+        self.interval = interval
+        self.path = _profile_path(".collapsed")
+        self.samples = 0
+        self._stacks: Counter[tuple[str, ...]] = Counter()
+        # The names are made once for every function and thread, rather than on every sample
+        self._frame_names: dict[CodeType, str] = {}
+        self._thread_names: dict[int, str] = {}
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="Sampling Profiler")
+
+    def start(self) -> None:
+        """
+        Starts taking samples.
+        """
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops taking samples, and writes the collapsed stacks.
+        """
+        self._stop_event.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        with self.path.open("w") as file:
+            for stack, count in self._stacks.most_common():
+                file.write(f"{';'.join(stack)} {count}\n")
+        print(
+            f"Wrote {self.samples} samples of the stacks of every thread to {self.path}, "
+            f"{len(self._stacks)} different stacks"
+        )
+
+    def sample(self) -> None:
+        """
+        Takes one sample of the stack of every thread, other than the profiler's.
+        """
+        own_id = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            names = []
+            current = frame
+            while current is not None:
+                code = current.f_code
+                name = self._frame_names.get(code)
+                if name is None:
+                    name = f"{code.co_qualname} ({Path(code.co_filename).name})"
+                    self._frame_names[code] = name
+                names.append(name)
+                current = current.f_back
+            names.append(self._thread_name(thread_id))
+            # Collapsed stacks go from the root to the leaf
+            names.reverse()
+            self._stacks[tuple(names)] += 1
+        self.samples += 1
+
+    def _thread_name(self, thread_id: int) -> str:
+        """
+        Returns the name of a thread, which the stacks of that thread start with.
+        :param thread_id: The `threading.get_ident()` of the thread.
+        """
+        name = self._thread_names.get(thread_id)
+        if name is None:
+            self._thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            name = self._thread_names.get(thread_id, f"Thread {thread_id}")
+        return name
+
+    def _run(self) -> None:
+        """
+        Takes a sample every interval until stopped.
+        """
+        while not self._stop_event.wait(self.interval):
+            self.sample()
+
+
+def create_profiler(
+    mode: str | None, interval: float = PROFILER_SAMPLE_INTERVAL_SECONDS
+) -> CProfileProfiler | SamplingProfiler | None:
+    """
+    Creates the profiler chosen with `--profile`.
+    :param mode: "cprofile", "sampling", or None to not profile.
+    :param interval: The time between the samples of the sampling profiler, in seconds.
+    """
+    if mode == "cprofile":
+        return CProfileProfiler()
+    if mode == "sampling":
+        return SamplingProfiler(interval)
+    return None
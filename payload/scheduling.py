@@ -0,0 +1,198 @@
+"""The scheduling profiles, which pin the threads and processes of the payload to CPUs and set
+their priorities, so the work which has to keep up with the IMU isn't moved around or held up by
+the rest. See SCHEDULING_PROFILES."""
+
+import os
+import threading
+
+import msgspec
+import psutil
+
+from payload.constants import SCHEDULING_PROFILES
+from payload.data_handling.packets.schedule_report_packet import ScheduleReportPacket
+
+COMPONENT_THREAD_NAMES = {
+    "imu": ("IMU Thread", "IO Reactor"),
+    "camera": ("Camera thread", "Mock Camera Thread"),
+    "transmitter": ("Transmission Scheduler",),
+}
+"""The names of the threads of each component. The IO Reactor reads the serial port of the IMU
+when there is one."""
+COMPONENT_PROCESS_NAMES = {
+    "transmitter": ("direwolf",),
+}
+"""The names of the other programs each component runs."""
+
+
+class ComponentSchedule(msgspec.Struct, frozen=True):
+    """
+    How one component of the payload is scheduled. Anything which is None is left as it is.
+    """
+
+    cpus: tuple[int, ...] | None = None
+    """The CPUs the component may run on."""
+    nice: int | None = None
+    """The niceness of the component, from -20 (highest priority) to 19."""
+    realtime_priority: int | None = None
+    """If set, the component is scheduled with SCHED_FIFO at this priority, from 1 to 99."""
+
+
+def load_scheduling_profile(name: str) -> dict[str, ComponentSchedule]:
+    """
+    Returns the schedule of each component in a profile of SCHEDULING_PROFILES.
+    :param name: The name of the profile, e.g. "pi4".
+    """
+    return msgspec.convert(SCHEDULING_PROFILES[name], dict[str, ComponentSchedule])
+
+
+def _describe_error(error: Exception) -> str:
+    """
+    Returns why a setting couldn't be applied.
+    :param error: The error applying it raised.
+    """
+    if isinstance(error, PermissionError):
+        return "not permitted"
+    if isinstance(error, AttributeError):
+        return "not supported here"
+    if isinstance(error, OSError) and error.strerror:
+        return error.strerror.lower()
+    return str(error)
+
+
+def apply_schedule(
+    component: str,
+    schedule: ComponentSchedule,
+    target: str,
+    thread_ids: list[int],
+    main_thread_id: int,
+) -> ScheduleReportPacket:
+    """
+    Applies a schedule to a thread, or to the threads of a process. The CPUs are set for every
+    thread, but the priority only for the main thread, so threads which set their own priority
+    (like the log compression thread of the logger) keep it. Each setting which fails is reported
+    and skipped, so the payload runs with whatever could be applied.
+    :param component: The component the schedule is for.
+    :param schedule: The schedule.
+    :param target: What the threads are, for the report.
+    :param thread_ids: The native IDs of the threads.
+    :param main_thread_id: The native ID of the thread the priority is set for.
+    """
+    report = ScheduleReportPacket(component, target)
+
+    def attempt(setting: str, apply) -> None:
+        try:
+            apply()
+        except (OSError, AttributeError) as e:
+            report.failed.append(f"{setting} ({_describe_error(e)})")
+        else:
+            report.applied.append(setting)
+
+    if schedule.cpus is not None:
+
+        def set_cpus() -> None:
+            for thread_id in thread_ids:
+                os.sched_setaffinity(thread_id, schedule.cpus)
+
+        attempt(f"CPUs {','.join(map(str, schedule.cpus))}", set_cpus)
+    if schedule.nice is not None:
+        # On Linux, the niceness is per thread
+        attempt(
+            f"nice {schedule.nice}",
+            lambda: os.setpriority(os.PRIO_PROCESS, main_thread_id, schedule.nice),
+        )
+    if schedule.realtime_priority is not None:
+        attempt(
+            f"SCHED_FIFO {schedule.realtime_priority}",
+            lambda: os.sched_setscheduler(
+                main_thread_id, os.SCHED_FIFO, os.sched_param(schedule.realtime_priority)
+            ),
+        )
+    return report
+
+
+def _print_report(report: ScheduleReportPacket) -> None:
+    """
+    Prints what was applied to a thread or process, and what failed.
+    :param report: The report of `apply_schedule`.
+    """
+    failed = f", failed {', '.join(report.failed)}" if report.failed else ""
+    print(
+        f"Scheduling {report.component} {report.target}: applied "
+        f"{', '.join(report.applied) or 'nothing'}{failed}"
+    )
+
+
+def apply_process_schedule(
+    component: str, schedule: ComponentSchedule, name: str, pid: int
+) -> ScheduleReportPacket:
+    """
+    Applies a schedule to a process which was started after the scheduling profile was applied,
+    like the Direwolf the Transmitter starts for every transmission, and prints what was applied.
+    It is applied to the main thread of the process, so it should be called right after starting
+    it. The threads the process starts afterwards inherit the CPUs and the priority.
+    :param component: The component the process belongs to.
+    :param schedule: The schedule of the component.
+    :param name: The name of the program, for the report.
+    :param pid: The process ID.
+    """
+    report = apply_schedule(component, schedule, f"{name} (process {pid})", [pid], pid)
+    _print_report(report)
+    return report
+
+
+def _find_targets(component: str, logger_pid: int | None) -> list[tuple[str, list[int], int]]:
+    """
+    Returns the threads and processes of a component which are running, as the description of
+    each one, the native IDs of its threads, and the native ID of its main thread.
+    :param component: The component, e.g. "imu".
+    :param logger_pid: The process ID of the logger process.
+    """
+    targets = []
+    if component == "main_loop":
+        thread = threading.current_thread()
+        targets.append(
+            (f"{thread.name} (thread {thread.native_id})", [thread.native_id], thread.native_id)
+        )
+    names = COMPONENT_THREAD_NAMES.get(component, ())
+    targets.extend(
+        (f"{thread.name} (thread {thread.native_id})", [thread.native_id], thread.native_id)
+        for thread in threading.enumerate()
+        if thread.name in names and thread.native_id is not None
+    )
+    processes = []
+    if component == "logger" and logger_pid is not None:
+        processes.append(psutil.Process(logger_pid))
+    process_names = COMPONENT_PROCESS_NAMES.get(component, ())
+    if process_names:
+        processes.extend(
+            process
+            for process in psutil.process_iter(["name"])
+            if process.info["name"] in process_names
+        )
+    for process in processes:
+        try:
+            thread_ids = [thread.id for thread in process.threads()]
+        except psutil.Error:
+            continue
+        targets.append((f"{process.name()} (process {process.pid})", thread_ids, process.pid))
+    return targets
+
+
+def apply_scheduling_profile(name: str, logger_pid: int | None) -> list[ScheduleReportPacket]:
+    """
+    Applies a scheduling profile to the threads and processes of the payload which are running,
+    and prints what was applied. It has to be called from the flight loop thread, after the
+    payload was started.
+    :param name: The name of the profile, e.g. "pi4".
+    :param logger_pid: The process ID of the logger process.
+    """
+    reports = []
+    for component, schedule in load_scheduling_profile(name).items():
+        targets = _find_targets(component, logger_pid)
+        if not targets:
+            print(f"Scheduling {component}: not running")
+        for target, thread_ids, main_thread_id in targets:
+            report = apply_schedule(component, schedule, target, thread_ids, main_thread_id)
+            _print_report(report)
+            reports.append(report)
+    return reports
@@ -1,6 +1,7 @@
 """Module for the finite state machine that represents which state of flight we are in."""
 
 import threading
+import time
 from abc import ABC, abstractmethod
 from typing import TYPE_CHECKING
 
@@ -138,6 +139,7 @@ class CoastState(State):
 
     def update(self):
         """Checks to see if the rocket has reached apogee, indicating the start of free fall."""
+        self.context.downlink_status()
         data = self.context.data_processor
 
         # If our current altitude is less than 90% of max altitude, we are in free fall.
@@ -165,6 +167,8 @@ class FreeFallState(State):
 
     def update(self):
         """Check if the rocket has landed, based on our altitude."""
+        self.context.downlink_status()
+        self.context.stage_landing_packet()
         data = self.context.data_processor
 
         # If our altitude is around 0, we start a timer and then switch states, to make sure
@@ -194,12 +198,14 @@ class LandedState(State):
     __slots__ = ()
 
     def __init__(self, context: "PayloadContext"):
+        # The transmitter measures how long it takes from here to keying up
+        landing_detected_ns = time.perf_counter_ns()
         super().__init__(context)
 
         # Starts the transmission at the beginning of landed state
         self.context.stop_survivability_calculation()
         self.context.data_processor.calculate_landing_velocity()
-        self.context.transmit_data()
+        self.context.transmit_data(landing_detected_ns)
 
         # Once we land we stop the camera recording
         self.context.end_video_recording()
@@ -3,6 +3,13 @@
 import argparse
 from pathlib import Path
 
+from payload.constants import (
+    DEFAULT_SCHEDULING_PROFILE,
+    PROFILER_SAMPLE_INTERVAL_SECONDS,
+    SCHEDULING_PROFILES,
+    TELEMETRY_STREAM_DECIMATION,
+)
+
 
 def convert_milliseconds_to_seconds(timestamp: float) -> float | None:
     """Converts milliseconds to seconds"""
@@ -53,6 +60,120 @@ def arg_parser() -> argparse.Namespace:
         default=False,
     )
 
+    global_group.add_argument(
+        "--tui",
+        help="Shows a dashboard with graphs of the altitude, velocity and acceleration over the "
+        "whole flight, instead of the display.",
+        action="store_true",
+        default=False,
+    )
+
+    global_parser.add_argument(
+        "-w",
+        "--write-ahead-log",
+        help="Log every line as a checksummed write-ahead log record, which can be recovered "
+        "after a crash with `uv run recover`.",
+        action="store_true",
+        default=False,
+    )
+
+    # The transmitter backends are mutually exclusive. By default Direwolf is restarted for every
+    # transmission.
+    transmitter_group = global_parser.add_mutually_exclusive_group()
+
+    transmitter_group.add_argument(
+        "--kiss",
+        help="Keep Direwolf running and send it the transmissions over its KISS TCP port, instead "
+        "of restarting it for every transmission.",
+        action="store_true",
+        default=False,
+    )
+
+    transmitter_group.add_argument(
+        "--afsk",
+        help="Modulate the transmissions in Python and play them on the sound card, without "
+        "Direwolf.",
+        action="store_true",
+        default=False,
+    )
+
+    global_parser.add_argument(
+        "--compact-telemetry",
+        help="Send the position compressed and the data as compact telemetry, which takes less "
+        "than half the air time. Only used with --kiss and --afsk.",
+        action="store_true",
+        default=False,
+    )
+
+    global_parser.add_argument(
+        "--downlink-duty-cycle",
+        help="Send status beacons with the altitude, velocity and survivability during coast and "
+        "free fall, with the PTT held on for at most this fraction of the time, e.g. 0.1. Only "
+        "used with --kiss and --afsk.",
+        type=float,
+        default=0.0,
+    )
+
+    global_parser.add_argument(
+        "--xbee-api",
+        help="Read the commands from the XBee in API mode (AP=2), as framed commands with sequence "
+        "numbers which are acknowledged, instead of as lines of text.",
+        action="store_true",
+        default=False,
+    )
+
+    global_parser.add_argument(
+        "--telemetry-stream",
+        help="Send the data of every loop as msgpack to this local UDP port (HOST:PORT) or Unix "
+        "socket (a path), e.g. for plotting. Nothing waits if nobody is listening.",
+        type=str,
+        default=None,
+        metavar="ADDRESS",
+    )
+
+    global_parser.add_argument(
+        "--telemetry-decimation",
+        help="Only send every Nth loop on the telemetry stream.",
+        type=int,
+        default=TELEMETRY_STREAM_DECIMATION,
+        metavar="N",
+    )
+
+    global_parser.add_argument(
+        "--metrics-port",
+        help="Serve the metrics of the loop rate, queue depths, drops, fsync latency, threads and "
+        "memory at http://127.0.0.1:PORT/metrics for Prometheus. Off unless given.",
+        type=int,
+        default=None,
+        metavar="PORT",
+    )
+
+    global_parser.add_argument(
+        "--profile",
+        help="Profile the flight and write the profile to logs/profiles when it stops. cprofile "
+        "counts every call of the flight loop thread. sampling takes the stacks of every thread "
+        "at an interval, which costs much less.",
+        choices=("cprofile", "sampling"),
+        default=None,
+    )
+
+    global_parser.add_argument(
+        "--profile-interval",
+        help="The time between the samples of --profile sampling, in seconds.",
+        type=float,
+        default=PROFILER_SAMPLE_INTERVAL_SECONDS,
+        metavar="SECONDS",
+    )
+
+    global_parser.add_argument(
+        "--scheduling-profile",
+        help="Pin the threads and processes of the payload to CPUs and set their priorities, as "
+        f"listed in SCHEDULING_PROFILES. Real flights use {DEFAULT_SCHEDULING_PROFILE} unless this "
+        "is none, and mock flights use none unless this is given.",
+        choices=(*SCHEDULING_PROFILES, "none"),
+        default=None,
+    )
+
     global_parser.add_argument(
         "-k",
         "--callsign",
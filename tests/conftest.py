@@ -0,0 +1,50 @@
+"""The fixtures and helpers which are shared by the tests."""
+
+import time
+
+import numpy as np
+import pytest
+
+from payload.data_handling.packets.transmitter_data_packet import TransmitterDataPacket
+from payload.hardware.receiver import Receiver
+from payload.mock.mock_kiss_server import MockKISSServer
+
+
+def wait_until(condition, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Timed out"
+        time.sleep(0.001)
+
+
+def wait_for_messages(receiver: Receiver, count: int, timeout: float = 2.0) -> list:
+    messages = []
+    deadline = time.monotonic() + timeout
+    while len(messages) < count and time.monotonic() < deadline:
+        messages += receiver.get_messages()
+        time.sleep(0.001)
+    return messages
+
+
+@pytest.fixture
+def transmitter_data_packet():
+    return TransmitterDataPacket(
+        temperature=np.float64(20.0),
+        apogee=np.float64(250.0),
+        battery_level_pi=98.5,
+        battery_level_tx=87.25,
+        orientation=(np.float64(1.0), np.float64(-2.0), np.float64(3.5)),
+        time_of_landing="12:34:56",
+        max_velocity=np.float64(150.0),
+        landing_velocity=np.float64(4.5),
+        crew_survivability=np.float64(0.9),
+        landing_coords=(34.7289, -86.5861),
+    )
+
+
+@pytest.fixture
+def kiss_server():
+    server = MockKISSServer()
+    server.start()
+    yield server
+    server.stop()
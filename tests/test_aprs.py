@@ -0,0 +1,329 @@
+"""Tests the AX.25, KISS and APRS modules, and sending frames to a KISS server."""
+
+import time
+
+import numpy as np
+import pytest
+import soundfile
+
+from payload.constants import AFSK_SAMPLE_RATE
+from payload.data_handling.afsk import (
+    modulate_frame,
+    nrzi_encode,
+    stuff_bits,
+    synthesize_tones,
+    write_wav,
+)
+from payload.data_handling.afsk_demodulator import AFSKDemodulator, demodulate_wav
+from payload.data_handling.aprs import (
+    create_position_report,
+    create_status_report,
+    decode_transmission,
+    format_compressed_position,
+    format_latitude,
+    format_longitude,
+    parse_position_report,
+)
+from payload.data_handling.ax25 import (
+    build_ui_frame,
+    compute_fcs,
+    encode_address,
+    estimate_air_time,
+    parse_ui_frame,
+)
+from payload.data_handling.compact_telemetry import (
+    TELEMETRY_FIELDS,
+    decode_base91,
+    decode_compact_telemetry,
+    encode_base91,
+    encode_compact_telemetry,
+)
+from payload.data_handling.kiss import KISSClient, KISSDecoder, encode_kiss_frame
+from payload.data_handling.packets.status_data_packet import StatusDataPacket
+
+
+class TestAX25:
+    """Tests building and parsing AX.25 UI frames."""
+
+    def test_encode_address(self):
+        assert encode_address("KQ4VOH", last=False) == bytes(
+            [0x96, 0xA2, 0x68, 0xAC, 0x9E, 0x90, 0x60]
+        )
+        # The SSID is in bits 1 to 4, and the last address has bit 0 set
+        assert encode_address("N0CALL-11", last=True)[-1] == 0x60 | 11 << 1 | 1
+        assert encode_address("AB1", last=False)[3:6] == b"\x40\x40\x40"
+
+    @pytest.mark.parametrize("address", ["", "TOOLONGCALL", "KQ4VOH-16", "KQ4_OH"])
+    def test_encode_invalid_address(self, address):
+        with pytest.raises(ValueError, match="Invalid"):
+            encode_address(address, last=True)
+
+    def test_round_trip(self):
+        frame = build_ui_frame("KQ4VOH-11", "APZPAY", b"!hello", path=("WIDE2-1",))
+        parsed = parse_ui_frame(frame)
+        assert parsed.source == "KQ4VOH-11"
+        assert parsed.destination == "APZPAY"
+        assert parsed.path == ("WIDE2-1",)
+        assert parsed.info == b"!hello"
+
+    def test_parse_invalid_frame(self):
+        assert parse_ui_frame(b"") is None
+        # No address is marked as the last one
+        assert parse_ui_frame(encode_address("APZPAY", last=False) * 3) is None
+
+    def test_fcs(self):
+        # The check value of the CRC-16/X.25, sent low byte first
+        assert compute_fcs(b"123456789") == bytes([0x6E, 0x90])
+
+
+class TestKISS:
+    """Tests the KISS framing."""
+
+    def test_escaping(self):
+        frame = bytes([0x01, 0xC0, 0x02, 0xDB, 0x03])
+        encoded = encode_kiss_frame(frame)
+        assert encoded == bytes([0xC0, 0x00, 0x01, 0xDB, 0xDC, 0x02, 0xDB, 0xDD, 0x03, 0xC0])
+        assert KISSDecoder().feed(encoded) == [frame]
+
+    def test_decoder_handles_split_stream(self):
+        frames = [b"first", bytes([0xC0, 0xDB]), b"third"]
+        stream = b"".join(encode_kiss_frame(frame) for frame in frames)
+        decoder = KISSDecoder()
+        decoded = []
+        for i in range(len(stream)):
+            decoded.extend(decoder.feed(stream[i : i + 1]))
+        assert decoded == frames
+
+    def test_decoder_ignores_commands(self):
+        # A TX delay command, followed by a data frame
+        stream = bytes([0xC0, 0x01, 0x1E, 0xC0]) + encode_kiss_frame(b"data")
+        assert KISSDecoder().feed(stream) == [b"data"]
+
+
+class TestAPRS:
+    """Tests creating the APRS position reports."""
+
+    @pytest.mark.parametrize(
+        ("latitude", "longitude", "expected"),
+        [
+            (34.7289, -86.5861, ("3443.73N", "08635.17W")),
+            (-33.8688, 151.2093, ("3352.13S", "15112.56E")),
+            # 59.9999 minutes rounds up to the next degree, rather than to 60.00 minutes
+            (12.999999, 0.0, ("1300.00N", "00000.00E")),
+        ],
+    )
+    def test_format_coordinates(self, latitude, longitude, expected):
+        assert (format_latitude(latitude), format_longitude(longitude)) == expected
+
+    def test_position_report(self, transmitter_data_packet):
+        report = create_position_report(transmitter_data_packet)
+        assert report.startswith(b"!3443.73NS08635.17WO")
+        assert report.endswith(b"crew_survival=90.0%")
+        # The degree sign is sent as UTF-8
+        assert "°F".encode() in report
+
+    def test_decode_transmission(self, transmitter_data_packet):
+        frame = build_ui_frame("KQ4VOH", "APZPAY", create_position_report(transmitter_data_packet))
+        source, packet = decode_transmission(frame)
+        assert source == "KQ4VOH"
+        # The values are rounded in the comment, and converted back from imperial units
+        assert packet.time_of_landing == transmitter_data_packet.time_of_landing
+        for field in ("temperature", "apogee", "max_velocity", "landing_velocity"):
+            assert getattr(packet, field) == pytest.approx(
+                getattr(transmitter_data_packet, field), abs=0.01
+            )
+        assert packet.crew_survivability == pytest.approx(0.9)
+        assert packet.orientation == pytest.approx(transmitter_data_packet.orientation)
+        # A hundredth of a minute is about 18 m
+        assert packet.landing_coords == pytest.approx(
+            transmitter_data_packet.landing_coords, abs=1 / 6000
+        )
+
+    def test_decode_other_transmissions(self):
+        assert decode_transmission(build_ui_frame("N0CALL", "APRS", b">status")) is None
+        assert (
+            decode_transmission(build_ui_frame("N0CALL", "APRS", b"!3443.73NS08635.17WO")) is None
+        )
+
+
+class TestCompactTelemetry:
+    """Tests the compressed position and the compact telemetry."""
+
+    def test_base91(self):
+        assert encode_base91(0, 2) == "!!"
+        assert encode_base91(91**3 - 1, 3) == "{{{"
+        assert decode_base91(encode_base91(123456, 4)) == 123456
+        assert decode_base91("a|b") is None
+
+    def test_compressed_position(self):
+        # The example of the APRS specification
+        assert format_compressed_position(49.5, -72.75) == "5L!!<*e7"
+        report = parse_position_report(b"!/5L!!<*e7>   comment")
+        assert report.latitude == pytest.approx(49.5)
+        assert report.longitude == pytest.approx(-72.75)
+        assert (report.symbol_table, report.symbol, report.comment) == ("/", ">", "comment")
+
+    def test_round_trip_is_lossless(self, transmitter_data_packet):
+        comment = encode_compact_telemetry(transmitter_data_packet)
+        packet = decode_compact_telemetry(comment, transmitter_data_packet.landing_coords)
+        # The values are exactly the original ones rounded to the resolution of their fields
+        assert packet == transmitter_data_packet
+        assert encode_compact_telemetry(packet) == comment
+
+    def test_missing_and_out_of_range_values(self, transmitter_data_packet):
+        transmitter_data_packet.temperature = np.float64("nan")
+        transmitter_data_packet.apogee = np.float64(1e9)
+        transmitter_data_packet.time_of_landing = "unknown"
+        comment = encode_compact_telemetry(transmitter_data_packet)
+        packet = decode_compact_telemetry(comment, (0.0, 0.0))
+        assert np.isnan(packet.temperature)
+        assert packet.apogee == pytest.approx(TELEMETRY_FIELDS[1].maximum)
+        assert packet.time_of_landing == ""
+
+    def test_unknown_version(self, transmitter_data_packet):
+        comment = encode_compact_telemetry(transmitter_data_packet)
+        assert decode_compact_telemetry("~2" + comment[2:], (0.0, 0.0)) is None
+        assert decode_compact_telemetry(comment[:-1], (0.0, 0.0)) is None
+
+    def test_halves_air_time(self, transmitter_data_packet):
+        frames = [
+            build_ui_frame("KQ4VOH", "APZPAY", create_position_report(transmitter_data_packet, c))
+            for c in (False, True)
+        ]
+        text_air_time, compact_air_time = (estimate_air_time(frame, 1200) for frame in frames)
+        assert compact_air_time < text_air_time / 2
+
+        source, packet = decode_transmission(frames[1])
+        assert source == "KQ4VOH"
+        assert packet.time_of_landing == transmitter_data_packet.time_of_landing
+        # The compressed position is precise to about 30 cm
+        assert packet.landing_coords == pytest.approx(
+            transmitter_data_packet.landing_coords, abs=1e-5
+        )
+
+    def test_status_report(self):
+        status = StatusDataPacket("F", 812.34, -25.67, float("nan"))
+        frame = build_ui_frame("KQ4VOH", "APZPAY", create_status_report(status))
+        assert estimate_air_time(frame, 1200) < 0.3
+
+        source, decoded = decode_transmission(frame)
+        assert source == "KQ4VOH"
+        assert (decoded.state_name, decoded.current_altitude, decoded.vertical_velocity) == (
+            "F",
+            812.3,
+            -25.7,
+        )
+        assert np.isnan(decoded.crew_survivability)
+
+
+class TestKISSClient:
+    """Tests sending frames to the mock KISS server."""
+
+    def test_send_frames(self, kiss_server, transmitter_data_packet):
+        client = KISSClient("localhost", kiss_server.port)
+        assert client.connect(timeout=1)
+
+        frame = build_ui_frame("KQ4VOH", "APZPAY", create_position_report(transmitter_data_packet))
+        send_times_ns = []
+        for _ in range(3):
+            send_times_ns.append(time.perf_counter_ns())
+            assert client.send_frame(frame)
+
+        assert kiss_server.wait_for_frames(3, timeout=1) == [frame] * 3
+        # The frames reach the TNC within milliseconds, rather than after Direwolf restarts
+        latencies = np.subtract(kiss_server.receive_times_ns, send_times_ns)
+        assert max(latencies) < 0.5e9
+        client.close()
+        assert not client.is_connected
+
+    def test_connect_fails_without_server(self, kiss_server):
+        port = kiss_server.port
+        kiss_server.stop()
+        client = KISSClient("localhost", port)
+        assert not client.connect(timeout=0.2)
+        assert not client.send_frame(b"frame")
+
+
+class TestAFSK:
+    """Tests the AFSK1200 modulator."""
+
+    def test_stuff_bits(self):
+        bits = np.array([1] * 11 + [0] + [1] * 5, dtype=np.uint8)
+        expected = [1] * 5 + [0] + [1] * 5 + [0] + [1, 0] + [1] * 5 + [0]
+        assert stuff_bits(bits).tolist() == expected
+        # Nothing is inserted when there are never five 1s in a row
+        bits = np.array([1, 1, 1, 1, 0] * 4, dtype=np.uint8)
+        assert stuff_bits(bits).tolist() == bits.tolist()
+
+    def test_nrzi_encode(self):
+        # A 0 changes the tone, and a 1 keeps it
+        bits = np.array([1, 0, 0, 1, 1, 0], dtype=np.uint8)
+        assert nrzi_encode(bits).tolist() == [1, 0, 1, 1, 1, 0]
+
+    @pytest.mark.parametrize(("tone", "frequency"), [(1, 1200), (0, 2200)])
+    def test_tone_frequencies(self, tone, frequency):
+        audio = synthesize_tones(np.full(1200, tone, dtype=np.uint8), AFSK_SAMPLE_RATE)
+        spectrum = np.abs(np.fft.rfft(audio))
+        frequencies = np.fft.rfftfreq(len(audio), 1 / AFSK_SAMPLE_RATE)
+        assert frequencies[np.argmax(spectrum)] == pytest.approx(frequency, abs=2)
+
+    def test_phase_is_continuous(self):
+        tones = np.array([1, 0] * 50, dtype=np.uint8)
+        audio = synthesize_tones(tones, AFSK_SAMPLE_RATE)
+        # The largest step of a 2200 Hz sine at this sample rate, with some margin
+        max_step = 2 * np.pi * 2200 / AFSK_SAMPLE_RATE * np.max(np.abs(audio)) * 1.01
+        assert np.max(np.abs(np.diff(audio))) <= max_step
+
+    def test_audio_is_cached(self, tmp_path):
+        frame = build_ui_frame("KQ4VOH", "APZPAY", b"!cached")
+        audio = modulate_frame(frame, AFSK_SAMPLE_RATE)
+        assert modulate_frame(frame, AFSK_SAMPLE_RATE) is audio
+        assert not audio.flags.writeable
+
+        wav_path = tmp_path / "frame.wav"
+        write_wav(wav_path, audio, AFSK_SAMPLE_RATE)
+        samples, sample_rate = soundfile.read(wav_path, dtype="float32")
+        assert sample_rate == AFSK_SAMPLE_RATE
+        np.testing.assert_allclose(samples, audio, atol=1e-4)
+
+
+class TestAFSKDemodulator:
+    """Tests demodulating the audio made by the modulator."""
+
+    @pytest.fixture
+    def frames(self, transmitter_data_packet):
+        report = create_position_report(transmitter_data_packet)
+        return [build_ui_frame(f"KQ4VOH-{ssid}", "APZPAY", report) for ssid in range(5)]
+
+    @pytest.mark.parametrize("sample_rate", [22050, 44100, 48000])
+    @pytest.mark.parametrize("block_size", [256, 4096, 1 << 16])
+    def test_loopback(self, frames, sample_rate, block_size):
+        rng = np.random.default_rng(0)
+        audio = np.concatenate(
+            [
+                np.concatenate(
+                    [modulate_frame(frame, sample_rate), np.zeros(rng.integers(1, 5000))]
+                )
+                for frame in frames
+            ]
+        )
+        audio = audio + rng.normal(0, 0.1, len(audio))
+
+        demodulator = AFSKDemodulator(sample_rate)
+        decoded = []
+        for start in range(0, len(audio), block_size):
+            decoded.extend(demodulator.feed(audio[start : start + block_size]))
+        assert decoded == frames
+
+    def test_corrupted_frame_is_dropped(self, frames):
+        audio = modulate_frame(frames[0], AFSK_SAMPLE_RATE).copy()
+        # Flips the tone of a few bits in the middle of the frame
+        middle = len(audio) * 3 // 4
+        audio[middle : middle + 200] = -audio[middle : middle + 200]
+        assert AFSKDemodulator(AFSK_SAMPLE_RATE).feed(audio) == []
+
+    def test_demodulate_wav(self, frames, tmp_path):
+        wav_path = tmp_path / "recording.wav"
+        audio = np.concatenate([modulate_frame(frame, AFSK_SAMPLE_RATE) for frame in frames])
+        write_wav(wav_path, audio, AFSK_SAMPLE_RATE)
+        assert list(demodulate_wav(wav_path)) == frames
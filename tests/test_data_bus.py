@@ -0,0 +1,118 @@
+"""Tests publishing packets on the DataBus to subscribers with different policies."""
+
+import pytest
+
+from payload.constants import DATA_BUS_ERROR_REPORT_INTERVAL, DropPolicy
+from payload.data_handling.data_bus import DataBus, Topic
+
+NUMBERS: Topic[int] = Topic("numbers", int)
+
+
+class TestDataBus:
+    """Tests the DataBus and its subscriptions."""
+
+    def test_handler_gets_every_packet(self):
+        data_bus = DataBus()
+        received = []
+        data_bus.subscribe(NUMBERS, "handler", received.append)
+        for number in range(5):
+            data_bus.publish(NUMBERS, number)
+        assert received == [0, 1, 2, 3, 4]
+
+    def test_drop_oldest(self):
+        data_bus = DataBus()
+        subscription = data_bus.subscribe(NUMBERS, "latest", capacity=3)
+        for number in range(5):
+            data_bus.publish(NUMBERS, number)
+        assert subscription.drain() == [2, 3, 4]
+        assert subscription.drain() == []
+        assert subscription.latest == 4
+        assert (subscription.delivered, subscription.dropped) == (5, 2)
+
+    def test_drop_newest(self):
+        data_bus = DataBus()
+        subscription = data_bus.subscribe(
+            NUMBERS, "unbroken", capacity=3, policy=DropPolicy.DROP_NEWEST
+        )
+        for number in range(5):
+            data_bus.publish(NUMBERS, number)
+        assert subscription.drain() == [0, 1, 2]
+        assert (subscription.delivered, subscription.dropped) == (3, 2)
+
+    def test_keep_latest(self):
+        data_bus = DataBus()
+        subscription = data_bus.subscribe(
+            NUMBERS, "display", capacity=1, policy=DropPolicy.KEEP_LATEST
+        )
+        for number in range(5):
+            data_bus.publish(NUMBERS, number)
+        assert subscription.drain() == [4]
+        # The replaced packets weren't wanted, so they aren't dropped
+        assert (subscription.delivered, subscription.dropped) == (5, 0)
+
+    def test_decimation(self):
+        data_bus = DataBus()
+        subscription = data_bus.subscribe(NUMBERS, "slow", decimation=3)
+        for number in range(7):
+            data_bus.publish(NUMBERS, number)
+        assert subscription.drain() == [0, 3, 6]
+
+    def test_unsubscribe(self):
+        data_bus = DataBus()
+        received = []
+        subscription = data_bus.subscribe(NUMBERS, "handler", received.append)
+        data_bus.publish(NUMBERS, 1)
+        data_bus.unsubscribe(subscription)
+        data_bus.publish(NUMBERS, 2)
+        assert received == [1]
+
+    def test_statistics(self):
+        data_bus = DataBus()
+        data_bus.subscribe(NUMBERS, "handler", lambda _: None)
+        data_bus.subscribe(NUMBERS, "buffer", capacity=1)
+        for number in range(3):
+            data_bus.publish(NUMBERS, number)
+        (topic,) = data_bus.statistics()
+        assert (topic.topic, topic.published) == ("numbers", 3)
+        assert topic.publish_max_ns <= topic.publish_total_ns
+        assert [
+            (s.name, s.delivered, s.dropped, s.errors, s.queued) for s in topic.subscribers
+        ] == [
+            ("handler", 3, 0, 0, 0),
+            ("buffer", 3, 2, 0, 1),
+        ]
+
+    def test_failing_handler(self, capsys):
+        data_bus = DataBus()
+
+        def fail_on_odd(number):
+            if number % 2:
+                raise ValueError(number)
+
+        failing = data_bus.subscribe(NUMBERS, "failing", fail_on_odd)
+        received = []
+        data_bus.subscribe(NUMBERS, "handler", received.append)
+        for number in range(4):
+            data_bus.publish(NUMBERS, number)
+        # The other subscribers still get every packet
+        assert received == [0, 1, 2, 3]
+        assert (failing.delivered, failing.errors, failing.latest) == (2, 2, 2)
+        assert "failed to handle a packet (error 1)" in capsys.readouterr().out
+
+    def test_failing_handler_is_reported_again(self, capsys):
+        data_bus = DataBus()
+
+        def fail(number):
+            raise ValueError(number)
+
+        failing = data_bus.subscribe(NUMBERS, "logger", fail)
+        for number in range(2 * DATA_BUS_ERROR_REPORT_INTERVAL):
+            data_bus.publish(NUMBERS, number)
+        # The first error, and then every DATA_BUS_ERROR_REPORT_INTERVAL
+        assert capsys.readouterr().out.count("Data bus subscriber logger failed") == 3
+        assert failing.errors == 2 * DATA_BUS_ERROR_REPORT_INTERVAL
+
+    def test_wrong_packet_type(self):
+        data_bus = DataBus()
+        with pytest.raises(TypeError, match="numbers topic takes int"):
+            data_bus.publish(NUMBERS, "one")
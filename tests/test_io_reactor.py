@@ -0,0 +1,109 @@
+"""Tests the IOReactor, reading the IMU and the receiver from pseudo-terminals on one thread."""
+
+import os
+import pty
+import struct
+import threading
+import time
+
+import pytest
+
+from payload.constants import PACKET_BYTE_SIZE, PACKET_START_MARKER, TRANSMIT_MESSAGE
+from payload.hardware.imu import IMU
+from payload.hardware.io_reactor import IOReactor
+from payload.hardware.receiver import Receiver
+from payload.mock.mock_xbee import MockXBee
+
+
+def imu_packet(timestamp: float) -> bytes:
+    """Returns a packet like the Arduino sends, with the timestamp as its first value."""
+    values = [timestamp] + [1.0] * (PACKET_BYTE_SIZE // 4 - 1)
+    return PACKET_START_MARKER + struct.pack(f"<{len(values)}f", *values)
+
+
+@pytest.fixture
+def arduino():
+    """Yields the file descriptor we write the Arduino's output to, and the IMU's port."""
+    controller, device = pty.openpty()
+    yield controller, os.ttyname(device)
+    os.close(controller)
+    os.close(device)
+
+
+class TestIOReactor:
+    """Tests reading serial ports with the IOReactor."""
+
+    def test_imu_packets(self, arduino):
+        controller, port = arduino
+        reactor = IOReactor()
+        imu = IMU(port, 115200, reactor)
+        imu.start()
+        assert reactor.is_running
+
+        stream = b"noise" + imu_packet(1.0) + imu_packet(2.0) + b"\xff\xfe" + imu_packet(3.0)
+        # Split in the middle of the second packet, so the reads don't line up with packets
+        os.write(controller, stream[:120])
+        time.sleep(0.05)
+        os.write(controller, stream[120:])
+
+        timestamps = [imu.get_data_packet().timestamp for _ in range(3)]
+        assert timestamps == [1.0, 2.0, 3.0]
+        imu.stop()
+        assert not reactor.is_running
+        assert reactor.bytes_read == len(stream)
+
+    def test_one_thread_for_imu_and_receiver(self, arduino):
+        controller, port = arduino
+        reactor = IOReactor()
+        xbee = MockXBee()
+        xbee.start()
+        threads_before = threading.active_count()
+        imu = IMU(port, 115200, reactor)
+        receiver = Receiver(xbee.port, 9600, api_mode=True, reactor=reactor)
+        imu.start()
+        receiver.start()
+        assert threading.active_count() == threads_before + 1
+
+        os.write(controller, imu_packet(1.0))
+        assert xbee.send_command(TRANSMIT_MESSAGE, timeout=0.5)
+        assert imu.get_data_packet().timestamp == 1.0
+        assert [message.message for message in receiver.get_messages()] == [TRANSMIT_MESSAGE]
+
+        receiver.stop()
+        assert reactor.is_running
+        imu.stop()
+        assert not reactor.is_running
+        assert threading.active_count() == threads_before
+        assert len(reactor.handle_times_ns) == reactor.wakeups
+        xbee.stop()
+
+    def test_failing_handler(self, capsys):
+        failing_read_fd, failing_write_fd = os.pipe()
+        read_fd, write_fd = os.pipe()
+        for fd in (failing_read_fd, read_fd):
+            os.set_blocking(fd, False)
+
+        def fail(data: bytes) -> None:
+            raise ValueError(data)
+
+        received = []
+        reactor = IOReactor()
+        reactor.register(failing_read_fd, fail)
+        reactor.register(read_fd, received.append)
+        for number in range(3):
+            os.write(failing_write_fd, b"bad")
+            time.sleep(0.02)
+            os.write(write_fd, b"%d" % number)
+            time.sleep(0.02)
+
+        # The thread kept going, and still reads the other file
+        assert reactor.is_running
+        assert b"".join(received) == b"012"
+        assert reactor.handler_errors == {failing_read_fd: 3}
+        reactor.unregister(failing_read_fd)
+        reactor.unregister(read_fd)
+        output = capsys.readouterr().out
+        assert f"handler of file {failing_read_fd} failed (error 1)" in output
+        assert f"handler of file {failing_read_fd} failed 3 times" in output
+        for fd in (failing_read_fd, failing_write_fd, read_fd, write_fd):
+            os.close(fd)
@@ -0,0 +1,271 @@
+"""Tests the Logger class."""
+
+import queue
+import time
+
+import numpy as np
+import pytest
+
+from payload.constants import (
+    IDLE_LOG_BUFFER_SECONDS,
+    IDLE_LOG_SUMMARY_FREQUENCY,
+    LOG_SEGMENT_SIZE_BYTES,
+)
+from payload.data_handling.log_index import LogIndexWriter
+from payload.data_handling.log_reader import LogReader
+from payload.data_handling.log_recovery import recover_log
+from payload.data_handling.log_segments import LogSegmentWriter
+from payload.data_handling.logger import Logger
+from payload.data_handling.packets.context_data_packet import ContextDataPacket
+from payload.data_handling.packets.imu_data_packet import IMUDataPacket
+from payload.data_handling.packets.processor_data_packet import ProcessorDataPacket
+from payload.data_handling.write_ahead_log import encode_record
+
+IMU_PERIOD_MS = 25  # 40 Hz
+
+
+@pytest.fixture
+def logger(tmp_path):
+    return Logger(tmp_path)
+
+
+def make_packets(state_name: str, timestamp: int):
+    """Creates the three data packets the logger needs, for the given state and IMU timestamp."""
+    context_data_packet = ContextDataPacket(state_name, "None", "NMR", 0)
+    imu_data_packet = IMUDataPacket(timestamp=timestamp, pressureAlt=1.0)
+    processor_data_packet = ProcessorDataPacket(*(np.float64(0.0) for _ in range(8)))
+    return context_data_packet, imu_data_packet, processor_data_packet
+
+
+def drain(log_queue) -> list:
+    """Gets everything which was put in the logger queue."""
+    items = []
+    while True:
+        try:
+            items.append(log_queue.get(timeout=0.2))
+        except queue.Empty:
+            return items
+
+
+class TestLogger:
+    """Tests the Logger class"""
+
+    def test_standby_is_buffered_and_decimated(self, logger):
+        """Only a decimated summary of the standby data should be queued."""
+        standby_seconds = 20
+        for i in range(standby_seconds * 1000 // IMU_PERIOD_MS):
+            logger.log(*make_packets("S", i * IMU_PERIOD_MS))
+
+        logged = drain(logger._log_queue)
+        expected = (standby_seconds - IDLE_LOG_BUFFER_SECONDS) * IDLE_LOG_SUMMARY_FREQUENCY
+        assert abs(len(logged) - expected) <= 1
+        # The buffer holds the last IDLE_LOG_BUFFER_SECONDS of data:
+        buffered = [packet["timestamp"] for packet in logger._log_buffer]
+        assert buffered[-1] - buffered[0] <= IDLE_LOG_BUFFER_SECONDS * 1000
+
+    def test_buffer_flushed_on_motor_burn(self, logger):
+        """Entering MotorBurnState should write the full rate buffer, in order."""
+        timestamp = 0
+        for timestamp in range(0, 10_000, IMU_PERIOD_MS):
+            logger.log(*make_packets("S", timestamp))
+        buffered_length = len(logger._log_buffer)
+        logger.log(*make_packets("M", timestamp + IMU_PERIOD_MS))
+
+        assert not logger._log_buffer
+        logged = drain(logger._log_queue)
+        timestamps = [packet["timestamp"] for packet in logged]
+        assert timestamps == sorted(timestamps)
+        assert len(set(timestamps)) == len(timestamps)
+        # The last buffered packets are all there at full rate, followed by the motor burn packet:
+        first_buffered_timestamp = timestamp - (buffered_length - 1) * IMU_PERIOD_MS
+        assert timestamps[-buffered_length - 1 :] == list(
+            range(first_buffered_timestamp, timestamp + 2 * IMU_PERIOD_MS, IMU_PERIOD_MS)
+        )
+        assert logged[-1]["state_name"] == "M"
+
+    def test_log_number(self, tmp_path):
+        (tmp_path / "log_2").mkdir()
+        (tmp_path / "log_4.csv").touch()
+        # Other entries which start with "log_" are skipped, rather than failing to start
+        (tmp_path / "log_9.tar.gz").touch()
+        (tmp_path / "log_7_old").mkdir()
+        (tmp_path / "log_8").touch()
+        assert Logger(tmp_path).log_path == tmp_path / "log_5"
+
+    def test_flight_is_not_buffered(self, logger):
+        """Every packet should be queued outside of the buffered states."""
+        for i in range(50):
+            logger.log(*make_packets("C", i * IMU_PERIOD_MS))
+        assert len(drain(logger._log_queue)) == 50
+
+
+class TestLogSegmentWriter:
+    """Tests writing segmented logs and reading them back"""
+
+    FIELDNAMES = ("state_name", "timestamp", "current_altitude")
+
+    def make_writer(self, log_dir, compression=None) -> LogSegmentWriter:
+        return LogSegmentWriter(
+            log_dir, list(self.FIELDNAMES), segment_size_bytes=1024, compression=compression
+        )
+
+    @pytest.mark.parametrize("compression", [None, "gzip", "lzma"])
+    def test_rows_are_read_back_across_segments(self, tmp_path, compression):
+        """All rows should be read back in order, no matter how the segments are stored."""
+        writer = self.make_writer(tmp_path, compression)
+        rows = [
+            {"state_name": "M", "timestamp": str(i), "current_altitude": f"{i * 1.5:.8f}"}
+            for i in range(500)
+        ]
+        for row in rows:
+            writer.write_row(row)
+        writer.close()
+
+        reader = LogReader(tmp_path)
+        assert len(reader.manifest.segments) > 1
+        assert all(segment.closed for segment in reader.manifest.segments)
+        assert all(segment.compression == compression for segment in reader.manifest.segments)
+        assert sum(segment.number_of_rows for segment in reader.manifest.segments) == len(rows)
+        assert list(reader.iter_rows()) == rows
+        # Only the compressed files are left, and each segment is trimmed to its data:
+        for segment in reader.manifest.segments:
+            assert (tmp_path / segment.file_name).exists()
+            if compression is None:
+                assert (tmp_path / segment.file_name).stat().st_size == segment.size_bytes
+
+    def test_unclosed_segment_is_readable(self, tmp_path):
+        """A segment which was not closed (e.g. power loss) still has the preallocated zeroes."""
+        writer = self.make_writer(tmp_path)
+        for i in range(5):
+            writer.write_row({"state_name": "S", "timestamp": str(i), "current_altitude": "0"})
+        writer.flush()
+
+        reader = LogReader(tmp_path)
+        assert not reader.manifest.segments[-1].closed
+        assert [row["timestamp"] for row in reader.iter_rows()] == ["0", "1", "2", "3", "4"]
+
+
+class TestLogIndex:
+    """Tests seeking in a log with its index"""
+
+    @pytest.fixture
+    def rows(self):
+        """A short flight, with a message received during the coast."""
+        states = "S" * 100 + "M" * 50 + "C" * 120 + "F" * 200 + "L" * 30
+        return [
+            {
+                "state_name": state_name,
+                "received_message": "TRANSMIT" if i == 200 else "NMR",
+                "timestamp": f"{i * IMU_PERIOD_MS:.8f}",
+            }
+            for i, state_name in enumerate(states)
+        ]
+
+    @pytest.fixture
+    def reader(self, tmp_path, rows):
+        writer = LogSegmentWriter(
+            tmp_path, list(rows[0]), segment_size_bytes=2048, compression="gzip"
+        )
+        index_writer = LogIndexWriter(tmp_path / "index.jsonl", timestamp_interval=40)
+        for row in rows:
+            index_writer.add_row(row, *writer.write_row(row))
+        writer.close()
+        index_writer.close()
+        return LogReader(tmp_path)
+
+    @pytest.mark.parametrize("state_name", ["S", "M", "C", "F", "L"])
+    def test_iter_state_rows(self, reader, rows, state_name):
+        expected = [row for row in rows if row["state_name"] == state_name]
+        assert list(reader.iter_state_rows(state_name)) == expected
+
+    def test_iter_rows_between(self, reader, rows):
+        start, end = 3010.0, 7000.0
+        expected = [row for row in rows if start <= float(row["timestamp"]) <= end]
+        assert list(reader.iter_rows_between(start, end)) == expected
+
+    def test_index_entries(self, reader):
+        index = reader.read_index()
+        assert [entry.value for entry in index if entry.kind == "state"] == list("SMCFL")
+        received = [entry for entry in index if entry.kind == "received_message"]
+        assert [(entry.row_number, entry.value) for entry in received] == [
+            (200, "TRANSMIT"),
+            (201, "NMR"),
+        ]
+        assert any(entry.segment > 0 for entry in index)
+
+
+class TestWriteAheadLog:
+    """Tests the write-ahead log format and recovering it after a crash"""
+
+    FIELDNAMES = ("state_name", "timestamp")
+
+    def write_unclosed_log(self, log_dir, number_of_rows) -> LogSegmentWriter:
+        """Writes a log like a flight which lost power before the logger stopped."""
+        writer = LogSegmentWriter(
+            log_dir,
+            list(self.FIELDNAMES),
+            segment_size_bytes=4096,
+            compression=None,
+            log_format="wal",
+        )
+        for i in range(number_of_rows):
+            writer.write_row({"state_name": "L", "timestamp": str(i)})
+        writer.flush()
+        return writer
+
+    def test_clean_tail_is_recovered(self, tmp_path):
+        self.write_unclosed_log(tmp_path, 20)
+        segment_path = tmp_path / LogReader(tmp_path).manifest.segments[-1].file_name
+
+        (report,) = recover_log(tmp_path)
+        assert report.valid_records == 21  # the rows and the header
+        assert report.discarded_bytes == 0
+        assert report.lost_records == 0
+        assert segment_path.stat().st_size == report.valid_bytes
+
+        reader = LogReader(tmp_path)
+        assert reader.manifest.segments[-1].closed
+        assert [row["timestamp"] for row in reader.iter_rows()] == [str(i) for i in range(20)]
+
+    def test_damaged_tail_is_truncated(self, tmp_path):
+        self.write_unclosed_log(tmp_path, 20)
+        segment_path = tmp_path / LogReader(tmp_path).manifest.segments[-1].file_name
+        data = segment_path.read_bytes().rstrip(b"\x00")
+        # The power was lost while writing the last record, and a byte of the one before got
+        # corrupted:
+        last_record = data.rindex(b"L,19")
+        damaged = bytearray(data[: last_record - 2])
+        damaged[-10] ^= 0xFF
+        segment_path.write_bytes(bytes(damaged) + bytes(100))
+
+        dry_run_report = recover_log(tmp_path, truncate=False)[0]
+        assert segment_path.stat().st_size == len(damaged) + 100
+
+        (report,) = recover_log(tmp_path)
+        assert report == dry_run_report
+        assert report.valid_records == 19  # the header and rows 0 to 17
+        assert report.lost_records == 1
+        assert report.discarded_bytes > 0
+        rows = list(LogReader(tmp_path).iter_rows())
+        assert [row["timestamp"] for row in rows] == [str(i) for i in range(18)]
+
+    def test_early_damage_is_recovered_quickly(self, tmp_path):
+        self.write_unclosed_log(tmp_path, 20)
+        segment_path = tmp_path / LogReader(tmp_path).manifest.segments[-1].file_name
+        data = segment_path.read_bytes().rstrip(b"\x00")
+        # Row 2 is damaged, and is followed by a segment's worth of garbage and then more rows
+        damaged = bytearray(data)
+        damaged[data.index(b"L,2") + 2] ^= 0xFF
+        garbage = np.random.default_rng(0).bytes(LOG_SEGMENT_SIZE_BYTES)
+        later_rows = b"".join(encode_record(b"L,%d\r\n" % i) for i in range(100, 105))
+        segment_path.write_bytes(bytes(damaged) + garbage + later_rows + bytes(100))
+
+        start = time.perf_counter()
+        (report,) = recover_log(tmp_path)
+        assert time.perf_counter() - start < 5
+        assert report.valid_records == 3  # the header and rows 0 and 1
+        # Row 2, the 17 rows after it, and the 5 after the garbage
+        assert report.lost_records == 1 + 17 + 5
+        assert report.discarded_bytes == len(damaged) + len(garbage) + len(later_rows) - (
+            report.valid_bytes
+        )
@@ -0,0 +1,65 @@
+"""Tests the memory diagnostics which are asked for with SIGUSR1 and SIGUSR2."""
+
+import os
+import signal
+import tracemalloc
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from payload.memory_diagnostics import MemoryDiagnostics, count_objects_by_type
+
+
+@pytest.fixture(autouse=True)
+def reports_path(tmp_path, monkeypatch):
+    """Writes the reports to a temporary directory."""
+    monkeypatch.setattr("payload.memory_diagnostics.MEMORY_REPORTS_PATH", tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def memory_diagnostics():
+    """Returns memory diagnostics for a logger which hasn't been started."""
+    memory_diagnostics = MemoryDiagnostics(SimpleNamespace(pid=None))
+    yield memory_diagnostics
+    memory_diagnostics.uninstall()
+
+
+class TestMemoryDiagnostics:
+    """Tests the MemoryDiagnostics."""
+
+    def test_count_objects_by_type(self):
+        # The NumPy scalars aren't tracked by the garbage collector, but the list holding them is
+        scalars = [np.float64(number) for number in range(1000)]
+        assert count_objects_by_type()["numpy.float64"] >= len(scalars)
+
+    def test_report(self, memory_diagnostics, tmp_path):
+        memory_diagnostics.toggle_tracing()
+        assert tracemalloc.is_tracing()
+        allocated = [bytearray(1024) for _ in range(100)]
+        report = memory_diagnostics.write_report(tmp_path / "report.txt").read_text()
+        memory_diagnostics.toggle_tracing()
+        assert not tracemalloc.is_tracing()
+
+        assert "  main " in report
+        assert "logger" not in report
+        # The bytearrays are the largest allocations since tracing started
+        assert len(allocated) == 100
+        assert "test_memory_diagnostics.py:" in report.split("Top allocation sites:")[1]
+
+    def test_report_without_tracing(self, memory_diagnostics, tmp_path):
+        report = memory_diagnostics.write_report(tmp_path / "report.txt").read_text()
+        assert "send SIGUSR1 to start tracing" in report
+
+    @pytest.mark.skipif(not hasattr(signal, "SIGUSR1"), reason="There are no SIGUSR signals")
+    def test_signals(self, memory_diagnostics, reports_path):
+        memory_diagnostics.install()
+        os.kill(os.getpid(), signal.SIGUSR1)
+        assert tracemalloc.is_tracing()
+        os.kill(os.getpid(), signal.SIGUSR2)
+        memory_diagnostics.uninstall()
+        assert not tracemalloc.is_tracing()
+        assert signal.getsignal(signal.SIGUSR2) is signal.SIG_DFL
+        (report,) = reports_path.glob("memory_*.txt")
+        assert "Top allocation sites:" in report.read_text()
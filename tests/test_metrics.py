@@ -0,0 +1,65 @@
+"""Tests the metrics registry and serving it in the Prometheus text format."""
+
+import urllib.error
+import urllib.request
+
+import pytest
+
+from payload.data_handling.metrics import MetricsRegistry, MetricsServer
+
+
+@pytest.fixture
+def registry():
+    """Returns a registry with one metric of every kind."""
+    registry = MetricsRegistry()
+    registry.counter("loops_total", "The loops.").inc(3)
+    registry.gauge("queue_depth", "The queue.", lambda: 2)
+    registry.gauge("alive", "The threads.", lambda: {"IMU": 1, 'odd "name"': 1}, "thread")
+    histogram = registry.histogram("loop_seconds", "The loop.", (0.001, 0.01))
+    for value in (0.0005, 0.001, 0.005, 1.0):
+        histogram.observe(value)
+    return registry
+
+
+class TestMetrics:
+    """Tests the MetricsRegistry and the MetricsServer."""
+
+    def test_render(self, registry):
+        lines = registry.render().splitlines()
+        assert lines[:3] == [
+            "# HELP loops_total The loops.",
+            "# TYPE loops_total counter",
+            "loops_total 3",
+        ]
+        assert "queue_depth 2" in lines
+        assert 'alive{thread="IMU"} 1' in lines
+        assert 'alive{thread="odd \\"name\\""} 1' in lines
+        # The buckets are cumulative, and a value on a bound is in that bucket
+        assert lines[-5:] == [
+            'loop_seconds_bucket{le="0.001"} 2',
+            'loop_seconds_bucket{le="0.01"} 3',
+            'loop_seconds_bucket{le="+Inf"} 4',
+            "loop_seconds_sum 1.0065",
+            "loop_seconds_count 4",
+        ]
+
+    def test_failing_metric_is_left_out(self, registry):
+        registry.gauge("broken", "Fails.", lambda: 1 / 0)
+        assert "broken" not in registry.render()
+
+    def test_duplicate_name(self, registry):
+        with pytest.raises(ValueError, match="loops_total"):
+            registry.counter("loops_total", "Again.")
+
+    def test_server(self, registry):
+        server = MetricsServer(registry, 0)
+        server.start()
+        try:
+            url = f"http://127.0.0.1:{server.port}"
+            with urllib.request.urlopen(f"{url}/metrics") as response:  # noqa: S310
+                assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+                assert response.read().decode() == registry.render()
+            with pytest.raises(urllib.error.HTTPError, match="404"):
+                urllib.request.urlopen(f"{url}/other")  # noqa: S310
+        finally:
+            server.stop()
@@ -0,0 +1,44 @@
+"""Tests the MinMaxHistory."""
+
+import pytest
+
+from payload.data_handling.min_max_history import MinMaxHistory
+
+
+class TestMinMaxHistory:
+    """Tests downsampling with MinMaxHistory."""
+
+    def test_keeps_every_value_until_full(self):
+        history = MinMaxHistory(8)
+        for value in [3.0, 1.0, 4.0, 1.0, 5.0]:
+            history.append(value)
+        assert history.values() == [3.0, 1.0, 4.0, 1.0, 5.0]
+
+    def test_size_is_fixed_and_peaks_are_kept(self):
+        history = MinMaxHistory(16)
+        # A long flight, with a single sample spike and dip in the middle
+        values = [float(i % 10) for i in range(100_000)]
+        values[54_321] = 1000.0
+        values[54_999] = -1000.0
+        for value in values:
+            history.append(value)
+
+        downsampled = history.values()
+        assert len(downsampled) <= 32
+        assert max(downsampled) == history.maximum == 1000.0
+        assert min(downsampled) == history.minimum == -1000.0
+        # They are given back in the order they happened
+        assert downsampled.index(1000.0) < downsampled.index(-1000.0)
+        assert history.samples == 100_000
+
+    def test_merged_buckets_cover_equal_samples(self):
+        history = MinMaxHistory(4)
+        # Each value is its own sample number, so the buckets are easy to check
+        for value in range(9):
+            history.append(float(value))
+        # 4 buckets of 2 samples were merged into 2 buckets of 4, then a new bucket was started
+        assert history.values() == [0.0, 3.0, 4.0, 7.0, 8.0]
+
+    def test_odd_capacity(self):
+        with pytest.raises(ValueError, match="even"):
+            MinMaxHistory(5)
@@ -0,0 +1,141 @@
+"""Tests the parts of the PayloadContext which hand data to the transmitter, with fake
+components."""
+
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from payload.constants import DOWNLINK_OVERRUN_BACKOFF_LOOPS, LANDING_PACKET_REFRESH_SECONDS
+from payload.data_handling.packets.imu_data_packet import IMUDataPacket
+from payload.interfaces.base_transmitter import BaseTransmitter
+from payload.payload import PayloadContext
+
+
+class FakeTransmitter(BaseTransmitter):
+    """Records what it is asked to send. Handing it a status takes `status_cost` seconds."""
+
+    def __init__(self) -> None:
+        self.messages = []
+        self.statuses = []
+        self.status_cost = 0.0
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+    def send_message(self, message, requested_ns=None) -> None:
+        self.messages.append((message, requested_ns))
+
+    def send_status(self, status) -> bool:
+        self.statuses.append(status)
+        if self.status_cost:
+            time.sleep(self.status_cost)
+        return True
+
+
+class FakeDataProcessor:
+    """Counts the orientations calculated, which are the slow part of the landing message."""
+
+    def __init__(self) -> None:
+        self.current_timestamp = 0
+        self.orientations_calculated = 0
+
+    def calculate_orientation(self):
+        self.orientations_calculated += 1
+        angle = np.float64(self.orientations_calculated)
+        return (angle, angle, angle)
+
+
+@pytest.fixture
+def payload(tmp_path):
+    """Returns a payload context with fake components, in the middle of a flight."""
+    payload = PayloadContext(
+        SimpleNamespace(),
+        SimpleNamespace(log_path=tmp_path, pid=None),
+        FakeDataProcessor(),
+        FakeTransmitter(),
+        SimpleNamespace(),
+        SimpleNamespace(),
+    )
+    payload.imu_data_packet = IMUDataPacket(
+        timestamp=0,
+        voltage_pi=90.0,
+        voltage_tx=80.0,
+        ambientTemperature=20.0,
+        gpsLatitude=34.7289,
+        gpsLongitude=-86.5861,
+    )
+    payload.processed_data_packet = SimpleNamespace(
+        current_altitude=np.float64(100.0),
+        vertical_velocity=np.float64(-5.0),
+        maximum_altitude=np.float64(250.0),
+        maximum_velocity=np.float64(150.0),
+        landing_velocity=np.float64(4.5),
+        crew_survivability=np.float64(0.9),
+    )
+    return payload
+
+
+class TestDownlink:
+    """Tests handing the in-flight status to the transmitter within the per-loop budget."""
+
+    def test_backoff_after_overrun(self, payload):
+        transmitter = payload.transmitter
+        payload.downlink_status()
+        assert (len(transmitter.statuses), payload.downlink_overruns) == (1, 0)
+
+        # Going over the budget once skips the next DOWNLINK_OVERRUN_BACKOFF_LOOPS loops
+        transmitter.status_cost = 0.001
+        payload.downlink_status()
+        assert (len(transmitter.statuses), payload.downlink_overruns) == (2, 1)
+        transmitter.status_cost = 0.0
+        for _ in range(DOWNLINK_OVERRUN_BACKOFF_LOOPS):
+            payload.downlink_status()
+        assert len(transmitter.statuses) == 2
+
+        payload.downlink_status()
+        assert len(transmitter.statuses) == 3
+        assert transmitter.statuses[-1].state_name == "S"
+        assert len(payload.downlink_costs_ns) == 3
+
+
+class TestLandingMessage:
+    """Tests making the landing message ahead of time during free fall."""
+
+    def test_staged_orientation_is_reused(self, payload):
+        data_processor = payload.data_processor
+        payload.stage_landing_packet()
+        assert data_processor.orientations_calculated == 1
+        # Within the refresh interval, the staged message is kept
+        data_processor.current_timestamp += LANDING_PACKET_REFRESH_SECONDS * 1e3 / 2
+        payload.stage_landing_packet()
+        assert data_processor.orientations_calculated == 1
+
+        # Landing swaps in the final values, but keeps the staged orientation
+        payload.processed_data_packet.landing_velocity = np.float64(6.0)
+        requested_ns = time.perf_counter_ns()
+        payload.transmit_data(requested_ns)
+        assert data_processor.orientations_calculated == 1
+        ((message, sent_requested_ns),) = payload.transmitter.messages
+        assert sent_requested_ns == requested_ns
+        assert message.orientation == payload.landing_packet.orientation
+        assert message.landing_velocity == 6.0
+
+    def test_staged_message_is_refreshed(self, payload):
+        data_processor = payload.data_processor
+        payload.stage_landing_packet()
+        data_processor.current_timestamp += LANDING_PACKET_REFRESH_SECONDS * 1e3
+        payload.stage_landing_packet()
+        assert data_processor.orientations_calculated == 2
+        assert payload.landing_packet.orientation == (2.0, 2.0, 2.0)
+
+    def test_without_staged_message(self, payload):
+        payload.transmit_data()
+        assert payload.data_processor.orientations_calculated == 1
+        ((message, requested_ns),) = payload.transmitter.messages
+        assert requested_ns is None
+        assert message.orientation == (1.0, 1.0, 1.0)
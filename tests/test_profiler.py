@@ -0,0 +1,57 @@
+"""Tests the profilers which `--profile` runs around the flight loop."""
+
+import pstats
+import threading
+
+import pytest
+
+from payload.profiler import CProfileProfiler, SamplingProfiler, create_profiler
+
+
+@pytest.fixture(autouse=True)
+def profiles_path(tmp_path, monkeypatch):
+    """Writes the profiles to a temporary directory."""
+    monkeypatch.setattr("payload.profiler.PROFILES_PATH", tmp_path)
+    return tmp_path
+
+
+def wait_for_event(event: threading.Event) -> None:
+    """The function the profiled thread is in."""
+    event.wait()
+
+
+class TestProfiler:
+    """Tests the CProfileProfiler and the SamplingProfiler."""
+
+    def test_create_profiler(self):
+        assert isinstance(create_profiler("cprofile"), CProfileProfiler)
+        assert isinstance(create_profiler("sampling", 0.01), SamplingProfiler)
+        assert create_profiler(None) is None
+
+    def test_sampling_profiler(self, profiles_path):
+        event = threading.Event()
+        thread = threading.Thread(target=wait_for_event, args=(event,), name="Waiting Thread")
+        thread.start()
+        profiler = SamplingProfiler(interval=0.001)
+        for _ in range(3):
+            profiler.sample()
+        event.set()
+        thread.join()
+        profiler.stop()
+
+        lines = profiler.path.read_text().splitlines()
+        assert profiler.path.parent == profiles_path
+        (waiting,) = [line for line in lines if line.startswith("Waiting Thread;")]
+        stack, count = waiting.rsplit(" ", 1)
+        assert "wait_for_event (test_profiler.py);Event.wait (threading.py)" in stack
+        assert count == "3"
+        # The profiler's own thread is never sampled
+        assert not any(line.startswith("Sampling Profiler;") for line in lines)
+
+    def test_cprofile_profiler(self):
+        profiler = CProfileProfiler()
+        profiler.start()
+        sorted(range(1000), key=lambda number: -number)
+        profiler.stop()
+        stats = pstats.Stats(str(profiler.path))
+        assert any(function == "<built-in method builtins.sorted>" for *_, function in stats.stats)
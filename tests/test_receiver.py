@@ -0,0 +1,70 @@
+"""Tests the Receiver, with a pseudo-terminal standing in for the serial port of the XBee."""
+
+import os
+import pty
+import time
+
+import pytest
+
+from payload.constants import RECEIVER_QUEUE_SIZE, STOP_MESSAGE, TRANSMIT_MESSAGE
+from payload.hardware.receiver import Receiver
+from tests.conftest import wait_for_messages
+
+
+@pytest.fixture
+def xbee():
+    """Yields the file descriptor we write the XBee's output to, and a receiver reading it."""
+    controller, device = pty.openpty()
+    receiver = Receiver(os.ttyname(device), 9600)
+    receiver.start()
+    # pyserial discards what was received before it opened the port, so we wait until it has
+    while not receiver.get_messages():
+        os.write(controller, b"READY\n")
+        time.sleep(0.01)
+    time.sleep(0.05)
+    receiver.get_messages()
+    yield controller, receiver
+    receiver.stop()
+    os.close(controller)
+    os.close(device)
+
+
+class TestReceiver:
+    """Tests reading commands from the serial port."""
+
+    def test_back_to_back_commands_are_all_received(self, xbee):
+        controller, receiver = xbee
+        start_ns = time.time_ns()
+        # The first command arrives split across two reads
+        os.write(controller, b"TRANS")
+        time.sleep(0.05)
+        os.write(controller, f"MIT\n{STOP_MESSAGE}\n\n{TRANSMIT_MESSAGE}\n".encode())
+
+        messages = wait_for_messages(receiver, 3)
+        assert [message.message for message in messages] == [
+            TRANSMIT_MESSAGE,
+            STOP_MESSAGE,
+            TRANSMIT_MESSAGE,
+        ]
+        assert all(message.received_timestamp_ns >= start_ns for message in messages)
+        assert receiver.latest_message == TRANSMIT_MESSAGE
+        assert receiver.get_messages() == []
+
+    def test_full_queue_drops_oldest(self, xbee):
+        controller, receiver = xbee
+        count = RECEIVER_QUEUE_SIZE + 2
+        os.write(controller, "".join(f"{i}\n" for i in range(count)).encode())
+        deadline = time.monotonic() + 2
+        while receiver.latest_message != str(count - 1) and time.monotonic() < deadline:
+            time.sleep(0.001)
+
+        messages = receiver.get_messages()
+        assert [message.message for message in messages] == [str(i) for i in range(2, count)]
+        assert receiver.dropped_messages == 2
+
+    def test_idle_thread_sleeps(self, xbee):  # noqa: ARG002
+        time.sleep(0.1)
+        start = time.process_time()
+        time.sleep(0.5)
+        # The old receiver spun on the serial port, using a whole core
+        assert time.process_time() - start < 0.05
@@ -0,0 +1,87 @@
+"""Tests applying the scheduling profiles to the threads of the payload."""
+
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from payload.constants import SCHEDULING_PROFILES
+from payload.scheduling import (
+    ComponentSchedule,
+    apply_process_schedule,
+    apply_schedule,
+    load_scheduling_profile,
+)
+
+pytestmark = pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="The scheduling is only set per thread on Linux"
+)
+
+
+@pytest.fixture
+def thread():
+    """Returns a thread which runs until the test ends."""
+    event = threading.Event()
+    thread = threading.Thread(target=event.wait, name="Scheduled Thread")
+    thread.start()
+    yield thread
+    event.set()
+    thread.join()
+
+
+class TestScheduling:
+    """Tests the scheduling profiles."""
+
+    def test_load_profiles(self):
+        for name in SCHEDULING_PROFILES:
+            assert load_scheduling_profile(name)["main_loop"].cpus is not None
+
+    def test_apply_schedule(self, thread):
+        process_cpus = os.sched_getaffinity(0)
+        cpus = tuple(sorted(process_cpus))[:1]
+        nice = os.getpriority(os.PRIO_PROCESS, thread.native_id) + 1
+        report = apply_schedule(
+            "imu",
+            ComponentSchedule(cpus=cpus, nice=nice),
+            "Scheduled Thread",
+            [thread.native_id],
+            thread.native_id,
+        )
+        assert report.failed == []
+        assert report.applied == [f"CPUs {cpus[0]}", f"nice {nice}"]
+        assert os.sched_getaffinity(thread.native_id) == set(cpus)
+        assert os.getpriority(os.PRIO_PROCESS, thread.native_id) == nice
+        # Only the thread was changed, not the process
+        assert os.sched_getaffinity(0) == process_cpus
+
+    def test_failures_are_reported(self, thread):
+        report = apply_schedule(
+            "imu",
+            ComponentSchedule(cpus=(100_000,), realtime_priority=1000),
+            "Scheduled Thread",
+            [thread.native_id],
+            thread.native_id,
+        )
+        assert report.applied == []
+        assert report.failed == [
+            "CPUs 100000 (invalid argument)",
+            "SCHED_FIFO 1000 (invalid argument)",
+        ]
+
+    def test_apply_process_schedule(self, capsys):
+        process = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(10)"])
+        try:
+            nice = os.getpriority(os.PRIO_PROCESS, process.pid) + 1
+            report = apply_process_schedule(
+                "transmitter", ComponentSchedule(nice=nice), "python", process.pid
+            )
+            assert report.applied == [f"nice {nice}"]
+            assert os.getpriority(os.PRIO_PROCESS, process.pid) == nice
+        finally:
+            process.kill()
+            process.wait()
+        assert f"Scheduling transmitter python (process {process.pid}): applied nice" in (
+            capsys.readouterr().out
+        )
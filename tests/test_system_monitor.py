@@ -0,0 +1,100 @@
+"""Tests the SystemMonitor, which samples the load, memory and temperature of the Pi."""
+
+import csv
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from payload.constants import SYSTEM_LOG_NAME
+from payload.data_handling.system_monitor import (
+    SystemMonitor,
+    describe_throttled,
+    find_throttled_reader,
+    read_throttled_file,
+)
+
+
+@pytest.fixture
+def system_monitor(tmp_path, monkeypatch):
+    """Returns a system monitor which samples every 10 ms, for a logger which isn't running."""
+    monkeypatch.setattr(
+        "payload.data_handling.system_monitor.SYSTEM_MONITOR_INTERVAL_SECONDS", 0.01
+    )
+    return SystemMonitor(SimpleNamespace(log_path=tmp_path, pid=None), lambda: None)
+
+
+def spin(event: threading.Event) -> None:
+    """Keeps a thread busy until the event is set."""
+    while not event.is_set():
+        pass
+
+
+class TestSystemMonitor:
+    """Tests the SystemMonitor."""
+
+    def test_thread_cpu_percent(self, system_monitor):
+        event = threading.Event()
+        thread = threading.Thread(target=spin, args=(event,), name="Busy Thread")
+        thread.start()
+        system_monitor.sample()
+        time.sleep(0.2)
+        sample = system_monitor.sample()
+        event.set()
+        thread.join()
+        # The busy thread shares the GIL with the test, so it gets a good part of a core
+        assert sample.thread_cpu_percent["Busy Thread"] > 10
+        assert sample.main_rss_bytes > 0
+        assert sample.logger_rss_bytes == 0
+        assert (sample.timestamp, sample.state_name) == (None, "")
+
+    def test_state_name(self, tmp_path):
+        snapshot = SimpleNamespace(
+            imu_data_packet=SimpleNamespace(timestamp=1234), state_name="FreeFallState"
+        )
+        system_monitor = SystemMonitor(
+            SimpleNamespace(log_path=tmp_path, pid=None), lambda: snapshot
+        )
+        sample = system_monitor.sample()
+        # The state is written like in the flight log
+        assert (sample.timestamp, sample.state_name) == (1234, "F")
+
+    def test_throttled_file(self, system_monitor, tmp_path, monkeypatch):
+        throttled_path = tmp_path / "get_throttled"
+        throttled_path.write_text("50005\n")
+        monkeypatch.setattr("payload.data_handling.system_monitor.THROTTLED_PATH", throttled_path)
+        assert find_throttled_reader() is read_throttled_file
+        system_monitor.start()
+        while system_monitor.statistics.sample_count < 1:
+            time.sleep(0.01)
+        system_monitor.stop()
+        assert system_monitor.statistics.throttled == 0x50005
+
+    def test_not_on_pi(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(
+            "payload.data_handling.system_monitor.THROTTLED_PATH", tmp_path / "missing"
+        )
+        monkeypatch.setattr("payload.data_handling.system_monitor.shutil.which", lambda _: None)
+        assert find_throttled_reader() is None
+
+    def test_system_log(self, system_monitor, tmp_path, capsys):
+        system_monitor.start()
+        while system_monitor.statistics.sample_count < 3:
+            time.sleep(0.01)
+        system_monitor.stop()
+
+        with (tmp_path / SYSTEM_LOG_NAME).open(newline="") as system_file:
+            rows = list(csv.DictReader(system_file))
+        assert len(rows) == system_monitor.statistics.sample_count
+        assert len(json.loads(rows[0]["cpu_percent_per_core"])) > 0
+        assert "MainThread" in json.loads(rows[-1]["thread_cpu_percent"])
+        assert f"System monitor: {len(rows)} samples" in capsys.readouterr().out
+
+    def test_describe_throttled(self):
+        assert describe_throttled(0) == "not throttled"
+        assert describe_throttled(0x50005) == (
+            "under-voltage, throttled (since boot: under-voltage, throttled)"
+        )
+        assert describe_throttled(0x80000) == "not throttled (since boot: soft temperature limit)"
@@ -0,0 +1,84 @@
+"""Tests sending the snapshot of every loop on the telemetry stream."""
+
+import socket
+import threading
+import time
+
+import msgspec
+import numpy as np
+import pytest
+
+from payload.data_handling.packets.context_data_packet import ContextDataPacket
+from payload.data_handling.packets.imu_data_packet import IMUDataPacket
+from payload.data_handling.packets.payload_snapshot import PayloadSnapshot
+from payload.data_handling.packets.processor_data_packet import ProcessorDataPacket
+from payload.data_handling.telemetry_stream import TelemetryStream, listen, parse_address
+
+
+def make_snapshot(sequence: int) -> PayloadSnapshot:
+    """Returns the snapshot of a loop in coast, with the sequence number as its altitude."""
+    return PayloadSnapshot(
+        sequence=sequence,
+        state_name="CoastState",
+        state_start_time_ms=1000,
+        imu_data_packet=IMUDataPacket(timestamp=1000 + sequence, pressureAlt=300.0),
+        processed_data_packet=ProcessorDataPacket(
+            *(np.float64(sequence) for _ in ProcessorDataPacket.__struct_fields__)
+        ),
+        context_data_packet=ContextDataPacket("C", "None", "NMR", 0),
+        transmission_packet=None,
+    )
+
+
+class TestTelemetryStream:
+    """Tests the TelemetryStream and its listener."""
+
+    def test_parse_address(self):
+        assert parse_address("127.0.0.1:5005") == (socket.AF_INET, ("127.0.0.1", 5005))
+        assert parse_address("logs/payload.sock") == (socket.AF_UNIX, "logs/payload.sock")
+
+    def test_invalid_decimation(self):
+        with pytest.raises(ValueError, match="decimation"):
+            TelemetryStream("logs/payload.sock", decimation=0)
+
+    def test_unix_socket_with_decimation(self, tmp_path):
+        address = str(tmp_path / "telemetry.sock")
+        listener = listen(address)
+        received = []
+        # The listener binds when it is first advanced, so we start it before sending
+        thread = threading.Thread(
+            target=lambda: received.extend(next(listener) for _ in range(3)), daemon=True
+        )
+        thread.start()
+        while not (tmp_path / "telemetry.sock").exists():
+            time.sleep(0.001)
+
+        stream = TelemetryStream(address, decimation=2)
+        for sequence in range(1, 7):
+            stream.publish(make_snapshot(sequence))
+        thread.join(timeout=1)
+        stream.close()
+        listener.close()
+
+        assert [snapshot["sequence"] for snapshot in received] == [2, 4, 6]
+        assert received[0]["processed_data_packet"]["current_altitude"] == 2.0
+        assert received[0]["state_name"] == "CoastState"
+        assert (stream.sent, stream.dropped) == (3, 0)
+        assert not (tmp_path / "telemetry.sock").exists()
+
+    def test_drops_when_nobody_is_listening(self, tmp_path):
+        stream = TelemetryStream(str(tmp_path / "nobody.sock"))
+        for sequence in range(1, 4):
+            stream.publish(make_snapshot(sequence))
+        stream.close()
+        assert (stream.sent, stream.dropped) == (0, 3)
+
+    def test_udp(self):
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as listener:
+            listener.bind(("127.0.0.1", 0))
+            listener.settimeout(1)
+            stream = TelemetryStream(f"127.0.0.1:{listener.getsockname()[1]}")
+            stream.publish(make_snapshot(1))
+            snapshot = msgspec.msgpack.decode(listener.recv(4096))
+            stream.close()
+        assert snapshot["imu_data_packet"]["timestamp"] == 1001
@@ -0,0 +1,130 @@
+"""Tests the TransmissionScheduler, with a transmit function which records the transmissions."""
+
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from payload.data_handling.packets.transmitter_data_packet import TransmitterDataPacket
+from payload.hardware.transmission_scheduler import TransmissionJob, TransmissionScheduler
+from tests.conftest import wait_until
+
+
+def make_packet(temperature: float) -> TransmitterDataPacket:
+    return TransmitterDataPacket(
+        temperature=np.float64(temperature),
+        apogee=np.float64(250.0),
+        battery_level_pi=98.5,
+        battery_level_tx=87.25,
+        orientation=(np.float64(1.0), np.float64(-2.0), np.float64(3.5)),
+        time_of_landing="12:34:56",
+        max_velocity=np.float64(150.0),
+        landing_velocity=np.float64(4.5),
+        crew_survivability=np.float64(0.9),
+        landing_coords=(34.7289, -86.5861),
+    )
+
+
+class RecordingTransmitter:
+    """Records the transmissions, each holding the "PTT" on for `duration` seconds."""
+
+    def __init__(self, duration: float = 0.0) -> None:
+        self.duration = duration
+        self.transmissions: list[tuple[str, float]] = []
+        self.cancelled_transmissions = 0
+        self.scheduler = TransmissionScheduler(self.transmit)
+
+    def transmit(self, job: TransmissionJob, cancelled: threading.Event) -> None:
+        self.scheduler.mark_keyed(job)
+        self.transmissions.append((job.key, float(job.message.temperature)))
+        if cancelled.wait(self.duration):
+            self.cancelled_transmissions += 1
+
+
+@pytest.fixture
+def recorder():
+    recorder = RecordingTransmitter()
+    recorder.scheduler.start()
+    yield recorder
+    recorder.scheduler.stop()
+
+
+class TestTransmissionScheduler:
+    """Tests the scheduling, merging and cancelling of the transmissions."""
+
+    def test_repeats_with_interval(self, recorder):
+        start = time.monotonic()
+        recorder.scheduler.submit(make_packet(20.0), repeat=3, interval=0.05)
+        wait_until(lambda: len(recorder.transmissions) == 3)
+        assert time.monotonic() - start >= 0.1
+        assert recorder.transmissions == [("beacon", 20.0)] * 3
+        assert len(recorder.scheduler.latencies_ns) == 1
+        assert 0 < recorder.scheduler.latency_ns < 1e9
+
+    def test_merges_duplicate_requests(self, recorder):
+        first = recorder.scheduler.submit(make_packet(20.0), repeat=2, interval=0.2, delay=0.05)
+        second = recorder.scheduler.submit(make_packet(21.0), repeat=2, interval=0.2)
+        assert first is second
+        wait_until(lambda: len(recorder.transmissions) == 2)
+        # Only the latest message is sent, and not twice as often
+        assert recorder.transmissions == [("beacon", 21.0)] * 2
+
+    def test_priority_of_due_jobs(self, recorder):
+        recorder.scheduler.stop()
+        recorder = RecordingTransmitter()
+        recorder.scheduler.submit(make_packet(1.0), key="low", repeat=1)
+        recorder.scheduler.submit(make_packet(2.0), key="high", priority=1, repeat=1)
+        recorder.scheduler.start()
+        wait_until(lambda: len(recorder.transmissions) == 2)
+        recorder.scheduler.stop()
+        assert [key for key, _ in recorder.transmissions] == ["high", "low"]
+
+    def test_cancel_cuts_off_transmission(self):
+        recorder = RecordingTransmitter(duration=10.0)
+        recorder.scheduler.start()
+        recorder.scheduler.submit(make_packet(20.0), repeat=5, interval=0.0)
+        wait_until(lambda: recorder.scheduler.is_transmitting)
+
+        start = time.monotonic()
+        recorder.scheduler.cancel("beacon")
+        wait_until(lambda: not recorder.scheduler.is_transmitting)
+        assert time.monotonic() - start < 0.5
+        assert recorder.cancelled_transmissions == 1
+
+        time.sleep(0.05)
+        assert len(recorder.transmissions) == 1
+        recorder.scheduler.stop()
+
+    def test_stop_is_prompt(self):
+        recorder = RecordingTransmitter(duration=10.0)
+        recorder.scheduler.start()
+        recorder.scheduler.submit(make_packet(20.0))
+        wait_until(lambda: recorder.scheduler.is_transmitting)
+        start = time.monotonic()
+        recorder.scheduler.stop()
+        assert time.monotonic() - start < 0.5
+
+    def test_non_blocking_submit(self, recorder):
+        # A caller which can't wait, like the flight loop, drops its request while the scheduler
+        # thread holds the lock
+        locked, release = threading.Event(), threading.Event()
+
+        def hold_lock():
+            with recorder.scheduler._condition:
+                locked.set()
+                release.wait()
+
+        holder = threading.Thread(target=hold_lock)
+        holder.start()
+        locked.wait()
+        assert recorder.scheduler.submit(make_packet(20.0), blocking=False) is None
+        release.set()
+        holder.join()
+        assert recorder.scheduler.submit(make_packet(20.0), blocking=False) is not None
+
+    def test_latency_from_earlier_request(self, recorder):
+        requested_ns = time.perf_counter_ns() - 1_000_000_000
+        job = recorder.scheduler.submit(make_packet(20.0), repeat=1, requested_ns=requested_ns)
+        wait_until(lambda: job.keyed_ns is not None)
+        assert recorder.scheduler.latency_ns == job.keyed_ns - requested_ns >= 1_000_000_000
@@ -0,0 +1,186 @@
+"""Tests the transmitters, with the GPIO pins and Direwolf replaced by fakes."""
+
+import subprocess
+import threading
+import time
+
+import pytest
+
+from payload.data_handling.aprs import create_position_report
+from payload.data_handling.ax25 import parse_ui_frame
+from payload.data_handling.packets.status_data_packet import StatusDataPacket
+from payload.hardware.afsk_transmitter import AFSKTransmitter
+from payload.hardware.kiss_transmitter import KISSTransmitter
+from payload.hardware.transmission_scheduler import TransmissionJob
+from payload.hardware.transmitter import Transmitter
+from payload.scheduling import ComponentSchedule
+from tests.conftest import wait_until
+
+DIREWOLF_CONFIG = 'MYCALL N0CALL\nKISSPORT 8001\nPBEACON delay=0:1 every=0:5 comment=""\n'
+
+
+class FakeGPIO:
+    """Records the levels the PTT pin is set to, and when."""
+
+    BCM = "BCM"
+    OUT = "OUT"
+    LOW = 0
+    HIGH = 1
+
+    def __init__(self) -> None:
+        self.outputs: list[tuple[int, int]] = []
+
+    def setmode(self, mode: str) -> None:
+        pass
+
+    def setup(self, pin: int, mode: str, initial: int) -> None:
+        pass
+
+    def output(self, _pin: int, value: int) -> None:
+        self.outputs.append((value, time.perf_counter_ns()))
+
+    def cleanup(self) -> None:
+        pass
+
+
+class FakeProcess:
+    """Stands in for the Direwolf process."""
+
+    def __init__(self, args: list[str], **_kwargs) -> None:
+        self.args = args
+        self.pid = 4242
+
+    def terminate(self) -> None:
+        pass
+
+    def wait(self, _timeout: float) -> int:
+        return 0
+
+    def kill(self) -> None:
+        pass
+
+
+class TimedTransmitter(Transmitter):
+    """A transmitter whose transmissions are on the air for ON_AIR_SECONDS, and are recorded."""
+
+    ON_AIR_SECONDS = 0.05
+
+    def __init__(self, downlink_duty_cycle: float) -> None:
+        super().__init__(4, None, "KQ4VOH", downlink_duty_cycle=downlink_duty_cycle)
+        self.start_times: list[float] = []
+
+    def _transmit(self, job: TransmissionJob, cancelled: threading.Event) -> None:
+        self._scheduler.mark_keyed(job)
+        self.start_times.append(time.monotonic())
+        cancelled.wait(self.ON_AIR_SECONDS)
+
+
+@pytest.fixture
+def gpio(monkeypatch):
+    """Replaces the GPIO pins of the Pi."""
+    gpio = FakeGPIO()
+    monkeypatch.setattr("payload.hardware.transmitter.GPIO", gpio, raising=False)
+    return gpio
+
+
+@pytest.fixture
+def processes(monkeypatch):
+    """Records the programs which are started, instead of starting them."""
+    processes: list[FakeProcess] = []
+
+    def popen(args: list[str], **kwargs) -> FakeProcess:
+        processes.append(FakeProcess(args, **kwargs))
+        return processes[-1]
+
+    monkeypatch.setattr(subprocess, "Popen", popen)
+    monkeypatch.setattr(subprocess, "run", lambda *_args, **_kwargs: None)
+    return processes
+
+
+class TestKISSTransmitter:
+    """Tests the KISSTransmitter against the mock KISS server."""
+
+    def test_key_then_send(self, gpio, processes, kiss_server, tmp_path, transmitter_data_packet):
+        config_path = tmp_path / "direwolf.conf"
+        config_path.write_text(DIREWOLF_CONFIG)
+        transmitter = KISSTransmitter(4, config_path, "KQ4VOH", port=kiss_server.port)
+        transmitter.start()
+
+        # Direwolf is started with a copy of the configuration, which doesn't send the beacon
+        kiss_config_path = transmitter.kiss_config_path
+        assert processes[0].args == ["direwolf", "-c", str(kiss_config_path)]
+        assert kiss_config_path.read_text().splitlines() == [
+            "MYCALL KQ4VOH",
+            "KISSPORT 8001",
+            '#PBEACON delay=0:1 every=0:5 comment=""',
+        ]
+        # The Transmitter still needs the PBEACON line of the configuration
+        assert config_path.read_text() == DIREWOLF_CONFIG
+
+        transmitter.send_message(transmitter_data_packet, requested_ns=time.perf_counter_ns())
+        (frame,) = kiss_server.wait_for_frames(1, timeout=2)
+        transmitter.stop()
+
+        assert parse_ui_frame(frame).info == create_position_report(transmitter_data_packet)
+        # The PTT is keyed before the frame is sent, and released when the transmitter stops
+        keyed_ns = next(t for value, t in gpio.outputs if value == FakeGPIO.HIGH)
+        assert keyed_ns < kiss_server.receive_times_ns[0]
+        assert gpio.outputs[-1][0] == FakeGPIO.LOW
+        assert transmitter.scheduler.latency_ns is not None
+        assert not kiss_config_path.exists()
+
+
+class TestAFSKTransmitter:
+    """Tests the AFSKTransmitter."""
+
+    def test_requires_portaudio(self, gpio, monkeypatch):
+        monkeypatch.setattr("payload.hardware.afsk_transmitter.sounddevice", None)
+        with pytest.raises(RuntimeError, match="PortAudio"):
+            AFSKTransmitter(4, "KQ4VOH")
+        assert gpio.outputs == []
+
+
+@pytest.mark.usefixtures("gpio")
+class TestTransmitter:
+    """Tests the scheduling of the status beacons and of Direwolf of the Transmitter."""
+
+    STATUS = StatusDataPacket(
+        state_name="F", current_altitude=100.0, vertical_velocity=-5.0, crew_survivability=0.9
+    )
+
+    def test_status_duty_cycle(self):
+        transmitter = TimedTransmitter(downlink_duty_cycle=0.25)
+        transmitter.start()
+        try:
+            assert transmitter.send_status(self.STATUS)
+            wait_until(lambda: transmitter._status_not_before > 0)
+            # At a duty cycle of 25%, the PTT is off for three times as long as it was on
+            hold_off = transmitter._status_not_before - transmitter.start_times[0]
+            assert hold_off >= 4 * TimedTransmitter.ON_AIR_SECONDS
+
+            assert transmitter.send_status(self.STATUS)
+            wait_until(lambda: len(transmitter.start_times) == 2)
+            assert transmitter.start_times[1] >= transmitter._status_not_before - 0.01
+        finally:
+            transmitter.stop()
+
+    def test_no_status_without_duty_cycle(self):
+        transmitter = TimedTransmitter(downlink_duty_cycle=0.0)
+        assert not transmitter.send_status(self.STATUS)
+
+    @pytest.mark.usefixtures("gpio")
+    def test_direwolf_schedule(self, processes, monkeypatch):
+        applied = []
+        monkeypatch.setattr(
+            "payload.hardware.transmitter.apply_process_schedule",
+            lambda *args: applied.append(args),
+        )
+        transmitter = Transmitter(4, None, "KQ4VOH")
+        transmitter._start_direwolf()
+        assert applied == []
+
+        schedule = ComponentSchedule(cpus=(0, 1), nice=-5)
+        transmitter.direwolf_schedule = schedule
+        transmitter._start_direwolf()
+        assert [process.args for process in processes] == [["direwolf"], ["direwolf"]]
+        assert applied == [("transmitter", schedule, "direwolf", 4242)]
@@ -0,0 +1,122 @@
+"""Tests the API frames of the XBee, and the Receiver in API mode with a fake XBee."""
+
+import time
+
+import pytest
+import serial
+
+from payload.constants import STOP_MESSAGE, TRANSMIT_MESSAGE
+from payload.data_handling.xbee import (
+    UplinkCommand,
+    XBeeFrameParser,
+    build_receive_packet,
+    decode_command,
+    encode_api_frame,
+    encode_command,
+    parse_receive_packet,
+)
+from payload.hardware.receiver import Receiver
+from payload.mock.mock_xbee import MockXBee
+from tests.conftest import wait_for_messages
+
+
+@pytest.fixture
+def mock_xbee():
+    """Yields a fake XBee, and a receiver in API mode reading it."""
+    xbee = MockXBee()
+    xbee.start()
+    receiver = Receiver(xbee.port, 9600, api_mode=True)
+    receiver.start()
+    # pyserial discards what was received before it opened the port, so the first command is
+    # sent until the receiver acknowledges it
+    assert xbee.send_command(STOP_MESSAGE, retries=200, timeout=0.01)
+    receiver.get_messages()
+    yield xbee, receiver
+    receiver.stop()
+    xbee.stop()
+
+
+class TestXBeeFrameParser:
+    """Tests encoding and parsing the API frames."""
+
+    def test_round_trip_with_escaping(self):
+        # The address and the sequence number contain every byte which has to be escaped
+        frame_data = build_receive_packet(
+            0x7E7D11137E7D1113, encode_command(UplinkCommand(0x7E, STOP_MESSAGE))
+        )
+        frame = encode_api_frame(frame_data)
+        assert frame.count(0x7E) == 1
+
+        parser = XBeeFrameParser()
+        # Fed one byte at a time, as if every read returned a single byte
+        frames = [parsed for byte in frame for parsed in parser.feed(bytes((byte,)))]
+        assert frames == [frame_data]
+        packet = parse_receive_packet(frames[0])
+        assert packet.address == 0x7E7D11137E7D1113
+        assert decode_command(packet.data) == UplinkCommand(0x7E, STOP_MESSAGE)
+
+    def test_bad_checksum_is_dropped(self):
+        frame = bytearray(encode_api_frame(b"\x90abc"))
+        frame[-1] ^= 0x01
+        parser = XBeeFrameParser()
+        assert parser.feed(bytes(frame)) == []
+        assert parser.checksum_errors == 1
+
+    def test_resyncs_after_noise(self):
+        frame = encode_api_frame(b"\x90abc")
+        parser = XBeeFrameParser()
+        # Garbage, then a frame which is cut off by the next one
+        frames = parser.feed(b"\x00\xff garbage" + frame[:4] + frame + frame)
+        assert frames == [b"\x90abc", b"\x90abc"]
+        assert parser.dropped_frames == 1
+
+    def test_too_long_frame_is_dropped(self):
+        parser = XBeeFrameParser(max_frame_data_size=4)
+        assert parser.feed(encode_api_frame(b"\x90abcd") + encode_api_frame(b"\x90abc")) == [
+            b"\x90abc"
+        ]
+        assert parser.dropped_frames == 1
+
+
+class TestReceiverAPIMode:
+    """Tests the Receiver with a fake XBee in API mode."""
+
+    def test_commands_are_acknowledged(self, mock_xbee):
+        xbee, receiver = mock_xbee
+        assert xbee.send_command(TRANSMIT_MESSAGE, timeout=0.5)
+        assert xbee.send_command(STOP_MESSAGE, timeout=0.5)
+        messages = wait_for_messages(receiver, 2)
+        assert [message.message for message in messages] == [TRANSMIT_MESSAGE, STOP_MESSAGE]
+
+    def test_repeated_command_is_handled_once(self, mock_xbee):
+        xbee, receiver = mock_xbee
+        frame = xbee.command_frame(UplinkCommand(100, TRANSMIT_MESSAGE))
+        # Noise and a corrupted copy before the command, which is sent again as if the
+        # acknowledgment was lost
+        corrupted = bytearray(frame)
+        corrupted[-2] ^= 0x04
+        xbee.write(b"\x13\x00junk" + bytes(corrupted) + frame + frame)
+
+        deadline = time.monotonic() + 2
+        while xbee.acks.count(100) < 2 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        assert xbee.acks.count(100) == 2
+        time.sleep(0.05)
+        assert [message.message for message in receiver.get_messages()] == [TRANSMIT_MESSAGE]
+
+    def test_ack_write_timeout(self, capsys):
+        class StuckSerial:
+            """An XBee which doesn't take any data."""
+
+            def write(self, _data: bytes) -> int:
+                raise serial.SerialTimeoutException("Write timeout")
+
+        receiver = Receiver("/dev/null", 9600, api_mode=True)
+        receiver._serial = StuckSerial()
+        frame_data = build_receive_packet(
+            0x0013A200, encode_command(UplinkCommand(7, STOP_MESSAGE))
+        )
+        receiver._handle_data(encode_api_frame(frame_data))
+        # The command is still handled, and the ground station sends it again for the ACK
+        assert [message.message for message in receiver.get_messages()] == [STOP_MESSAGE]
+        assert "couldn't acknowledge command 7" in capsys.readouterr().out